@@ -0,0 +1,375 @@
+"""Discrete-event, agent-based market simulation on top of HISAAMM.
+
+A Simulation keeps a priority queue of timed events (time, sequence,
+action) and runs them in order, so ties resolve in scheduling order and a
+run is reproducible from its seed. Agents schedule their own actions and
+can watch topics instead of polling: every pool change publishes the
+pool id and every PriceFeed tick publishes the feed's topic. A watcher's
+reaction is queued as an event at the current time, coalesced per
+(agent, topic) and never triggered by the agent's own trades.
+
+Agents keep token balances (starting at zero and allowed to go negative,
+so they trade on credit); PnL is the USD value of those balances plus
+any open LP position at the AMM's current token prices. The simulation
+samples every agent's PnL and every pool's reserves and price at a fixed
+interval of simulated time.
+
+Usage:
+
+    python AMM_agents.py --days 30 --noise-traders 20 --backend float
+"""
+import argparse
+import heapq
+import itertools
+import math
+import random
+import time
+from typing import Callable, Dict, List, Optional, Set, Tuple
+
+from AMM_simulator import BACKENDS, ConcentratedPool, CurvePool, HISAAMM
+
+DAY = 86400.0
+
+class Simulation:
+    """Event loop driving agents against one HISAAMM in simulated time (seconds)."""
+
+    def __init__(self, amm: HISAAMM, seed: int = 0, sample_interval: float = 3600.0):
+        if sample_interval <= 0:
+            raise ValueError("sample_interval must be positive.")
+        self.amm = amm
+        self.now = 0.0
+        self.rng = random.Random(seed)
+        self.sample_interval = sample_interval
+        self.agents: List["Agent"] = []
+        self.events = 0
+        self.pool_series: Dict[str, Dict[str, List[float]]] = {}
+        self.pnl_series: Dict[str, List[Tuple[float, float]]] = {}
+        self._queue: List[Tuple[float, int, Callable, tuple]] = []
+        self._sequence = itertools.count()
+        self._watchers: Dict[str, List["Agent"]] = {}
+        self._pending: Set[Tuple[int, str]] = set()
+        self._acting: Optional["Agent"] = None
+        amm.subscribe(self.publish)
+        self.schedule(0.0, self._sample)
+
+    def schedule(self, delay: float, action: Callable, *args):
+        """Runs action(*args) delay seconds from now."""
+        heapq.heappush(self._queue, (self.now + delay, next(self._sequence), action, args))
+
+    def add_agent(self, agent: "Agent") -> "Agent":
+        agent.simulation = self
+        self.agents.append(agent)
+        self.pnl_series[agent.name] = []
+        agent.start()
+        return agent
+
+    def watch(self, agent: "Agent", topic: str):
+        """Calls agent.notify(topic) after each publish of topic."""
+        self._watchers.setdefault(topic, []).append(agent)
+
+    def publish(self, topic: str):
+        for agent in self._watchers.get(topic, ()):
+            key = (id(agent), topic)
+            if agent is self._acting or key in self._pending:
+                continue
+            self._pending.add(key)
+            self.schedule(0.0, self._react, agent, topic)
+
+    def _react(self, agent: "Agent", topic: str):
+        self._pending.discard((id(agent), topic))
+        self._acting = agent
+        agent.notify(topic)
+
+    def run(self, until: float, max_events: Optional[int] = None) -> Dict:
+        """Processes events up to simulated time until; returns run statistics."""
+        queue = self._queue
+        limit = math.inf if max_events is None else self.events + max_events
+        start = time.perf_counter()
+        processed = self.events
+        while queue and queue[0][0] <= until and self.events < limit:
+            self.now, _, action, args = heapq.heappop(queue)
+            owner = getattr(action, '__self__', None)
+            self._acting = owner if isinstance(owner, Agent) else None
+            action(*args)
+            self.events += 1
+        self._acting = None
+        if not queue or queue[0][0] > until:
+            self.now = until
+        elapsed = time.perf_counter() - start
+        processed = self.events - processed
+        return {
+            'simulated_seconds': self.now,
+            'events': processed,
+            'elapsed_seconds': elapsed,
+            'events_per_second': processed / elapsed if elapsed > 0 else 0.0
+        }
+
+    def _sample(self):
+        to_float = self.amm.backend.to_float
+        for pool_id, pool in self.amm.pools.items():
+            series = self.pool_series.setdefault(
+                pool_id, {'time': [], 'reserve_a': [], 'reserve_b': [], 'price_a_in_b': []})
+            series['time'].append(self.now)
+            series['reserve_a'].append(to_float(pool.token_a_reserve))
+            series['reserve_b'].append(to_float(pool.token_b_reserve))
+            series['price_a_in_b'].append(to_float(pool.price_a_in_b))
+        prices = self.amm.get_ecosystem_token_prices()
+        for agent in self.agents:
+            self.pnl_series[agent.name].append((self.now, agent.value(prices)))
+        self.schedule(self.sample_interval, self._sample)
+
+    def report(self) -> Dict:
+        """Final PnL, trade counts and the sampled series."""
+        prices = self.amm.get_ecosystem_token_prices()
+        return {
+            'simulated_seconds': self.now,
+            'events': self.events,
+            'agents': {agent.name: {'kind': type(agent).__name__, 'trades': agent.trades,
+                                    'pnl_usd': agent.value(prices), 'balances': dict(agent.balances)}
+                       for agent in self.agents},
+            'pnl_series': self.pnl_series,
+            'pool_series': self.pool_series
+        }
+
+class Agent:
+    """Base class for simulated participants; subclasses override start and notify."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.simulation: Optional[Simulation] = None
+        self.balances: Dict[str, float] = {}
+        self.trades = 0
+
+    def start(self):
+        """Schedules the agent's first actions and topic watches."""
+
+    def notify(self, topic: str):
+        """Reacts to a publish of a watched topic."""
+
+    def swap(self, pool_id: str, token_in: str, amount_in: float) -> float:
+        """Swaps through the AMM, books the balances and returns amount_out (0 if the swap fails)."""
+        amm = self.simulation.amm
+        backend = amm.backend
+        try:
+            amount_out, _ = amm._execute_swap(pool_id, token_in, backend.convert(amount_in))
+        except ValueError:
+            return 0.0
+        pool = amm.pools[pool_id]
+        token_out = pool.token_b_symbol if token_in == pool.token_a_symbol else pool.token_a_symbol
+        amount_out = backend.to_float(amount_out)
+        self.balances[token_in] = self.balances.get(token_in, 0.0) - amount_in
+        self.balances[token_out] = self.balances.get(token_out, 0.0) + amount_out
+        self.trades += 1
+        return amount_out
+
+    def value(self, prices: Dict[str, float]) -> float:
+        """USD value of the agent's balances at prices."""
+        return sum(amount * prices.get(token, 0.0) for token, amount in self.balances.items())
+
+class NoiseTrader(Agent):
+    """Trades random sizes in random directions at Poisson arrival times."""
+
+    def __init__(self, name: str, pool_ids: List[str], mean_interval: float = 60.0,
+                 mean_trade_usd: float = 500.0, size_sigma: float = 1.0):
+        super().__init__(name)
+        if mean_interval <= 0 or mean_trade_usd <= 0:
+            raise ValueError("mean_interval and mean_trade_usd must be positive.")
+        self.pool_ids = list(pool_ids)
+        self.mean_interval = mean_interval
+        self.size_mu = math.log(mean_trade_usd) - 0.5 * size_sigma * size_sigma
+        self.size_sigma = size_sigma
+
+    def start(self):
+        self.simulation.schedule(self.simulation.rng.expovariate(1 / self.mean_interval), self.act)
+
+    def act(self):
+        simulation = self.simulation
+        rng = simulation.rng
+        pool_id = rng.choice(self.pool_ids)
+        pool = simulation.amm.pools[pool_id]
+        token_in = pool.token_a_symbol if rng.random() < 0.5 else pool.token_b_symbol
+        price = simulation.amm.get_token_price(token_in)
+        if price > 0:
+            self.swap(pool_id, token_in, rng.lognormvariate(self.size_mu, self.size_sigma) / price)
+        simulation.schedule(rng.expovariate(1 / self.mean_interval), self.act)
+
+class PriceFeed(Agent):
+    """External price of a pool's token A in token B following geometric Brownian motion.
+
+    Publishes its topic ("feed:<pool_id>") after every tick; it holds no
+    balances and never trades.
+    """
+
+    def __init__(self, pool_id: str, price: float, daily_volatility: float = 0.05,
+                 interval: float = 60.0):
+        super().__init__(f"feed:{pool_id}")
+        if price <= 0 or interval <= 0:
+            raise ValueError("price and interval must be positive.")
+        self.pool_id = pool_id
+        self.price = price
+        self.interval = interval
+        self.shock_scale = daily_volatility * math.sqrt(interval / DAY)
+
+    def start(self):
+        self.simulation.schedule(self.interval, self.tick)
+
+    def tick(self):
+        shock = self.simulation.rng.gauss(-0.5 * self.shock_scale * self.shock_scale, self.shock_scale)
+        self.price *= math.exp(shock)
+        self.simulation.publish(self.name)
+        self.simulation.schedule(self.interval, self.tick)
+
+class Arbitrageur(Agent):
+    """Trades a pool back to an external PriceFeed whenever the profit clears min_profit.
+
+    Reacts to both feed ticks and pool changes; sizes trades with the same
+    closed form as RewardCalculator.calculate_arbitrage_opportunity. For
+    curve pools that size comes from the curve's local constant-product
+    reserves, so it is checked with a real quote and halved until the
+    trade clears min_profit.
+    """
+    MAX_HALVINGS = 30
+
+    def __init__(self, name: str, feed: PriceFeed, min_profit: float = 0.0):
+        super().__init__(name)
+        self.feed = feed
+        self.pool_id = feed.pool_id
+        self.min_profit = min_profit
+
+    def start(self):
+        self.simulation.watch(self, self.feed.name)
+        self.simulation.watch(self, self.pool_id)
+
+    def notify(self, topic: str):
+        amm = self.simulation.amm
+        pool = amm.pools[self.pool_id]
+        if isinstance(pool, CurvePool):
+            reserve_a, reserve_b = pool.curve_reserves()
+        else:
+            to_float = amm.backend.to_float
+            reserve_a, reserve_b = to_float(pool.token_a_reserve), to_float(pool.token_b_reserve)
+        gamma = 1 - amm.backend.to_float(pool.fee_rate)
+        price = self.feed.price
+        b_in = (math.sqrt(gamma * price * reserve_a * reserve_b) - reserve_b) / gamma
+        a_in = (math.sqrt(gamma * reserve_a * reserve_b / price) - reserve_a) / gamma
+        if b_in > 0:
+            token_in, amount_in = pool.token_b_symbol, b_in
+            profit = price * reserve_a * gamma * b_in / (reserve_b + gamma * b_in) - b_in
+        elif a_in > 0:
+            token_in, amount_in = pool.token_a_symbol, a_in
+            profit = reserve_b * gamma * a_in / (reserve_a + gamma * a_in) - price * a_in
+        else:
+            return
+        if isinstance(pool, CurvePool):
+            profit = self._quoted_profit(pool, token_in, amount_in)
+            for _ in range(self.MAX_HALVINGS):
+                if profit > self.min_profit:
+                    break
+                amount_in /= 2
+                profit = self._quoted_profit(pool, token_in, amount_in)
+        if profit > self.min_profit:
+            self.swap(self.pool_id, token_in, amount_in)
+
+    def _quoted_profit(self, pool: CurvePool, token_in: str, amount_in: float) -> float:
+        """Profit in token B of swapping amount_in, valuing token A at the feed price."""
+        backend = pool.backend
+        amount_out = backend.to_float(pool.quote(token_in, backend.convert(amount_in))[0])
+        if token_in == pool.token_a_symbol:
+            return amount_out - self.feed.price * amount_in
+        return self.feed.price * amount_out - amount_in
+
+class LiquidityProvider(Agent):
+    """Holds an LP position of deposit_usd in a pool, re-entering every hold_period seconds.
+
+    Positions are LiquidityBook shares (add_liquidity with owner=name), so
+    the agent's value includes its principal and owed fees.
+    """
+
+    def __init__(self, name: str, pool_id: str, deposit_usd: float = 10000.0, hold_period: float = DAY):
+        super().__init__(name)
+        if deposit_usd <= 0 or hold_period <= 0:
+            raise ValueError("deposit_usd and hold_period must be positive.")
+        self.pool_id = pool_id
+        self.deposit_usd = deposit_usd
+        self.hold_period = hold_period
+        self.position_id: Optional[int] = None
+
+    def start(self):
+        self.simulation.schedule(0.0, self.act)
+
+    def act(self):
+        amm = self.simulation.amm
+        if self.position_id is not None:
+            result = amm.remove_liquidity(self.pool_id, self.position_id)
+            self._book(result['amount_a'] + result['fees_a'], result['amount_b'] + result['fees_b'])
+            self.position_id = None
+        pool = amm.pools[self.pool_id]
+        price_b = amm.get_token_price(pool.token_b_symbol)
+        if price_b > 0:
+            to_float = amm.backend.to_float
+            amount_b = self.deposit_usd / 2 / price_b
+            amount_a = amount_b * to_float(pool.token_a_reserve) / to_float(pool.token_b_reserve)
+            result = amm.add_liquidity(self.pool_id, amount_a, amount_b, owner=self.name)
+            self.position_id = result['position_id']
+            self._book(-amount_a, -amount_b)
+            self.trades += 1
+        self.simulation.schedule(self.hold_period, self.act)
+
+    def _book(self, amount_a: float, amount_b: float):
+        pool = self.simulation.amm.pools[self.pool_id]
+        for token, amount in ((pool.token_a_symbol, amount_a), (pool.token_b_symbol, amount_b)):
+            self.balances[token] = self.balances.get(token, 0.0) + amount
+
+    def value(self, prices: Dict[str, float]) -> float:
+        total = super().value(prices)
+        if self.position_id is not None:
+            info = self.simulation.amm.get_position_info(self.pool_id, self.position_id)
+            pool = self.simulation.amm.pools[self.pool_id]
+            total += ((info['amount_a'] + info['fees_a']) * prices.get(pool.token_a_symbol, 0.0)
+                      + (info['amount_b'] + info['fees_b']) * prices.get(pool.token_b_symbol, 0.0))
+        return total
+
+def default_simulation(amm: HISAAMM, noise_traders: int = 20, seed: int = 0,
+                       mean_interval: float = 60.0, daily_volatility: float = 0.05,
+                       sample_interval: float = 3600.0) -> Simulation:
+    """Noise traders across every pool, one feed and arbitrageur per USDC pool and one LP per pool.
+
+    Concentrated-liquidity pools get no LP agent, as they have no LiquidityBook.
+    """
+    simulation = Simulation(amm, seed, sample_interval)
+    pool_ids = list(amm.pools)
+    for index in range(noise_traders):
+        simulation.add_agent(NoiseTrader(f"noise{index}", pool_ids, mean_interval))
+    to_float = amm.backend.to_float
+    for pool_id, pool in amm.pools.items():
+        if pool.token_b_symbol == "USDC":
+            feed = simulation.add_agent(PriceFeed(pool_id, to_float(pool.price_a_in_b), daily_volatility))
+            simulation.add_agent(Arbitrageur(f"arb:{pool_id}", feed))
+        if not isinstance(pool, ConcentratedPool):
+            simulation.add_agent(LiquidityProvider(f"lp:{pool_id}", pool_id))
+    return simulation
+
+def main():
+    parser = argparse.ArgumentParser(description="Run an agent-based simulation of the HISA pools.")
+    parser.add_argument("--days", type=float, default=30)
+    parser.add_argument("--noise-traders", type=int, default=20)
+    parser.add_argument("--mean-interval", type=float, default=60.0, help="Mean seconds between a noise trader's swaps")
+    parser.add_argument("--volatility", type=float, default=0.05, help="Daily volatility of the external price feeds")
+    parser.add_argument("--sample-interval", type=float, default=3600.0)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--backend", choices=list(BACKENDS), default="decimal")
+    args = parser.parse_args()
+    amm = HISAAMM(backend=args.backend)
+    simulation = default_simulation(amm, args.noise_traders, args.seed, args.mean_interval,
+                                    args.volatility, args.sample_interval)
+    stats = simulation.run(args.days * DAY)
+    report = simulation.report()
+    print(f"{stats['events']:,} events over {args.days:g} days in {stats['elapsed_seconds']:.2f}s "
+          f"({stats['events_per_second'] * 60:,.0f} events/min)")
+    print(f"{'agent':<28}{'trades':>10}{'PnL $':>14}")
+    for name, agent in sorted(report['agents'].items(), key=lambda item: item[1]['pnl_usd']):
+        if agent['kind'] != "PriceFeed":
+            print(f"{name:<28}{agent['trades']:>10,}{agent['pnl_usd']:>14,.2f}")
+
+if __name__ == "__main__":
+    main()
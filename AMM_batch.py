@@ -0,0 +1,226 @@
+"""Non-interactive batch mode for the HISA AMM calculator.
+
+Reads one JSON operation per line from a file or stdin, runs every
+operation against a single shared HISAAMM and streams one JSON result per
+line to stdout. Input is consumed lazily and each result is written as soon
+as it is produced, so memory stays flat however long the stream is.
+
+Each operation carries an "op" and the fields of the matching calculator
+screen; an optional "id" is echoed back in the result:
+
+    quote          pool_id, token_in, amount_in
+    swap           pool_id, token_in, amount_in
+    add-liquidity  pool_id, amount_a, amount_b, [owner]
+    pool-info      pool_id
+    lp-rewards     pool_id, liquidity_usd or liquidity_percent, [days]
+    arbitrage      pool_id, token, external_price
+    prices         (no fields)
+
+A failing operation yields {"id": ..., "op": ..., "error": "..."} and the
+stream continues unless --fail-fast is given.
+
+Token prices and pool valuations are cached by the batch runner and only
+recomputed after a pool changes, so a run of queries between two swaps
+prices the ecosystem once.
+
+Usage:
+
+    python AMM_batch.py ops.jsonl > results.jsonl
+    cat ops.jsonl | python AMM_batch.py - --backend float
+"""
+import argparse
+import json
+import math
+import sys
+import time
+from typing import Dict, Iterable, Mapping, Optional, TextIO
+
+from AMM_simulator import BACKENDS, HISAAMM, RewardCalculator
+
+def _amount(operation: Dict, field: str) -> float:
+    """Returns operation[field] as a float, raising ValueError unless it is finite and positive."""
+    value = float(operation[field])
+    if not (math.isfinite(value) and value > 0):
+        raise ValueError(f"{field} must be a finite positive number.")
+    return value
+
+def _days(operation: Dict) -> int:
+    """Returns operation['days'] (default 30), raising ValueError unless it is a positive whole number."""
+    value = float(operation.get('days', 30))
+    if not (value.is_integer() and value > 0):
+        raise ValueError("days must be a positive whole number.")
+    return int(value)
+
+class BatchRunner:
+    """Executes calculator operations against one HISAAMM and caches derived state.
+
+    Pool summaries are cached per pool and dropped when that pool changes.
+    USD valuations depend on prices routed through other pools, so they
+    are dropped together with the price table on any pool change.
+    """
+
+    def __init__(self, amm: HISAAMM):
+        self.amm = amm
+        self.calculator = RewardCalculator(amm)
+        self._pool_info: Dict[str, Dict] = {}
+        self._valuations: Dict[str, Dict] = {}
+        self._prices: Optional[Mapping[str, float]] = None
+        self._handlers = {
+            'quote': self._quote,
+            'swap': self._swap,
+            'add_liquidity': self._add_liquidity,
+            'pool_info': self._pool_info_op,
+            'lp_rewards': self._lp_rewards,
+            'arbitrage': self._arbitrage,
+            'prices': self._prices_op
+        }
+        amm.subscribe(self._on_pool_changed)
+
+    def _on_pool_changed(self, pool_id: str):
+        self._pool_info.pop(pool_id, None)
+        self._valuations.clear()
+        self._prices = None
+
+    def prices(self) -> Mapping[str, float]:
+        if self._prices is None:
+            self._prices = self.amm.get_ecosystem_token_prices()
+        return self._prices
+
+    def pool_info(self, pool_id: str) -> Dict:
+        info = self._pool_info.get(pool_id)
+        if info is None:
+            info = self._pool_info[pool_id] = self.amm.get_pool_info(pool_id)
+        return info
+
+    def valuation(self, pool_id: str) -> Dict:
+        """Returns the pool's reserves in USD at the cached token prices."""
+        value = self._valuations.get(pool_id)
+        if value is None:
+            info = self.pool_info(pool_id)
+            prices = self.prices()
+            token_a_price = prices.get(info['token_a'], 0.0)
+            token_b_price = prices.get(info['token_b'], 0.0)
+            token_a_value = info['reserve_a'] * token_a_price
+            token_b_value = info['reserve_b'] * token_b_price
+            value = self._valuations[pool_id] = {
+                'token_a_price': token_a_price,
+                'token_b_price': token_b_price,
+                'token_a_value': token_a_value,
+                'token_b_value': token_b_value,
+                'tvl': token_a_value + token_b_value
+            }
+        return value
+
+    def run(self, operation: Dict) -> Dict:
+        """Executes one operation and returns its result; raises on invalid input."""
+        op = str(operation.get('op', '')).replace('-', '_')
+        handler = self._handlers.get(op)
+        if handler is None:
+            raise ValueError(f"Unknown op: {operation.get('op')}. Valid ops: "
+                             f"{', '.join(name.replace('_', '-') for name in self._handlers)}")
+        return handler(operation)
+
+    def _quote(self, operation: Dict) -> Dict:
+        return self.amm.simulate_price_impact(operation['pool_id'], operation['token_in'],
+                                              _amount(operation, 'amount_in'))
+
+    def _swap(self, operation: Dict) -> Dict:
+        return self.amm.execute_swap(operation['pool_id'], operation['token_in'],
+                                     _amount(operation, 'amount_in'))
+
+    def _add_liquidity(self, operation: Dict) -> Dict:
+        return self.amm.add_liquidity(operation['pool_id'], _amount(operation, 'amount_a'),
+                                      _amount(operation, 'amount_b'), owner=operation.get('owner'))
+
+    def _pool_info_op(self, operation: Dict) -> Dict:
+        pool_id = operation['pool_id']
+        return dict(self.pool_info(pool_id), **self.valuation(pool_id))
+
+    def _lp_rewards(self, operation: Dict) -> Dict:
+        """Fee estimate for a position given in USD (as the calculator asks) or as a pool share."""
+        pool_id = operation['pool_id']
+        days = _days(operation)
+        valuation = self.valuation(pool_id)
+        if 'liquidity_usd' in operation:
+            liquidity_usd = _amount(operation, 'liquidity_usd')
+            if valuation['tvl'] == 0:
+                raise ValueError(f"Pool {pool_id} has no liquidity.")
+            liquidity_percent = liquidity_usd / valuation['tvl'] * 100
+        else:
+            liquidity_percent = float(operation['liquidity_percent'])
+            liquidity_usd = valuation['tvl'] * liquidity_percent / 100
+        rewards = self.calculator.calculate_lp_rewards(pool_id, liquidity_percent, days)
+        token_a_price, token_b_price = valuation['token_a_price'], valuation['token_b_price']
+        rewards['token_a_needed'] = liquidity_usd / 2 / token_a_price if token_a_price > 0 else None
+        rewards['token_b_needed'] = liquidity_usd / 2 / token_b_price if token_b_price > 0 else None
+        return rewards
+
+    def _arbitrage(self, operation: Dict) -> Dict:
+        return self.calculator.calculate_arbitrage_opportunity(
+            operation['pool_id'], _amount(operation, 'external_price'), operation['token'])
+
+    def _prices_op(self, operation: Dict) -> Dict:
+        return dict(self.prices())
+
+def run_batch(runner: BatchRunner, lines: Iterable[str], output: TextIO,
+              fail_fast: bool = False) -> Dict:
+    """Runs each JSON line through runner and writes one JSON result line per operation.
+
+    Results are {"id", "op", "result"} or {"id", "op", "error"}; id is
+    the operation's own id, or its line number when it has none.
+    """
+    encode = json.JSONEncoder(separators=(',', ':')).encode
+    write = output.write
+    processed = failed = 0
+    start = time.perf_counter()
+    line_number = 0
+    for line_number, line in enumerate(lines, 1):
+        text = line.strip()
+        if not text:
+            continue
+        operation = None
+        try:
+            operation = json.loads(text)
+            record = {'id': operation.get('id', line_number), 'op': operation.get('op'),
+                      'result': runner.run(operation)}
+        except (ValueError, KeyError, TypeError, AttributeError, ArithmeticError) as e:
+            failed += 1
+            valid = isinstance(operation, dict)
+            record = {'id': operation.get('id', line_number) if valid else line_number,
+                      'op': operation.get('op') if valid else None,
+                      'error': f"missing field {e}" if isinstance(e, KeyError) else str(e)}
+        write(encode(record) + "\n")
+        processed += 1
+        if fail_fast and 'error' in record:
+            break
+    elapsed = time.perf_counter() - start
+    return {
+        'operations': processed,
+        'failed': failed,
+        'lines_read': line_number,
+        'elapsed_seconds': elapsed,
+        'operations_per_second': processed / elapsed if elapsed > 0 else 0.0
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Run calculator operations from JSONL against one HISAAMM.")
+    parser.add_argument("source", help="Operations file (JSONL), or - for stdin")
+    parser.add_argument("--backend", choices=list(BACKENDS), default="decimal")
+    parser.add_argument("--fail-fast", action="store_true", help="Stop at the first failing operation")
+    parser.add_argument("--quiet", action="store_true", help="Do not print the summary to stderr")
+    args = parser.parse_args()
+    runner = BatchRunner(HISAAMM(backend=args.backend))
+    if args.source == "-":
+        stats = run_batch(runner, sys.stdin, sys.stdout, args.fail_fast)
+    else:
+        with open(args.source) as handle:
+            stats = run_batch(runner, handle, sys.stdout, args.fail_fast)
+    sys.stdout.flush()
+    if not args.quiet:
+        print(f"Ran {stats['operations']:,} operations in {stats['elapsed_seconds']:.2f}s "
+              f"({stats['operations_per_second']:,.0f} ops/sec, {stats['failed']:,} failed)", file=sys.stderr)
+    if stats['failed'] and args.fail_fast:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
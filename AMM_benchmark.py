@@ -0,0 +1,720 @@
+"""Parity checks and timings for the HISAAMM numeric backends.
+
+Run directly to replay the same random swap sequence through every backend,
+verify the results agree with the Decimal reference and print the speedup,
+then stress ConcurrentHISAAMM from several threads and print its throughput
+per thread count:
+
+    python AMM_benchmark.py
+
+The suite subcommand times the AMM hot paths over a grid of topology sizes
+and trade counts, writes the results as a JSON baseline and fails when a
+path is slower than a stored baseline by more than the threshold:
+
+    python AMM_benchmark.py suite --runs 5 --save-baseline AMM_benchmark_baseline.json
+    python AMM_benchmark.py suite --baseline AMM_benchmark_baseline.json --threshold 0.30
+
+The ticks subcommand checks a single-range concentrated pool against the
+equivalent constant-product pool, then times swaps that cross hundreds of
+initialized ticks in pools with increasingly many ticks:
+
+    python AMM_benchmark.py ticks --crossed 100 300 --initialized 1000 10000
+
+The stableswap subcommand compares Newton iterations per solve with the
+warm start against cold starts, times StableSwap swaps against the
+constant-product pool and vectorized batch quotes against per-amount ones:
+
+    python AMM_benchmark.py stableswap --swaps 5000 --backend fixed
+
+The lp subcommand times swaps, fee claims and mints on a pool holding
+increasingly many LP positions (both should stay flat) and reports the
+memory each position takes:
+
+    python AMM_benchmark.py lp --positions 1000 100000 1000000
+
+The batch subcommand compares netted block execution with the sequential
+path for several block sizes (throughput and mean slippage from the
+pre-block price):
+
+    python AMM_benchmark.py batch --orders 20000 --block-sizes 10 100 1000
+
+The depth subcommand compares DepthIndex table lookups and closed-form
+queries with simulate_price_impact, and times table rebuilds:
+
+    python AMM_benchmark.py depth --queries 20000
+
+The results subcommand compares the dict API (get_pool_info,
+simulate_price_impact, execute_swap) with the typed results, both freshly
+allocated and refilled into one reusable buffer, per call and per retained
+result:
+
+    python AMM_benchmark.py results --calls 20000 --backend float
+"""
+import argparse
+import functools
+import json
+import platform
+import random
+import statistics
+import sys
+import threading
+import time
+import tracemalloc
+from typing import Callable, Dict, List, Sequence, Tuple
+
+import numpy as np
+
+from AMM_simulator import (BACKENDS, TOKEN_SYMBOLS, ConcurrentHISAAMM, DepthIndex, HISAAMM, PoolInfo,
+                           PriceImpact, RewardCalculator, SwapResult)
+
+# Maximum relative deviation from the Decimal reference allowed per backend.
+PARITY_RTOL = {"decimal": 0.0, "fixed": 1e-12, "float": 1e-9}
+
+TICK_CROSSINGS = (100, 300, 1000)
+TICK_COUNTS = (1000, 10000)
+TICK_SPACING = 10
+
+SUITE_POOL_COUNTS = (10, 100, 1000)
+SUITE_TRADE_COUNTS = (1000, 10000)
+SUITE_REPEATS = 5
+# A path fails the gate when its ops/sec falls below (1 - threshold) x baseline.
+REGRESSION_THRESHOLD = 0.30
+
+def default_amm(backend: str = "decimal", amm_class=HISAAMM) -> HISAAMM:
+    """Builds a HISAAMM with the default topology."""
+    return amm_class(backend=backend)
+
+def random_swaps(amm: HISAAMM, count: int, seed: int = 0) -> List[Tuple[str, str, float]]:
+    """Returns a reproducible list of (pool_id, token_in, amount_in) swaps."""
+    rng = random.Random(seed)
+    pool_ids = list(amm.pools)
+    swaps = []
+    for _ in range(count):
+        pool_id = rng.choice(pool_ids)
+        pool = amm.pools[pool_id]
+        token_in = rng.choice([pool.token_a_symbol, pool.token_b_symbol])
+        swaps.append((pool_id, token_in, round(rng.uniform(1, 5000), 6)))
+    return swaps
+
+def check_backend_parity(swap_count: int = 2000, seed: int = 0) -> Dict[str, float]:
+    """Replays one swap sequence through every backend and compares to Decimal.
+
+    Returns the worst relative deviation seen per backend and raises
+    AssertionError when it exceeds PARITY_RTOL.
+    """
+    amms = {name: default_amm(name) for name in BACKENDS}
+    swaps = random_swaps(amms["decimal"], swap_count, seed)
+    worst = {name: 0.0 for name in BACKENDS}
+    for pool_id, token_in, amount_in in swaps:
+        results = {name: amm.execute_swap(pool_id, token_in, amount_in)['amount_out']
+                   for name, amm in amms.items()}
+        for name, actual in results.items():
+            worst[name] = max(worst[name], abs(actual - results["decimal"]) / abs(results["decimal"]))
+    for pool_id in amms["decimal"].pools:
+        expected = amms["decimal"].get_pool_info(pool_id)
+        for name, amm in amms.items():
+            actual = amm.get_pool_info(pool_id)
+            for key in ('reserve_a', 'reserve_b', 'price_a_in_b'):
+                worst[name] = max(worst[name], abs(actual[key] - expected[key]) / abs(expected[key]))
+    for name, deviation in worst.items():
+        assert deviation <= PARITY_RTOL[name], f"{name} backend deviates by {deviation:.3e}"
+    return worst
+
+def benchmark_backends(swap_count: int = 20000, seed: int = 0) -> Dict[str, float]:
+    """Times execute_swap over the same swap sequence for each backend; returns swaps/sec."""
+    results = {}
+    for name in BACKENDS:
+        amm = default_amm(name)
+        swaps = random_swaps(amm, swap_count, seed)
+        start = time.perf_counter()
+        for pool_id, token_in, amount_in in swaps:
+            amm.execute_swap(pool_id, token_in, amount_in)
+        results[name] = swap_count / (time.perf_counter() - start)
+    return results
+
+def _run_threads(amm: HISAAMM, swaps: List[Tuple[str, str, float]], threads: int,
+                 on_swap=None) -> float:
+    """Executes swaps split round-robin over threads; returns the elapsed seconds."""
+    start_barrier = threading.Barrier(threads + 1)
+
+    def worker(batch):
+        start_barrier.wait()
+        for swap in batch:
+            if on_swap:
+                on_swap(swap)
+            amm.execute_swap(*swap)
+
+    workers = [threading.Thread(target=worker, args=(swaps[index::threads],)) for index in range(threads)]
+    for thread in workers:
+        thread.start()
+    start_barrier.wait()
+    start = time.perf_counter()
+    for thread in workers:
+        thread.join()
+    return time.perf_counter() - start
+
+def check_thread_safety(threads: int = 8, swap_count: int = 20000, seed: int = 0,
+                        backend: str = "fixed") -> Dict[str, int]:
+    """Hammers one ConcurrentHISAAMM from several threads and replays the result.
+
+    Every thread swaps on every pool. A pool listener records the order in
+    which each pool's swaps were applied (listeners run under the pool
+    lock), and that order is replayed sequentially on a fresh AMM. The
+    reserves and the fee total must match exactly, which the default
+    fixed-point backend makes a bit-for-bit comparison.
+    """
+    amm = default_amm(backend, ConcurrentHISAAMM)
+    swaps = random_swaps(amm, swap_count, seed)
+    current = threading.local()
+    applied: Dict[str, List[Tuple[str, str, float]]] = {pool_id: [] for pool_id in amm.pools}
+    amm.subscribe(lambda pool_id: applied[pool_id].append(current.swap))
+    _run_threads(amm, swaps, threads, on_swap=lambda swap: setattr(current, 'swap', swap))
+    reference = default_amm(backend)
+    for pool_swaps in applied.values():
+        for swap in pool_swaps:
+            reference.execute_swap(*swap)
+    assert sum(len(pool_swaps) for pool_swaps in applied.values()) == swap_count, "swaps were lost"
+    for pool_id, pool in reference.pools.items():
+        actual = amm.pools[pool_id]
+        assert (actual.token_a_reserve, actual.token_b_reserve) == (pool.token_a_reserve, pool.token_b_reserve), \
+            f"{pool_id} reserves diverge from the sequential replay"
+    assert amm.total_fees_collected == reference.total_fees_collected, "fee total diverges from the sequential replay"
+    return {'threads': threads, 'swaps': swap_count, 'pools': len(applied)}
+
+def benchmark_threads(thread_counts=(1, 2, 4, 8), swap_count: int = 40000, seed: int = 0,
+                      backend: str = "decimal") -> Dict[int, float]:
+    """Times ConcurrentHISAAMM.execute_swap per thread count; returns swaps/sec."""
+    results = {}
+    for threads in thread_counts:
+        amm = default_amm(backend, ConcurrentHISAAMM)
+        swaps = random_swaps(amm, swap_count, seed)
+        results[threads] = swap_count / _run_threads(amm, swaps, threads)
+    return results
+
+def synthetic_tokens(pool_count: int) -> List[str]:
+    return [f"SYN{index}" for index in range(max(pool_count - 10, 0))]
+
+def synthetic_amm(pool_count: int, backend: str = "decimal") -> HISAAMM:
+    """Returns an AMM with the default 10 pools plus synthetic pools up to pool_count.
+
+    Even synthetic tokens trade against USDC and odd ones against the
+    previous token, so every token is priced through a one- or two-hop path.
+    """
+    tokens = synthetic_tokens(pool_count)
+    amm = HISAAMM(backend=backend, token_symbols=TOKEN_SYMBOLS + tokens)
+    if tokens:
+        amm.load_pools(tokens, [tokens[index - 1] if index % 2 else "USDC" for index in range(len(tokens))],
+                       [100000.0] * len(tokens), [250000.0] * len(tokens))
+    return amm
+
+def _median_time(run: Callable[[], float], repeats: int) -> float:
+    """Returns the median of repeats timed runs, after one untimed warm-up run.
+
+    The median is used rather than the minimum because it is far less
+    sensitive to frequency boosts on shared machines, which keeps the
+    regression gate from tripping on a lucky baseline.
+    """
+    run()
+    return statistics.median(run() for _ in range(repeats))
+
+def _timed_loop(setup: Callable[[], Tuple[Callable, List]], repeats: int) -> float:
+    """Returns the median elapsed time of calling operation(*args) for each args in a fresh setup."""
+    def run():
+        operation, calls = setup()
+        start = time.perf_counter()
+        for args in calls:
+            operation(*args)
+        return time.perf_counter() - start
+    return _median_time(run, repeats)
+
+def time_create_pool(pool_count: int, backend: str, repeats: int) -> float:
+    """Returns create_pool calls/sec when adding pool_count pools to the default AMM."""
+    new_tokens = [f"NEW{index}" for index in range(pool_count)]
+
+    def create_pools():
+        amm = HISAAMM(backend=backend, token_symbols=TOKEN_SYMBOLS + new_tokens)
+        start = time.perf_counter()
+        for token in new_tokens:
+            amm.create_pool(token, "USDC", 100000, 250000)
+        return time.perf_counter() - start
+    return pool_count / _median_time(create_pools, repeats)
+
+def suite_cases(pool_count: int, trades: int, backend: str, seed: int,
+                repeats: int) -> Dict[str, float]:
+    """Times each hot path for one (pool_count, trades) cell; returns ops/sec per path."""
+    template = synthetic_amm(pool_count, backend)
+    swaps = random_swaps(template, trades, seed)
+    rng = random.Random(seed)
+    pool_ids = list(template.pools)
+    lp_calls = [(rng.choice(pool_ids), rng.uniform(0.01, 10.0)) for _ in range(trades)]
+    results = {}
+
+    def prices_after_swaps():
+        amm = template.fork()
+        elapsed = 0.0
+        for swap in swaps:
+            amm.execute_swap(*swap)
+            start = time.perf_counter()
+            amm.get_ecosystem_token_prices()
+            elapsed += time.perf_counter() - start
+        return elapsed
+    results['get_ecosystem_token_prices'] = trades / _median_time(prices_after_swaps, repeats)
+
+    loops = {
+        'get_swap_amount_out': lambda: (template.get_swap_amount_out, swaps),
+        'simulate_price_impact': lambda: (template.simulate_price_impact, swaps),
+        'execute_swap': lambda: (template.fork().execute_swap, swaps),
+        'calculate_lp_rewards': lambda: (RewardCalculator(template).calculate_lp_rewards, lp_calls)
+    }
+    for name, setup in loops.items():
+        results[name] = trades / _timed_loop(setup, repeats)
+    return results
+
+def run_suite(pool_counts: Sequence[int] = SUITE_POOL_COUNTS,
+              trade_counts: Sequence[int] = SUITE_TRADE_COUNTS, backend: str = "decimal",
+              seed: int = 0, repeats: int = SUITE_REPEATS, runs: int = 1) -> Dict:
+    """Runs the hot-path suite over every (pools, trades) cell.
+
+    Returns a JSON-serializable report whose results map
+    "<path>/pools=<n>/trades=<m>" (create_pool: "create_pool/pools=<n>")
+    to the median ops/sec over repeats runs. With runs > 1 the whole grid
+    is run that many times and each path keeps the median across runs,
+    which is how baselines should be saved: timings drift between grid
+    runs more than within one.
+    get_ecosystem_token_prices is timed as a price read after each swap,
+    i.e. with one pool's prices invalidated.
+    """
+    samples: Dict[str, List[float]] = {}
+    for _ in range(runs):
+        for pool_count in pool_counts:
+            samples.setdefault(f"create_pool/pools={pool_count}", []).append(
+                time_create_pool(pool_count, backend, repeats))
+            for trades in trade_counts:
+                for name, rate in suite_cases(pool_count, trades, backend, seed, repeats).items():
+                    samples.setdefault(f"{name}/pools={pool_count}/trades={trades}", []).append(rate)
+    results = {key: statistics.median(rates) for key, rates in samples.items()}
+    return {
+        'meta': {
+            'backend': backend,
+            'seed': seed,
+            'repeats': repeats,
+            'runs': runs,
+            'python': platform.python_version(),
+            'machine': platform.machine()
+        },
+        'results': results
+    }
+
+def compare_to_baseline(report: Dict, baseline: Dict,
+                        threshold: float = REGRESSION_THRESHOLD) -> List[Dict]:
+    """Returns the paths whose ops/sec dropped more than threshold below the baseline."""
+    regressions = []
+    for key, expected in baseline['results'].items():
+        actual = report['results'].get(key)
+        if actual is None:
+            continue
+        change = actual / expected - 1.0
+        if change < -threshold:
+            regressions.append({'case': key, 'baseline': expected, 'current': actual, 'change': change})
+    return regressions
+
+def check_concentrated_parity(swap_count: int = 2000, seed: int = 0, backend: str = "decimal") -> float:
+    """Replays swaps through a single-range concentrated pool and a constant-product pool.
+
+    Within one range the concentrated pool is a constant-product pool on its
+    virtual reserves, so both must quote the same outputs. Both pools are
+    fee-free: the constant-product pool folds fees into k while the
+    concentrated pool keeps them outside the curve, so with fees the two
+    drift apart over a sequence. Returns the worst relative deviation and
+    raises AssertionError above PARITY_RTOL["float"].
+    """
+    concentrated = HISAAMM(backend=backend, topology=[])
+    pool_id = concentrated.create_pool("HISA", "USDC", 100000, 250000, 0.0, pool_type="concentrated",
+                                       price_range=(0.01, 500.0))
+    reserve_a, reserve_b = concentrated.pools[pool_id].curve_reserves()
+    constant = HISAAMM(backend=backend, topology=[("HISA", "USDC", reserve_a, reserve_b, 0.0)])
+    worst = 0.0
+    for _, token_in, amount_in in random_swaps(constant, swap_count, seed):
+        expected = constant.execute_swap(pool_id, token_in, amount_in)['amount_out']
+        actual = concentrated.execute_swap(pool_id, token_in, amount_in)['amount_out']
+        worst = max(worst, abs(actual - expected) / expected)
+    assert worst <= PARITY_RTOL["float"], f"concentrated deviates from constant product by {worst:.3e}"
+    return worst
+
+def concentrated_amm(initialized_ticks: int, backend: str = "decimal") -> HISAAMM:
+    """Builds a HISA-USDC concentrated pool with adjacent one-spacing positions.
+
+    Every position adds the liquidity of the initial wide position, so the
+    active liquidity stays constant and a swap crosses one initialized tick
+    per TICK_SPACING ticks the price moves.
+    """
+    amm = HISAAMM(backend=backend, topology=[])
+    pool_id = amm.create_pool("HISA", "USDC", 100000, 250000, pool_type="concentrated",
+                              price_range=(0.025, 250.0), tick_spacing=TICK_SPACING)
+    pool = amm.pools[pool_id]
+    to_float = amm.backend.to_float
+    convert = amm.backend.convert
+    liquidity = to_float(pool.liquidity)
+    center = pool.tick - pool.tick % TICK_SPACING
+    for index in range(-(initialized_ticks // 2), initialized_ticks // 2):
+        lower = center + index * TICK_SPACING
+        sqrt_lower = to_float(pool._sqrt_price_at(lower))
+        sqrt_upper = to_float(pool._sqrt_price_at(lower + TICK_SPACING))
+        pool.add_position(lower, lower + TICK_SPACING,
+                          convert(liquidity * (1 / sqrt_lower - 1 / sqrt_upper)),
+                          convert(liquidity * (sqrt_upper - sqrt_lower)))
+    return amm
+
+def benchmark_tick_crossing(crossings: Sequence[int] = TICK_CROSSINGS,
+                            tick_counts: Sequence[int] = TICK_COUNTS, backend: str = "decimal",
+                            repeats: int = SUITE_REPEATS) -> Dict[str, Dict[str, float]]:
+    """Times round-trip swaps that cross a given number of initialized ticks each way.
+
+    Returns {"ticks=<n>/crossed=<m>": {'swaps_per_sec', 'us_per_crossing'}}.
+    Because the next tick is found by bisection, the cost per crossing stays
+    flat as the number of initialized ticks grows.
+    """
+    results = {}
+    for tick_count in tick_counts:
+        template = concentrated_amm(tick_count, backend)
+        pool_id = "HISA-USDC"
+        pool = template.pools[pool_id]
+        to_float = template.backend.to_float
+        for crossed in crossings:
+            if crossed >= tick_count // 2:
+                continue
+            # Input of A that moves sqrt(P) down across `crossed` ranges at constant liquidity.
+            sqrt_price = to_float(pool.sqrt_price)
+            sqrt_target = sqrt_price * 1.0001 ** (-(crossed + 0.5) * TICK_SPACING / 2)
+            amount_a = to_float(pool.liquidity) * (1 / sqrt_target - 1 / sqrt_price) / (1 - to_float(pool.fee_rate))
+
+            def round_trips():
+                amm = template.fork()
+                start = time.perf_counter()
+                for _ in range(20):
+                    amount_b = amm.execute_swap(pool_id, "HISA", amount_a)['amount_out']
+                    amm.execute_swap(pool_id, "USDC", amount_b)
+                return time.perf_counter() - start
+            elapsed = _median_time(round_trips, repeats)
+            results[f"ticks={tick_count}/crossed={crossed}"] = {
+                'swaps_per_sec': 40 / elapsed,
+                'us_per_crossing': elapsed / (40 * crossed) * 1e6
+            }
+    return results
+
+def stable_amms(backend: str = "decimal") -> Tuple[HISAAMM, HISAAMM]:
+    """Returns (stableswap, constant-product) AMMs each holding one 200k/200k JANI_STABLE-USDC pool."""
+    stable = HISAAMM(backend=backend, topology=[])
+    stable.create_pool("JANI_STABLE", "USDC", 200000, 200000, 0.001, pool_type="stableswap", amplification=100)
+    constant = HISAAMM(backend=backend, topology=[("JANI_STABLE", "USDC", 200000, 200000, 0.001)])
+    return stable, constant
+
+def benchmark_stableswap(swap_count: int = 5000, batch_size: int = 10000, seed: int = 0,
+                         backend: str = "decimal", repeats: int = SUITE_REPEATS) -> Dict[str, float]:
+    """Measures the StableSwap solver and swap path.
+
+    Returns Newton iterations per solve with warm starts (as executed) and
+    with cold starts (D from x + y, y from D, as in a stateless solver),
+    swaps/sec for the StableSwap and constant-product pools, and batch
+    quotes/sec for the vectorized get_swap_amounts_out against per-amount
+    get_swap_amount_out calls.
+    """
+    stable, constant = stable_amms(backend)
+    pool_id = "JANI_STABLE-USDC"
+    swaps = random_swaps(constant, swap_count, seed)
+    pool = stable.fork().pools[pool_id]
+    cold_iterations = cold_solves = 0
+    for _, token_in, amount_in in swaps:
+        reserve_in, reserve_out = pool._reserves(token_in == pool.token_a_symbol)
+        native = pool.backend.convert(amount_in)
+        solves, iterations = pool.newton_solves, pool.newton_iterations
+        invariant = pool._solve_invariant(pool.token_a_reserve, pool.token_b_reserve)
+        pool._solve_reserve(reserve_in + native - pool.backend.mul(native, pool.fee_rate), invariant, invariant)
+        cold_solves += pool.newton_solves - solves
+        cold_iterations += pool.newton_iterations - iterations
+        pool.newton_solves, pool.newton_iterations = solves, iterations
+        pool.swap(token_in, native)
+    results = {
+        'warm_iterations_per_solve': pool.newton_iterations / pool.newton_solves,
+        'cold_iterations_per_solve': cold_iterations / cold_solves
+    }
+    for name, amm in (('stableswap', stable), ('constant_product', constant)):
+        results[f'{name}_swaps_per_sec'] = swap_count / _timed_loop(lambda: (amm.fork().execute_swap, swaps), repeats)
+    amounts = np.random.default_rng(seed).uniform(1, 5000, batch_size)
+    results['batch_quotes_per_sec'] = batch_size / _median_time(
+        lambda: _elapsed(lambda: stable.get_swap_amounts_out(pool_id, "USDC", amounts)), repeats)
+    calls = [(pool_id, "USDC", amount) for amount in amounts[:swap_count].tolist()]
+    results['single_quotes_per_sec'] = len(calls) / _timed_loop(lambda: (stable.get_swap_amount_out, calls), repeats)
+    return results
+
+def _elapsed(run: Callable[[], object]) -> float:
+    start = time.perf_counter()
+    run()
+    return time.perf_counter() - start
+
+LP_POSITION_COUNTS = (1000, 100000, 1000000)
+
+def benchmark_lp_positions(position_counts: Sequence[int] = LP_POSITION_COUNTS, operations: int = 5000,
+                           seed: int = 0, backend: str = "decimal",
+                           repeats: int = SUITE_REPEATS) -> Dict[str, Dict[str, float]]:
+    """Times LP accounting against the number of positions in one pool.
+
+    Returns {"positions=<n>": {'swaps_per_sec', 'claims_per_sec',
+    'mints_per_sec', 'bytes_per_position'}}. Swaps only update the pool's
+    fee-growth accumulators and a claim settles one position, so both rates
+    should not depend on n.
+    """
+    rng = random.Random(seed)
+    results = {}
+    for count in position_counts:
+        amm = HISAAMM(backend=backend, topology=[("HISA", "USDC", 100000, 500000)])
+        pool_id = "HISA-USDC"
+        tracemalloc.start()
+        before = tracemalloc.get_traced_memory()[0]
+        for index in range(count):
+            amm.add_liquidity(pool_id, 0.01, 0.05, owner=f"lp{index % 1000}")
+        used = tracemalloc.get_traced_memory()[0] - before
+        tracemalloc.stop()
+        swaps = random_swaps(amm, operations, seed)
+        claims = [(pool_id, rng.randrange(count)) for _ in range(operations)]
+        mints = [(pool_id, 0.01, 0.05, "bench")] * operations
+        results[f"positions={count}"] = {
+            'swaps_per_sec': operations / _timed_loop(lambda: (amm.fork().execute_swap, swaps), repeats),
+            'claims_per_sec': operations / _timed_loop(lambda: (amm.fork().claim_fees, claims), repeats),
+            'mints_per_sec': operations / _timed_loop(lambda: (amm.fork().add_liquidity, mints), repeats),
+            'bytes_per_position': used / count
+        }
+    return results
+
+BATCH_BLOCK_SIZES = (10, 100, 1000)
+
+def benchmark_batch(block_sizes: Sequence[int] = BATCH_BLOCK_SIZES, order_count: int = 20000,
+                    seed: int = 0, backend: str = "decimal",
+                    repeats: int = SUITE_REPEATS) -> Dict[str, Dict[str, float]]:
+    """Times execute_batch with and without netting on the default pools.
+
+    Returns {"block=<n>": {'<mode>_orders_per_sec',
+    '<mode>_slippage_percent', '<mode>_worst_slippage_percent'}} for the
+    sequential and netted modes. Slippage is the USD value by which outputs
+    fall short of the pool prices before each block (net of fee) as a
+    percentage of the USD volume traded; worst slippage is the largest
+    shortfall of a single order relative to its own expected output.
+    """
+    amm = default_amm(backend)
+    orders = random_swaps(amm, order_count, seed)
+    usd = amm.get_ecosystem_token_prices()
+    volume = sum(amount_in * usd[token_in] for _, token_in, amount_in in orders)
+    results = {}
+    for block_size in block_sizes:
+        blocks = [(orders[start:start + block_size],) for start in range(0, len(orders), block_size)]
+        timing = {}
+        for mode, netting in (('sequential', False), ('netted', True)):
+            timing[f'{mode}_orders_per_sec'] = len(orders) / _timed_loop(
+                lambda: (functools.partial(amm.fork().execute_batch, netting=netting), blocks), repeats)
+            fork = amm.fork()
+            shortfall = worst = 0.0
+            for (block,) in blocks:
+                prices = {pool_id: fork.backend.to_float(fork.pools[pool_id].price_a_in_b) for pool_id, _, _ in block}
+                for (pool_id, token_in, amount_in), result in zip(block, fork.execute_batch(block, netting)):
+                    price = prices[pool_id] if token_in == fork.pools[pool_id].token_a_symbol else 1 / prices[pool_id]
+                    expected = (amount_in - result['fee_paid']) * price
+                    shortfall += (expected - result['amount_out']) * usd[result['token_out']]
+                    worst = max(worst, 1 - result['amount_out'] / expected)
+            timing[f'{mode}_slippage_percent'] = shortfall / volume * 100
+            timing[f'{mode}_worst_slippage_percent'] = worst * 100
+        results[f"block={block_size}"] = timing
+    return results
+
+def benchmark_depth(query_count: int = 20000, seed: int = 0, backend: str = "decimal",
+                    repeats: int = SUITE_REPEATS) -> Dict[str, float]:
+    """Measures DepthIndex against simulate_price_impact on the default pools.
+
+    Returns queries/sec for simulate_price_impact, impact lookups at the
+    standard trade sizes, closed-form impact and max-size queries at other
+    sizes and levels, and table builds/sec for constant-product and
+    StableSwap pools.
+    """
+    amm = default_amm(backend)
+    depth = DepthIndex(amm)
+    rng = random.Random(seed)
+    sizes = [rng.choice(DepthIndex.TRADE_SIZES) for _ in range(query_count)]
+    pairs = [(pool_id, token_in) for pool_id, token_in, _ in random_swaps(amm, query_count, seed)]
+    standard = [(pool_id, token_in, size) for (pool_id, token_in), size in zip(pairs, sizes)]
+    custom = [(pool_id, token_in, size * 1.5) for pool_id, token_in, size in standard]
+    levels = [(pool_id, token_in, rng.uniform(0.05, 20)) for pool_id, token_in in pairs]
+    results = {
+        'simulate_price_impact_per_sec': query_count / _timed_loop(lambda: (amm.simulate_price_impact, standard), repeats),
+        'table_impact_per_sec': query_count / _timed_loop(lambda: (depth.price_impact, standard), repeats),
+        'closed_form_impact_per_sec': query_count / _timed_loop(lambda: (depth.price_impact, custom), repeats),
+        'closed_form_max_size_per_sec': query_count / _timed_loop(lambda: (depth.max_trade_size, levels), repeats)
+    }
+    stable, _ = stable_amms(backend)
+    for name, source, pool_id in (('constant_product', amm, "HISA-USDC"), ('stableswap', stable, "JANI_STABLE-USDC")):
+        index = DepthIndex(source)
+        builds = max(1, query_count // 100)
+        results[f'{name}_builds_per_sec'] = builds / _timed_loop(lambda: (index._build, [(pool_id,)] * builds), repeats)
+    return results
+
+def _retained_bytes(operation: Callable, calls: List[Tuple]) -> float:
+    """Returns the traced memory per call still held by the results of operation(*args) for each call."""
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    results = [operation(*args) for args in calls]
+    used = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    del results
+    return max(used - 8 * len(calls), 0) / len(calls)
+
+def benchmark_results(call_count: int = 20000, seed: int = 0, backend: str = "decimal",
+                      repeats: int = SUITE_REPEATS) -> Dict[str, Dict[str, float]]:
+    """Times the dict API against the typed result API on the default pools.
+
+    Returns {"<method>": {'<mode>_us_per_call', '<mode>_bytes_per_result'}}
+    for the modes dict, typed (a new struct per call) and buffer (one struct
+    refilled through out=). Bytes per result is the memory a caller holds
+    for each kept result, excluding the list slot that keeps it.
+    """
+    amm = default_amm(backend)
+    swaps = random_swaps(amm, call_count, seed)
+    lookups = [(pool_id,) for pool_id, _, _ in swaps]
+    cases = {
+        'pool_info': (lambda: amm.get_pool_info, lambda: amm.read_pool_info,
+                      lambda: functools.partial(amm.read_pool_info, out=PoolInfo()), lookups),
+        'price_impact': (lambda: amm.simulate_price_impact, lambda: amm.quote_price_impact,
+                         lambda: functools.partial(amm.quote_price_impact, out=PriceImpact()), swaps),
+        'swap': (lambda: amm.fork().execute_swap, lambda: amm.fork().swap,
+                 lambda: functools.partial(amm.fork().swap, out=SwapResult()), swaps)
+    }
+    results = {}
+    for name, (dict_api, typed_api, buffer_api, calls) in cases.items():
+        timing = {}
+        for mode, api in (('dict', dict_api), ('typed', typed_api), ('buffer', buffer_api)):
+            timing[f'{mode}_us_per_call'] = _timed_loop(lambda: (api(), calls), repeats) / len(calls) * 1e6
+            timing[f'{mode}_bytes_per_result'] = _retained_bytes(api(), calls)
+        results[name] = timing
+    return results
+
+def _report_backends():
+    deviations = check_backend_parity()
+    rates = benchmark_backends()
+    print(f"{'backend':<10}{'max rel dev':>14}{'swaps/sec':>14}{'speedup':>10}")
+    for name in BACKENDS:
+        print(f"{name:<10}{deviations[name]:>14.2e}{rates[name]:>14,.0f}{rates[name] / rates['decimal']:>9.2f}x")
+    check_thread_safety()
+    thread_rates = benchmark_threads()
+    print(f"\n{'threads':<10}{'swaps/sec':>14}{'scaling':>10}")
+    for threads, rate in thread_rates.items():
+        print(f"{threads:<10}{rate:>14,.0f}{rate / thread_rates[1]:>9.2f}x")
+
+def main():
+    parser = argparse.ArgumentParser(description="HISA AMM backend checks and hot-path benchmark suite.")
+    subparsers = parser.add_subparsers(dest="command")
+    subparsers.add_parser("backends", help="Backend parity, speedups and thread scaling (default)")
+    suite = subparsers.add_parser("suite", help="Time the hot paths and gate against a baseline")
+    suite.add_argument("--pools", type=int, nargs="+", default=list(SUITE_POOL_COUNTS))
+    suite.add_argument("--trades", type=int, nargs="+", default=list(SUITE_TRADE_COUNTS))
+    suite.add_argument("--backend", choices=list(BACKENDS), default="decimal")
+    suite.add_argument("--repeats", type=int, default=SUITE_REPEATS)
+    suite.add_argument("--seed", type=int, default=0)
+    suite.add_argument("--runs", type=int, default=1,
+                       help="Run the grid this many times and keep each path's median")
+    suite.add_argument("--baseline", help="JSON baseline to compare against")
+    suite.add_argument("--threshold", type=float, default=REGRESSION_THRESHOLD,
+                       help="Allowed fractional slowdown before a path fails")
+    suite.add_argument("--save-baseline", help="Write the results as a JSON baseline")
+    ticks = subparsers.add_parser("ticks", help="Concentrated-liquidity parity and tick-crossing timings")
+    ticks.add_argument("--crossed", type=int, nargs="+", default=list(TICK_CROSSINGS))
+    ticks.add_argument("--initialized", type=int, nargs="+", default=list(TICK_COUNTS))
+    ticks.add_argument("--backend", choices=list(BACKENDS), default="decimal")
+    ticks.add_argument("--repeats", type=int, default=SUITE_REPEATS)
+    stableswap = subparsers.add_parser("stableswap", help="StableSwap solver iterations and throughput")
+    stableswap.add_argument("--swaps", type=int, default=5000)
+    stableswap.add_argument("--batch", type=int, default=10000)
+    stableswap.add_argument("--backend", choices=list(BACKENDS), default="decimal")
+    stableswap.add_argument("--repeats", type=int, default=SUITE_REPEATS)
+    lp = subparsers.add_parser("lp", help="LP share accounting cost against the number of positions")
+    lp.add_argument("--positions", type=int, nargs="+", default=list(LP_POSITION_COUNTS))
+    lp.add_argument("--operations", type=int, default=5000)
+    lp.add_argument("--backend", choices=list(BACKENDS), default="decimal")
+    lp.add_argument("--repeats", type=int, default=SUITE_REPEATS)
+    batch = subparsers.add_parser("batch", help="Netted versus sequential block execution")
+    batch.add_argument("--orders", type=int, default=20000)
+    batch.add_argument("--block-sizes", type=int, nargs="+", default=list(BATCH_BLOCK_SIZES))
+    batch.add_argument("--backend", choices=list(BACKENDS), default="decimal")
+    batch.add_argument("--repeats", type=int, default=SUITE_REPEATS)
+    depth = subparsers.add_parser("depth", help="Depth table lookups versus simulate_price_impact")
+    depth.add_argument("--queries", type=int, default=20000)
+    depth.add_argument("--backend", choices=list(BACKENDS), default="decimal")
+    depth.add_argument("--repeats", type=int, default=SUITE_REPEATS)
+    results = subparsers.add_parser("results", help="Dict results versus typed and reused result structs")
+    results.add_argument("--calls", type=int, default=20000)
+    results.add_argument("--backend", choices=list(BACKENDS), default="decimal")
+    results.add_argument("--repeats", type=int, default=SUITE_REPEATS)
+    args = parser.parse_args()
+    if args.command == "results":
+        modes = ('dict', 'typed', 'buffer')
+        print(f"{'method':<14}" + "".join(f"{mode + ' us':>11}" for mode in modes)
+              + "".join(f"{mode + ' B':>10}" for mode in modes))
+        for key, timing in benchmark_results(args.calls, backend=args.backend, repeats=args.repeats).items():
+            print(f"{key:<14}" + "".join(f"{timing[mode + '_us_per_call']:>11.2f}" for mode in modes)
+                  + "".join(f"{timing[mode + '_bytes_per_result']:>10,.0f}" for mode in modes))
+        return
+    if args.command == "depth":
+        for key, value in benchmark_depth(args.queries, backend=args.backend, repeats=args.repeats).items():
+            print(f"{key:<32}{value:>14,.0f}")
+        return
+    if args.command == "batch":
+        print(f"{'case':<14}{'seq orders/s':>14}{'net orders/s':>14}{'seq slip %':>12}{'net slip %':>12}"
+              f"{'seq worst %':>13}{'net worst %':>13}")
+        for key, timing in benchmark_batch(args.block_sizes, args.orders, backend=args.backend,
+                                           repeats=args.repeats).items():
+            print(f"{key:<14}{timing['sequential_orders_per_sec']:>14,.0f}{timing['netted_orders_per_sec']:>14,.0f}"
+                  f"{timing['sequential_slippage_percent']:>12.4f}{timing['netted_slippage_percent']:>12.4f}"
+                  f"{timing['sequential_worst_slippage_percent']:>13.2f}{timing['netted_worst_slippage_percent']:>13.2f}")
+        return
+    if args.command == "lp":
+        print(f"{'case':<20}{'swaps/sec':>12}{'claims/sec':>12}{'mints/sec':>12}{'bytes/pos':>11}")
+        for key, timing in benchmark_lp_positions(args.positions, args.operations, backend=args.backend,
+                                                  repeats=args.repeats).items():
+            print(f"{key:<20}{timing['swaps_per_sec']:>12,.0f}{timing['claims_per_sec']:>12,.0f}"
+                  f"{timing['mints_per_sec']:>12,.0f}{timing['bytes_per_position']:>11,.0f}")
+        return
+    if args.command == "stableswap":
+        for key, value in benchmark_stableswap(args.swaps, args.batch, backend=args.backend,
+                                               repeats=args.repeats).items():
+            print(f"{key:<30}{value:>14,.2f}")
+        return
+    if args.command == "ticks":
+        print(f"single-range parity: max rel dev {check_concentrated_parity(backend=args.backend):.2e}")
+        print(f"{'case':<28}{'swaps/sec':>12}{'us/crossing':>14}")
+        for key, timing in benchmark_tick_crossing(args.crossed, args.initialized, args.backend,
+                                                   args.repeats).items():
+            print(f"{key:<28}{timing['swaps_per_sec']:>12,.0f}{timing['us_per_crossing']:>14.2f}")
+        return
+    if args.command != "suite":
+        _report_backends()
+        return
+    report = run_suite(args.pools, args.trades, args.backend, args.seed, args.repeats, args.runs)
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as handle:
+            baseline = json.load(handle)
+    print(f"{'case':<58}{'ops/sec':>14}{'vs baseline':>13}")
+    for key, rate in report['results'].items():
+        expected = baseline['results'].get(key) if baseline else None
+        change = f"{rate / expected - 1.0:>+12.1%}" if expected else f"{'-':>12}"
+        print(f"{key:<58}{rate:>14,.0f} {change}")
+    if args.save_baseline:
+        with open(args.save_baseline, "w") as handle:
+            json.dump(report, handle, indent=2, sort_keys=True)
+            handle.write("\n")
+    if baseline:
+        regressions = compare_to_baseline(report, baseline, args.threshold)
+        for regression in regressions:
+            print(f"REGRESSION {regression['case']}: {regression['current']:,.0f} ops/sec, "
+                  f"{regression['change']:+.1%} vs {regression['baseline']:,.0f}")
+        if regressions:
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
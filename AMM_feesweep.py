@@ -0,0 +1,298 @@
+"""Fee-rate sweeps for HISAAMM constant-product pools.
+
+Evaluates a grid of fee rates for each pool under the same order flow and
+reports fee-vs-volume-vs-LP-return surfaces and the revenue-maximizing fee.
+The flow is either synthetic (the Monte Carlo model of AMM_montecarlo:
+geometric Brownian external price, lognormal noise trades and an
+arbitrageur) or replayed from an AMM_replay event file. Noise traders are
+fee sensitive: each trade carries a tolerance drawn around
+SweepConfig.fee_tolerance and only executes in pools whose fee is at most
+that, so volume falls as the fee rises while arbitrage responds through
+the usual no-trade band.
+
+The base reserves and flow arrays are written once into a shared-memory
+block. Worker processes map it when they start, and a task is only a pool
+index plus a slice of the fee grid, so nothing large is pickled. Each task
+simulates its fee rates and paths together as one vectorized numpy state.
+
+Usage:
+
+    python AMM_feesweep.py --fees 0.0005 0.02 200 --paths 64
+    python AMM_feesweep.py --events events.jsonl --pools HISA-USDC --fees 0.001 0.01 50
+"""
+import argparse
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, asdict
+from multiprocessing import shared_memory
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+from AMM_replay import read_events
+from AMM_simulator import BACKENDS, CurvePool, HISAAMM
+
+FLOW_FIELDS = ("buy_a", "amount", "tolerance", "external_price")
+RESULT_FIELDS = ("volume_usd", "fee_revenue_usd", "lp_return_percent", "lp_vs_hold_percent")
+
+@dataclass
+class SweepConfig:
+    """Synthetic order-flow model shared by every pool in a sweep."""
+    days: int = 30
+    steps_per_day: int = 24
+    daily_volatility: float = 0.05
+    daily_volume_fraction: float = 0.05  # mean noise volume per day as a fraction of TVL
+    trade_size_sigma: float = 1.0
+    fee_tolerance: Optional[float] = 0.005  # median fee a noise trader accepts; None accepts any fee
+    tolerance_sigma: float = 1.0
+    arbitrage: bool = True
+
+def synthetic_flow(reserve_a: float, reserve_b: float, config: SweepConfig, paths: int,
+                   seed: np.random.SeedSequence) -> np.ndarray:
+    """Returns flow arrays of shape (len(FLOW_FIELDS), paths, steps) for one pool.
+
+    buy_a is 1 where a trade buys A with B (amount in B) and 0 where it
+    sells A (amount in A); sizes are lognormal in value terms as in
+    AMM_montecarlo.
+    """
+    rng = np.random.default_rng(seed)
+    steps = config.days * config.steps_per_day
+    dt = 1.0 / config.steps_per_day
+    sigma = config.daily_volatility
+    shocks = (-0.5 * sigma * sigma) * dt + sigma * np.sqrt(dt) * rng.standard_normal((paths, steps))
+    external_price = (reserve_b / reserve_a) * np.exp(np.cumsum(shocks, axis=1))
+    mean_trade_value = config.daily_volume_fraction * 2.0 * reserve_b * dt
+    size_sigma = config.trade_size_sigma
+    trade_value = rng.lognormal(np.log(mean_trade_value) - 0.5 * size_sigma * size_sigma, size_sigma, (paths, steps))
+    buy_a = rng.random((paths, steps)) < 0.5
+    flow = np.empty((len(FLOW_FIELDS), paths, steps))
+    flow[0] = buy_a
+    flow[1] = np.where(buy_a, trade_value, trade_value / external_price)
+    flow[2] = _tolerances(rng, config, (paths, steps))
+    flow[3] = external_price if config.arbitrage else np.nan
+    return flow
+
+def _tolerances(rng: np.random.Generator, config: SweepConfig, shape) -> np.ndarray:
+    if config.fee_tolerance is None:
+        return np.full(shape, np.inf)
+    return rng.lognormal(np.log(config.fee_tolerance), config.tolerance_sigma, shape)
+
+def replayed_flows(path: str, pools: Dict[str, tuple], config: SweepConfig,
+                   seed: np.random.SeedSequence) -> Dict[str, np.ndarray]:
+    """Builds one-path flow arrays from the swap events of an AMM_replay file.
+
+    pools maps pool_id to (token_a, token_b). There is no external price in
+    a replay, so arbitrage is off and positions are valued at the pool's own
+    final price; trade tolerances are still drawn from config.
+    """
+    trades: Dict[str, List[tuple]] = {pool_id: [] for pool_id in pools}
+    for _, event in read_events(path):
+        pool_id = event.get('pool_id')
+        if event.get('type', 'swap') != 'swap' or pool_id not in trades:
+            continue
+        trades[pool_id].append((event['token_in'] == pools[pool_id][1], float(event['amount_in'])))
+    rng = np.random.default_rng(seed)
+    flows = {}
+    for pool_id, rows in trades.items():
+        flow = np.empty((len(FLOW_FIELDS), 1, len(rows)))
+        flow[0:2, 0] = np.array(rows, dtype=np.float64).reshape(-1, 2).T
+        flow[2] = _tolerances(rng, config, (1, len(rows)))
+        flow[3] = np.nan
+        flows[pool_id] = flow
+    return flows
+
+def _simulate(reserve_a: float, reserve_b: float, flow: np.ndarray, fee_rates: np.ndarray) -> np.ndarray:
+    """Runs every path of flow against every fee rate; returns path means of shape (4, fees).
+
+    Volumes and revenue are in token B; the caller converts them to USD.
+    """
+    paths, steps = flow.shape[1:]
+    fee = np.broadcast_to(fee_rates, (paths, len(fee_rates)))
+    gamma = 1.0 - fee
+    ra = np.full(fee.shape, reserve_a)
+    rb = np.full(fee.shape, reserve_b)
+    volume = np.zeros(fee.shape)
+    revenue = np.zeros(fee.shape)
+    buy_a_flow, amount_flow, tolerance_flow, price_flow = (flow[index][:, :, None] for index in range(4))
+    # Replayed flows carry no external price (NaN); they are not arbitraged.
+    arbitrage = steps > 0 and not np.isnan(flow[3]).any()
+    for step in range(steps):
+        buy_a = buy_a_flow[:, step] > 0
+        external_price = price_flow[:, step]
+        price = np.where(np.isnan(external_price), rb / ra, external_price)
+        amount_in = np.where(fee <= tolerance_flow[:, step], amount_flow[:, step], 0.0)
+        effective_in = gamma * amount_in
+        out_a = ra * effective_in / (rb + effective_in)
+        out_b = rb * effective_in / (ra + effective_in)
+        value = np.where(buy_a, amount_in, amount_in * price)
+        volume += value
+        revenue += fee * value
+        ra = np.where(buy_a, ra - out_a, ra + amount_in)
+        rb = np.where(buy_a, rb + amount_in, rb - out_b)
+        if arbitrage:
+            # Profit-maximizing sizes for buying A with B and selling A for B.
+            buy_size = np.maximum((np.sqrt(gamma * external_price * ra * rb) - rb) / gamma, 0.0)
+            sell_size = np.maximum((np.sqrt(gamma * ra * rb / external_price) - ra) / gamma, 0.0)
+            out_a = ra * gamma * buy_size / (rb + gamma * buy_size)
+            out_b = rb * gamma * sell_size / (ra + gamma * sell_size)
+            value = buy_size + sell_size * external_price
+            volume += value
+            revenue += fee * value
+            ra = ra - out_a + sell_size
+            rb = rb + buy_size - out_b
+    final_price = flow[3][:, -1:] if arbitrage else rb / ra
+    final_value = ra * final_price + rb
+    hold_value = reserve_a * final_price + reserve_b
+    initial_value = 2.0 * reserve_b
+    return np.stack([
+        volume.mean(axis=0),
+        revenue.mean(axis=0),
+        ((final_value / initial_value - 1.0) * 100).mean(axis=0),
+        ((final_value / hold_value - 1.0) * 100).mean(axis=0)
+    ])
+
+# Worker-side view of the shared block, set once per process by _attach.
+_shared: Dict = {}
+
+def _attach(name: str, layout: Dict):
+    block = shared_memory.SharedMemory(name=name)
+    _shared['block'] = block
+    _shared['layout'] = layout
+    _shared['data'] = np.ndarray((layout['size'],), dtype=np.float64, buffer=block.buf)
+
+def _run_task(task) -> np.ndarray:
+    pool_index, fee_rates = task
+    layout = _shared['layout']
+    data = _shared['data']
+    reserve_a, reserve_b = data[2 * pool_index:2 * pool_index + 2]
+    start, shape = layout['flows'][pool_index]
+    flow = data[start:start + int(np.prod(shape))].reshape(shape)
+    return _simulate(reserve_a, reserve_b, flow, np.asarray(fee_rates))
+
+def sweep_fees(amm: HISAAMM, fee_rates: Sequence[float], pool_ids: Optional[Sequence[str]] = None,
+               paths: int = 32, config: Optional[SweepConfig] = None, seed: int = 0,
+               workers: Optional[int] = None, chunk_size: int = 16,
+               events_path: Optional[str] = None) -> Dict:
+    """Evaluates every fee rate in fee_rates for each pool in pool_ids.
+
+    Defaults to all constant-product pools. Each pool sees the same flow at
+    every fee rate, drawn from its own child of one SeedSequence, so results
+    are reproducible from the seed for any worker count. With events_path
+    the swap events of that AMM_replay file are the flow instead (one path).
+    Returns {'pools': {pool_id: surface}} where a surface holds the fee
+    rates, one list per RESULT_FIELDS entry and the revenue- and
+    return-maximizing fee rates. workers=1 runs in-process.
+    """
+    config = config or SweepConfig()
+    fee_rates = np.asarray(fee_rates, dtype=np.float64)
+    if fee_rates.ndim != 1 or len(fee_rates) == 0 or (fee_rates < 0).any() or (fee_rates >= 1).any():
+        raise ValueError("fee_rates must be a non-empty list of rates in [0, 1).")
+    if paths <= 0 or chunk_size <= 0:
+        raise ValueError("paths and chunk_size must be positive.")
+    if pool_ids is None:
+        pool_ids = [pool_id for pool_id, pool in amm.pools.items() if not isinstance(pool, CurvePool)]
+    to_float = amm.backend.to_float
+    pools = {}
+    for pool_id in pool_ids:
+        if pool_id not in amm.pools:
+            raise ValueError(f"Pool {pool_id} does not exist")
+        pool = amm.pools[pool_id]
+        if isinstance(pool, CurvePool):
+            raise ValueError(f"The fee sweep model is constant-product; {pool_id} is {pool.pool_type}.")
+        pools[pool_id] = (pool.token_a_symbol, pool.token_b_symbol,
+                          to_float(pool.token_a_reserve), to_float(pool.token_b_reserve))
+    seeds = np.random.SeedSequence(seed).spawn(len(pools) + 1)
+    if events_path is not None:
+        flows = replayed_flows(events_path, {pool_id: spec[:2] for pool_id, spec in pools.items()}, config, seeds[-1])
+    else:
+        flows = {pool_id: synthetic_flow(spec[2], spec[3], config, paths, pool_seed)
+                 for (pool_id, spec), pool_seed in zip(pools.items(), seeds)}
+    # One float64 block: every pool's (reserve_a, reserve_b), then each pool's flow arrays.
+    layout = {'flows': [], 'size': 2 * len(pools)}
+    for flow in flows.values():
+        layout['flows'].append((layout['size'], flow.shape))
+        layout['size'] += flow.size
+    block = shared_memory.SharedMemory(create=True, size=max(8, layout['size'] * 8))
+    try:
+        data = np.ndarray((layout['size'],), dtype=np.float64, buffer=block.buf)
+        for index, spec in enumerate(pools.values()):
+            data[2 * index:2 * index + 2] = spec[2:]
+        for (start, shape), flow in zip(layout['flows'], flows.values()):
+            data[start:start + flow.size] = flow.ravel()
+        del data
+        tasks = [(index, fee_rates[start:start + chunk_size].tolist())
+                 for index in range(len(pools)) for start in range(0, len(fee_rates), chunk_size)]
+        workers = workers or os.cpu_count() or 1
+        if workers == 1 or len(tasks) == 1:
+            _attach(block.name, layout)
+            try:
+                chunks = [_run_task(task) for task in tasks]
+            finally:
+                _shared.pop('block').close()
+                _shared.clear()
+        else:
+            with ProcessPoolExecutor(max_workers=min(workers, len(tasks)), initializer=_attach,
+                                     initargs=(block.name, layout)) as executor:
+                chunks = list(executor.map(_run_task, tasks))
+    finally:
+        block.close()
+        block.unlink()
+    prices = amm.get_ecosystem_token_prices()
+    chunks_per_pool = len(tasks) // len(pools) if pools else 0
+    surfaces = {}
+    for index, (pool_id, spec) in enumerate(pools.items()):
+        results = np.hstack(chunks[index * chunks_per_pool:(index + 1) * chunks_per_pool])
+        usd = prices.get(spec[1], 0.0)
+        results[0:2] *= usd
+        surface = {'token_a': spec[0], 'token_b': spec[1], 'fee_rates': fee_rates.tolist()}
+        for key, row in zip(RESULT_FIELDS, results):
+            surface[key] = row.tolist()
+        surface['best_revenue_fee_rate'] = float(fee_rates[np.argmax(results[1])])
+        surface['best_lp_return_fee_rate'] = float(fee_rates[np.argmax(results[2])])
+        surfaces[pool_id] = surface
+    return {
+        'paths': 1 if events_path is not None else paths,
+        'seed': seed,
+        'events': events_path,
+        'config': asdict(config),
+        'pools': surfaces
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Sweep fee rates per pool under synthetic or replayed order flow.")
+    parser.add_argument("--fees", type=float, nargs=3, metavar=("MIN", "MAX", "COUNT"), default=(0.0005, 0.02, 40),
+                        help="Evenly spaced fee-rate grid")
+    parser.add_argument("--pools", nargs="+", help="Pool ids (default: every constant-product pool)")
+    parser.add_argument("--paths", type=int, default=32)
+    parser.add_argument("--days", type=int, default=30)
+    parser.add_argument("--fee-tolerance", type=float, default=0.005,
+                        help="Median fee rate noise traders accept; 0 makes them fee-insensitive")
+    parser.add_argument("--events", help="AMM_replay JSONL/CSV file to use as the order flow")
+    parser.add_argument("--workers", type=int)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--backend", choices=list(BACKENDS), default="decimal")
+    parser.add_argument("--config", help="JSON topology file (see amm.json.sample)")
+    parser.add_argument("--json", action="store_true", help="Print the full surfaces as JSON")
+    args = parser.parse_args()
+    amm = HISAAMM.from_config(args.config) if args.config else HISAAMM(backend=args.backend)
+    fee_rates = np.linspace(args.fees[0], args.fees[1], int(args.fees[2]))
+    config = SweepConfig(days=args.days, fee_tolerance=args.fee_tolerance or None)
+    start = time.perf_counter()
+    report = sweep_fees(amm, fee_rates, args.pools, args.paths, config, args.seed, args.workers,
+                        events_path=args.events)
+    elapsed = time.perf_counter() - start
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+    points = len(fee_rates) * len(report['pools'])
+    print(f"{points:,} grid points x {report['paths']} paths in {elapsed:.2f}s")
+    print(f"{'pool':<22}{'best fee':>10}{'revenue $':>14}{'volume $':>16}{'LP return %':>13}")
+    for pool_id, surface in report['pools'].items():
+        best = surface['fee_rates'].index(surface['best_revenue_fee_rate'])
+        print(f"{pool_id:<22}{surface['best_revenue_fee_rate']:>10.4%}{surface['fee_revenue_usd'][best]:>14,.0f}"
+              f"{surface['volume_usd'][best]:>16,.0f}{surface['lp_return_percent'][best]:>13.2f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,278 @@
+"""Opt-in hot-path instrumentation for HISAAMM and RewardCalculator.
+
+instrument() wraps the public methods of one AMM (and optionally one
+RewardCalculator) so every call is counted and timed into a latency
+histogram, and every executed swap adds to per-pool volume and fee
+counters. Nothing is wrapped until instrument() is called and
+uninstrument() removes the wrappers again, so an AMM without metrics runs
+exactly the same code as before.
+
+Metrics export as JSON or Prometheus text. The settings in
+logger.json.sample are honoured: metricsId becomes an instance label and,
+unless metricsHcsDisabled is set, publish_hcs() chunks the JSON dump into
+HCS-sized messages for metricsHcsTopicId.
+
+Usage:
+
+    python AMM_metrics.py --config logger.json.sample --swaps 10000 --format prometheus
+"""
+import argparse
+import bisect
+import json
+import random
+import threading
+import time
+from typing import Callable, Dict, List, Optional
+
+from AMM_simulator import BACKENDS, HISAAMM, RewardCalculator
+
+# Upper bounds of the latency histogram buckets, in seconds.
+LATENCY_BUCKETS = (1e-6, 2.5e-6, 5e-6, 1e-5, 2.5e-5, 5e-5, 1e-4, 2.5e-4, 5e-4,
+                   1e-3, 2.5e-3, 5e-3, 1e-2, 2.5e-2, 5e-2, 0.1, 0.25, 0.5, 1.0)
+AMM_METHODS = ("create_pool", "load_pools", "get_swap_amount_out", "get_swap_amounts_out",
+               "execute_swap", "swap", "execute_batch", "add_liquidity", "remove_liquidity", "claim_fees",
+               "get_position_info", "simulate_price_impact", "quote_price_impact", "get_pool_info",
+               "read_pool_info",
+               "get_ecosystem_token_prices", "get_token_price", "fork")
+CALCULATOR_METHODS = ("calculate_lp_rewards", "simulate_lp_returns",
+                      "calculate_arbitrage_opportunity", "find_arbitrage_cycles")
+# HCS messages are limited to 1024 bytes per chunk and 20 chunks per message.
+HCS_CHUNK_SIZE = 1024
+HCS_MAX_CHUNKS = 20
+
+def load_metrics_config(path: str = "logger.json.sample") -> Dict:
+    """Reads the "config" block of a logger.json-style file."""
+    with open(path) as handle:
+        return json.load(handle).get('config', {})
+
+class MetricsRegistry:
+    """Call counters, latency histograms and per-pool swap counters."""
+
+    def __init__(self, config: Optional[Dict] = None):
+        self.config = config or {}
+        self.calls: Dict[str, int] = {}
+        self.errors: Dict[str, int] = {}
+        self.latency_buckets: Dict[str, List[int]] = {}
+        self.latency_sum: Dict[str, float] = {}
+        self.pool_swaps: Dict[str, int] = {}
+        self.pool_volume: Dict[str, Dict[str, float]] = {}
+        self.pool_fees: Dict[str, Dict[str, float]] = {}
+        self.started_at = time.time()
+        self._lock = threading.Lock()
+
+    @property
+    def hcs_enabled(self) -> bool:
+        return not self.config.get('metricsHcsDisabled', True) and bool(self.config.get('metricsHcsTopicId'))
+
+    def observe_call(self, method: str, seconds: float, failed: bool = False):
+        with self._lock:
+            buckets = self.latency_buckets.get(method)
+            if buckets is None:
+                buckets = self.latency_buckets[method] = [0] * (len(LATENCY_BUCKETS) + 1)
+                self.latency_sum[method] = 0.0
+            buckets[bisect.bisect_left(LATENCY_BUCKETS, seconds)] += 1
+            self.latency_sum[method] += seconds
+            self.calls[method] = self.calls.get(method, 0) + 1
+            if failed:
+                self.errors[method] = self.errors.get(method, 0) + 1
+
+    def observe_swap(self, pool_id: str, token_in: str, amount_in: float, fee: float):
+        with self._lock:
+            self.pool_swaps[pool_id] = self.pool_swaps.get(pool_id, 0) + 1
+            volume = self.pool_volume.setdefault(pool_id, {})
+            volume[token_in] = volume.get(token_in, 0.0) + amount_in
+            fees = self.pool_fees.setdefault(pool_id, {})
+            fees[token_in] = fees.get(token_in, 0.0) + fee
+
+    def reset(self):
+        with self._lock:
+            for counters in (self.calls, self.errors, self.latency_buckets, self.latency_sum,
+                             self.pool_swaps, self.pool_volume, self.pool_fees):
+                counters.clear()
+            self.started_at = time.time()
+
+    def _quantile(self, method: str, q: float) -> float:
+        """Estimates a latency quantile as the upper bound of the bucket that contains it."""
+        buckets = self.latency_buckets[method]
+        rank = q * self.calls[method]
+        seen = 0
+        for bound, count in zip(LATENCY_BUCKETS, buckets):
+            seen += count
+            if seen >= rank:
+                return bound
+        return float('inf')
+
+    def to_json(self) -> Dict:
+        """Returns every metric as a JSON-serializable dict, slowest methods by total time first."""
+        with self._lock:
+            methods = {}
+            for method in sorted(self.calls, key=lambda name: -self.latency_sum[name]):
+                count = self.calls[method]
+                methods[method] = {
+                    'calls': count,
+                    'errors': self.errors.get(method, 0),
+                    'total_seconds': self.latency_sum[method],
+                    'mean_seconds': self.latency_sum[method] / count,
+                    'p50_seconds': self._quantile(method, 0.5),
+                    'p99_seconds': self._quantile(method, 0.99),
+                    'buckets': dict(zip([str(bound) for bound in LATENCY_BUCKETS] + ["+Inf"],
+                                        self.latency_buckets[method]))
+                }
+            return {
+                'metrics_id': self.config.get('metricsId', ""),
+                'started_at': self.started_at,
+                'uptime_seconds': time.time() - self.started_at,
+                'methods': methods,
+                'pools': {
+                    pool_id: {
+                        'swaps': swaps,
+                        'volume': dict(self.pool_volume[pool_id]),
+                        'fees': dict(self.pool_fees[pool_id])
+                    }
+                    for pool_id, swaps in sorted(self.pool_swaps.items())
+                }
+            }
+
+    def to_prometheus(self) -> str:
+        """Returns every metric in the Prometheus text exposition format."""
+        instance = self.config.get('metricsId', "")
+        base = f'instance="{instance}",' if instance else ""
+        lines = ["# HELP amm_calls_total Calls per instrumented method.",
+                 "# TYPE amm_calls_total counter"]
+        with self._lock:
+            for method, count in sorted(self.calls.items()):
+                lines.append(f'amm_calls_total{{{base}method="{method}"}} {count}')
+            lines += ["# HELP amm_call_errors_total Calls that raised, per instrumented method.",
+                      "# TYPE amm_call_errors_total counter"]
+            for method in sorted(self.calls):
+                lines.append(f'amm_call_errors_total{{{base}method="{method}"}} {self.errors.get(method, 0)}')
+            lines += ["# HELP amm_call_duration_seconds Latency of instrumented methods.",
+                      "# TYPE amm_call_duration_seconds histogram"]
+            for method, buckets in sorted(self.latency_buckets.items()):
+                cumulative = 0
+                for bound, count in zip(LATENCY_BUCKETS, buckets):
+                    cumulative += count
+                    lines.append(f'amm_call_duration_seconds_bucket{{{base}method="{method}",le="{bound:g}"}} {cumulative}')
+                lines.append(f'amm_call_duration_seconds_bucket{{{base}method="{method}",le="+Inf"}} {self.calls[method]}')
+                lines.append(f'amm_call_duration_seconds_sum{{{base}method="{method}"}} {self.latency_sum[method]!r}')
+                lines.append(f'amm_call_duration_seconds_count{{{base}method="{method}"}} {self.calls[method]}')
+            lines += ["# HELP amm_pool_swaps_total Executed swaps per pool.",
+                      "# TYPE amm_pool_swaps_total counter"]
+            for pool_id, swaps in sorted(self.pool_swaps.items()):
+                lines.append(f'amm_pool_swaps_total{{{base}pool_id="{pool_id}"}} {swaps}')
+            for name, counters, help_text in (
+                    ("amm_pool_volume_total", self.pool_volume, "Swap input volume per pool and input token."),
+                    ("amm_pool_fees_total", self.pool_fees, "Swap fees per pool, in units of the input token.")):
+                lines += [f"# HELP {name} {help_text}", f"# TYPE {name} counter"]
+                for pool_id, by_token in sorted(counters.items()):
+                    for token, value in sorted(by_token.items()):
+                        lines.append(f'{name}{{{base}pool_id="{pool_id}",token="{token}"}} {value!r}')
+        return "\n".join(lines) + "\n"
+
+    def hcs_messages(self) -> List[bytes]:
+        """Splits the JSON dump into HCS-sized chunks; empty when HCS publishing is disabled."""
+        if not self.hcs_enabled:
+            return []
+        payload = json.dumps(self.to_json(), separators=(",", ":")).encode()
+        chunks = [payload[start:start + HCS_CHUNK_SIZE] for start in range(0, len(payload), HCS_CHUNK_SIZE)]
+        if len(chunks) > HCS_MAX_CHUNKS:
+            raise ValueError(f"Metrics dump needs {len(chunks)} HCS chunks; the limit is {HCS_MAX_CHUNKS}")
+        return chunks
+
+    def publish_hcs(self, submit: Callable[[str, str, bytes], None]) -> int:
+        """Sends the dump through submit(topic_id, memo, chunk); returns the chunks sent.
+
+        submit is supplied by the caller's Hedera client. Nothing is sent
+        when metricsHcsDisabled is set or no topic is configured.
+        """
+        chunks = self.hcs_messages()
+        for chunk in chunks:
+            submit(self.config['metricsHcsTopicId'], self.config.get('metricsHcsTopicMemo', ""), chunk)
+        return len(chunks)
+
+def _timed(registry: MetricsRegistry, name: str, method: Callable) -> Callable:
+    def wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            result = method(*args, **kwargs)
+        except BaseException:
+            registry.observe_call(name, time.perf_counter() - start, failed=True)
+            raise
+        registry.observe_call(name, time.perf_counter() - start)
+        return result
+    wrapper.__wrapped__ = method
+    return wrapper
+
+def instrument(amm: HISAAMM, calculator: Optional[RewardCalculator] = None,
+               registry: Optional[MetricsRegistry] = None) -> MetricsRegistry:
+    """Starts recording metrics for amm (and calculator); returns the registry.
+
+    Wrappers are installed as instance attributes, so other AMMs and the
+    classes themselves are untouched. Swap volume and fees are taken from
+    _execute_swap, which also covers SwapRouter.execute_route hops, and
+    from _settle_netted for the netted orders of execute_batch.
+    """
+    registry = registry or MetricsRegistry()
+    for name in AMM_METHODS:
+        setattr(amm, name, _timed(registry, name, getattr(amm, name)))
+    if calculator is not None:
+        for name in CALCULATOR_METHODS:
+            setattr(calculator, name, _timed(registry, name, getattr(calculator, name)))
+    execute = amm._execute_swap
+    to_float = amm.backend.to_float
+
+    def execute_swap(pool_id, token_in, amount_in):
+        amount_out, fee = execute(pool_id, token_in, amount_in)
+        registry.observe_swap(pool_id, token_in, to_float(amount_in), to_float(fee))
+        return amount_out, fee
+    execute_swap.__wrapped__ = execute
+    amm._execute_swap = execute_swap
+    settle = amm._settle_netted
+
+    def settle_netted(pool_id, orders, indices, results):
+        settle(pool_id, orders, indices, results)
+        for index in indices:
+            result = results[index]
+            registry.observe_swap(pool_id, result['token_in'], result['amount_in'], result['fee_paid'])
+    settle_netted.__wrapped__ = settle
+    amm._settle_netted = settle_netted
+    return registry
+
+def uninstrument(amm: HISAAMM, calculator: Optional[RewardCalculator] = None):
+    """Removes the wrappers installed by instrument()."""
+    for name in AMM_METHODS + ("_execute_swap", "_settle_netted"):
+        amm.__dict__.pop(name, None)
+    if calculator is not None:
+        for name in CALCULATOR_METHODS:
+            calculator.__dict__.pop(name, None)
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a sample workload with metrics and dump them.")
+    parser.add_argument("--config", help="logger.json-style file with the metrics settings")
+    parser.add_argument("--backend", choices=list(BACKENDS), default="decimal")
+    parser.add_argument("--swaps", type=int, default=10000)
+    parser.add_argument("--format", choices=["json", "prometheus"], default="json")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    config = load_metrics_config(args.config) if args.config else {}
+    amm = HISAAMM(backend=args.backend)
+    calculator = RewardCalculator(amm)
+    registry = instrument(amm, calculator, MetricsRegistry(config))
+    rng = random.Random(args.seed)
+    pool_ids = list(amm.pools)
+    for _ in range(args.swaps):
+        pool_id = rng.choice(pool_ids)
+        info = amm.get_pool_info(pool_id)
+        token_in = rng.choice((info['token_a'], info['token_b']))
+        amount = rng.uniform(1, 1000)
+        amm.simulate_price_impact(pool_id, token_in, amount)
+        amm.execute_swap(pool_id, token_in, amount)
+        if rng.random() < 0.05:
+            calculator.calculate_lp_rewards(pool_id, 1.0)
+    if args.format == "json":
+        print(json.dumps(registry.to_json(), indent=2))
+    else:
+        print(registry.to_prometheus(), end="")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,235 @@
+"""Streaming replay of swap and liquidity histories through HISAAMM.
+
+Events are read lazily from JSONL or CSV files, applied in batches through
+execute_swap / add_liquidity and checkpointed so a crashed replay can resume
+where it stopped. Each event carries:
+
+    type       "swap" or "add_liquidity"
+    pool_id    e.g. "HISA-USDC"
+    token_in, amount_in     for swaps
+    amount_a, amount_b      for liquidity additions
+
+Usage:
+
+    python AMM_replay.py events.jsonl --checkpoint replay.ckpt --resume
+"""
+import argparse
+import csv
+import json
+import os
+import time
+from decimal import Decimal
+from itertools import islice
+from typing import Callable, Dict, Iterator, Optional, Tuple
+
+from AMM_simulator import BACKENDS, CurvePool, HISAAMM
+
+CSV_FIELDS = ["type", "pool_id", "token_in", "amount_in", "amount_a", "amount_b"]
+READ_CHUNK_SIZE = 1 << 20
+
+def _encode_state(value):
+    """Encodes a CurvePool.save_state value as JSON, keeping Decimals, tuples and tuple keys exact."""
+    if isinstance(value, Decimal):
+        return {'decimal': str(value)}
+    if isinstance(value, tuple):
+        return {'tuple': [_encode_state(item) for item in value]}
+    if isinstance(value, list):
+        return [_encode_state(item) for item in value]
+    if isinstance(value, dict):
+        return {'items': [[_encode_state(key), _encode_state(item)] for key, item in value.items()]}
+    return value
+
+def _decode_state(value):
+    if isinstance(value, list):
+        return [_decode_state(item) for item in value]
+    if isinstance(value, dict):
+        if 'decimal' in value:
+            return Decimal(value['decimal'])
+        if 'tuple' in value:
+            return tuple(_decode_state(item) for item in value['tuple'])
+        return {_decode_state(key): _decode_state(item) for key, item in value['items']}
+    return value
+
+def read_events(path: str, offset: int = 0) -> Iterator[Tuple[int, Dict]]:
+    """Lazily yields (offset, event) pairs from a .jsonl or .csv file.
+
+    offset is the byte position just after the event, so passing it back in
+    resumes reading with the next event. The file is read in
+    READ_CHUNK_SIZE chunks and never loaded whole.
+    """
+    is_csv = path.lower().endswith(".csv")
+    with open(path, "rb", buffering=READ_CHUNK_SIZE) as handle:
+        fields = CSV_FIELDS
+        if is_csv:
+            header = handle.readline()
+            fields = next(csv.reader([header.decode("utf-8")]))
+            offset = max(offset, handle.tell())
+        handle.seek(offset)
+        position = offset
+        for line in handle:
+            position += len(line)
+            text = line.decode("utf-8").strip()
+            if not text:
+                continue
+            if is_csv:
+                event = {key: value for key, value in zip(fields, next(csv.reader([text]))) if value != ""}
+            else:
+                event = json.loads(text)
+            yield position, event
+
+class ReplayEngine:
+    """Applies event streams to a HISAAMM with periodic, resumable checkpoints."""
+
+    def __init__(self, amm: HISAAMM, checkpoint_path: Optional[str] = None,
+                 checkpoint_every: int = 100000, batch_size: int = 10000,
+                 on_checkpoint: Optional[Callable[[Dict], None]] = None,
+                 skip_errors: bool = False):
+        if batch_size <= 0 or checkpoint_every <= 0:
+            raise ValueError("batch_size and checkpoint_every must be positive.")
+        self.amm = amm
+        self.checkpoint_path = checkpoint_path
+        self.checkpoint_every = checkpoint_every
+        self.batch_size = batch_size
+        self.on_checkpoint = on_checkpoint
+        self.skip_errors = skip_errors
+
+    def apply_event(self, event: Dict):
+        event_type = event.get('type')
+        if event_type == "swap":
+            self.amm.execute_swap(event['pool_id'], event['token_in'], event['amount_in'])
+        elif event_type == "add_liquidity":
+            self.amm.add_liquidity(event['pool_id'], Decimal(str(event['amount_a'])), Decimal(str(event['amount_b'])))
+        else:
+            raise ValueError(f"Unknown event type: {event_type}")
+
+    def pool_state(self) -> Dict[str, Dict]:
+        """Returns every pool's reserves as exact decimal strings.
+
+        Curve pools are not described by their reserves alone, so their full
+        save_state (price, ticks and positions for concentrated pools) is
+        stored instead.
+        """
+        to_decimal = self.amm.backend.to_decimal
+        state = {}
+        for pool_id, pool in self.amm.pools.items():
+            if isinstance(pool, CurvePool):
+                state[pool_id] = {
+                    'pool_type': pool.pool_type,
+                    'state': _encode_state(pool.save_state(include_liquidity=True))
+                }
+            else:
+                state[pool_id] = {
+                    'reserve_a': str(to_decimal(pool.token_a_reserve)),
+                    'reserve_b': str(to_decimal(pool.token_b_reserve))
+                }
+        return state
+
+    def write_checkpoint(self, source: str, offset: int, applied: int, failed: int) -> Dict:
+        checkpoint = {
+            'source': os.path.abspath(source),
+            'offset': offset,
+            'events_applied': applied,
+            'events_failed': failed,
+            'backend': self.amm.backend.name,
+            'total_fees_collected': str(self.amm.backend.to_decimal(self.amm.total_fees_collected)),
+            'pools': self.pool_state()
+        }
+        if self.checkpoint_path:
+            temp_path = self.checkpoint_path + ".tmp"
+            with open(temp_path, "w") as handle:
+                json.dump(checkpoint, handle)
+                handle.flush()
+                os.fsync(handle.fileno())
+            os.replace(temp_path, self.checkpoint_path)
+        if self.on_checkpoint:
+            self.on_checkpoint(checkpoint)
+        return checkpoint
+
+    def load_checkpoint(self, source: str) -> Optional[Dict]:
+        """Restores AMM state from checkpoint_path; returns None if there is none."""
+        if not self.checkpoint_path or not os.path.exists(self.checkpoint_path):
+            return None
+        with open(self.checkpoint_path) as handle:
+            checkpoint = json.load(handle)
+        if checkpoint['source'] != os.path.abspath(source):
+            raise ValueError(f"Checkpoint was written for {checkpoint['source']}, not {source}")
+        if checkpoint['backend'] != self.amm.backend.name:
+            raise ValueError(f"Checkpoint uses the {checkpoint['backend']} backend, AMM uses {self.amm.backend.name}")
+        for pool_id, state in checkpoint['pools'].items():
+            if 'state' not in state:
+                self.amm.set_pool_reserves(pool_id, state['reserve_a'], state['reserve_b'])
+                continue
+            pool = self.amm.pools.get(pool_id)
+            if getattr(pool, 'pool_type', None) != state['pool_type']:
+                raise ValueError(f"Checkpoint holds a {state['pool_type']} pool {pool_id}, "
+                                 f"the AMM does not")
+            self.amm.restore_pool_state(pool_id, _decode_state(state['state']))
+        self.amm.total_fees_collected = self.amm.backend.convert(checkpoint['total_fees_collected'])
+        return checkpoint
+
+    def replay(self, source: str, resume: bool = False) -> Dict:
+        """Replays source and returns throughput statistics.
+
+        With resume=True the AMM is restored from checkpoint_path (if present)
+        and reading continues after the last checkpointed event.
+        """
+        offset = applied = failed = 0
+        if resume:
+            checkpoint = self.load_checkpoint(source)
+            if checkpoint:
+                offset = checkpoint['offset']
+                applied = checkpoint['events_applied']
+                failed = checkpoint['events_failed']
+        resumed_at = applied + failed
+        next_checkpoint = resumed_at + self.checkpoint_every
+        checkpoints = 0
+        events = read_events(source, offset)
+        start = time.perf_counter()
+        while True:
+            batch = list(islice(events, self.batch_size))
+            if not batch:
+                break
+            for offset, event in batch:
+                try:
+                    self.apply_event(event)
+                    applied += 1
+                except (ValueError, KeyError, ArithmeticError):
+                    if not self.skip_errors:
+                        raise
+                    failed += 1
+            if applied + failed >= next_checkpoint:
+                self.write_checkpoint(source, offset, applied, failed)
+                checkpoints += 1
+                next_checkpoint = applied + failed + self.checkpoint_every
+        self.write_checkpoint(source, offset, applied, failed)
+        elapsed = time.perf_counter() - start
+        processed = applied + failed - resumed_at
+        return {
+            'events_applied': applied,
+            'events_failed': failed,
+            'events_this_run': processed,
+            'checkpoints_written': checkpoints + 1,
+            'elapsed_seconds': elapsed,
+            'events_per_second': processed / elapsed if elapsed > 0 else 0.0
+        }
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay a swap/liquidity event log through HISAAMM.")
+    parser.add_argument("source", help="Event log (.jsonl or .csv)")
+    parser.add_argument("--checkpoint", help="Checkpoint file to write and resume from")
+    parser.add_argument("--checkpoint-every", type=int, default=100000)
+    parser.add_argument("--batch-size", type=int, default=10000)
+    parser.add_argument("--backend", choices=list(BACKENDS), default="decimal")
+    parser.add_argument("--resume", action="store_true", help="Continue from the checkpoint file")
+    parser.add_argument("--skip-errors", action="store_true", help="Count and skip events that fail")
+    args = parser.parse_args()
+    amm = HISAAMM(backend=args.backend)
+    engine = ReplayEngine(amm, args.checkpoint, args.checkpoint_every, args.batch_size,
+                          on_checkpoint=lambda c: print(f"checkpoint: {c['events_applied']:,} events applied"),
+                          skip_errors=args.skip_errors)
+    stats = engine.replay(args.source, resume=args.resume)
+    print(f"Replayed {stats['events_this_run']:,} events in {stats['elapsed_seconds']:.2f}s "
+          f"({stats['events_per_second']:,.0f} events/sec, {stats['events_failed']:,} failed)")
+
+if __name__ == "__main__":
+    main()
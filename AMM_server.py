@@ -0,0 +1,290 @@
+"""Asyncio JSON-RPC service in front of HISAAMM and RewardCalculator.
+
+Requests and responses are newline-delimited JSON-RPC 2.0 objects over TCP.
+Supported methods and params:
+
+    quote        pool_id, token_in, amount_in
+    swap         pool_id, token_in, amount_in, [min_amount_out]
+    pool_info    pool_id
+    prices       -
+    lp_rewards   pool_id, user_liquidity_percent, [time_period_days]
+    depth        pool_id
+    max_size     pool_id, token_in, max_impact_percent
+
+Handlers run on the event loop one at a time and never await in the middle
+of a pool update, so swaps cannot interleave without any extra locking.
+Only the Monte Carlo LP estimate is moved off the loop, to a worker thread.
+Notifications (requests without an id) get no response, not even errors.
+
+Usage:
+
+    python AMM_server.py serve --port 8765
+    python AMM_server.py bench --port 8765 --requests 20000 --concurrency 64
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+from typing import Dict, List, Optional
+
+from AMM_simulator import BACKENDS, DepthIndex, HISAAMM, RewardCalculator
+
+PARSE_ERROR = -32700
+INVALID_REQUEST = -32600
+METHOD_NOT_FOUND = -32601
+INVALID_PARAMS = -32602
+SERVER_ERROR = -32000
+
+class AMMServer:
+    """Serves one shared HISAAMM to many local clients."""
+
+    def __init__(self, amm: HISAAMM, host: str = "127.0.0.1", port: int = 8765):
+        self.amm = amm
+        self.calculator = RewardCalculator(amm)
+        self.depth_index = DepthIndex(amm)
+        self.host = host
+        self.port = port
+        self._server: Optional[asyncio.AbstractServer] = None
+        self.stats = {'requests': 0}
+        self._methods = {
+            'quote': self.quote,
+            'swap': self.swap,
+            'pool_info': self.pool_info,
+            'prices': self.prices,
+            'lp_rewards': self.lp_rewards,
+            'depth': self.depth,
+            'max_size': self.max_size
+        }
+
+    async def start(self):
+        self._server = await asyncio.start_server(self._handle_connection, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+
+    async def serve_forever(self):
+        if self._server is None:
+            await self.start()
+        async with self._server:
+            await self._server.serve_forever()
+
+    async def close(self):
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+
+    async def quote(self, pool_id: str, token_in: str, amount_in: float) -> Dict:
+        return self.amm.simulate_price_impact(pool_id, token_in, amount_in)
+
+    async def swap(self, pool_id: str, token_in: str, amount_in: float,
+                   min_amount_out: float = 0) -> Dict:
+        with self.amm.transaction([pool_id]):
+            result = self.amm.execute_swap(pool_id, token_in, amount_in)
+            if result['amount_out'] < min_amount_out:
+                raise ValueError(f"Output {result['amount_out']:.6f} is below minimum {min_amount_out}")
+        return result
+
+    async def pool_info(self, pool_id: str) -> Dict:
+        return self.amm.get_pool_info(pool_id)
+
+    async def prices(self) -> Dict[str, float]:
+        return dict(self.amm.get_ecosystem_token_prices())
+
+    async def lp_rewards(self, pool_id: str, user_liquidity_percent: float,
+                         time_period_days: int = 30) -> Dict:
+        # An uncached Monte Carlo estimate takes ~0.1 s, so it runs in a worker
+        # thread; its inputs and the result are read on the loop.
+        inputs = self.calculator.lp_return_inputs(pool_id, time_period_days)
+        estimate = None
+        if inputs is not None:
+            from AMM_montecarlo import expected_lp_returns
+            estimate = await asyncio.get_running_loop().run_in_executor(None, expected_lp_returns, *inputs)
+        return self.calculator.calculate_lp_rewards(pool_id, user_liquidity_percent, time_period_days,
+                                                    estimate=estimate)
+
+    async def depth(self, pool_id: str) -> Dict:
+        return self.depth_index.depth_table(pool_id)
+
+    async def max_size(self, pool_id: str, token_in: str, max_impact_percent: float) -> float:
+        return self.depth_index.max_trade_size(pool_id, token_in, max_impact_percent)
+
+    async def _dispatch(self, line: bytes) -> Optional[Dict]:
+        try:
+            request = json.loads(line)
+        except ValueError:
+            return _error(None, PARSE_ERROR, "Parse error")
+        if not isinstance(request, dict) or not isinstance(request.get('method'), str):
+            return _error(None, INVALID_REQUEST, "Invalid request")
+        request_id = request.get('id')
+        method = self._methods.get(request['method'])
+        if method is None:
+            response = _error(request_id, METHOD_NOT_FOUND, f"Method not found: {request['method']}")
+        else:
+            params = request.get('params') or {}
+            self.stats['requests'] += 1
+            try:
+                result = await (method(*params) if isinstance(params, list) else method(**params))
+                response = {'jsonrpc': "2.0", 'id': request_id, 'result': result}
+            except (TypeError, ValueError) as error:
+                # ValueError covers unknown pools and tokens, bad amounts and slippage.
+                response = _error(request_id, INVALID_PARAMS, str(error))
+            except KeyError as error:
+                response = _error(request_id, INVALID_PARAMS, f"Unknown key {error}")
+            except ArithmeticError as error:
+                # e.g. decimal.InvalidOperation for an amount that is not a number.
+                response = _error(request_id, INVALID_PARAMS, f"Invalid numeric parameter ({type(error).__name__})")
+            except Exception as error:
+                # Anything else still gets an answer rather than leaving the client waiting.
+                response = _error(request_id, SERVER_ERROR, f"{type(error).__name__}: {error}")
+        # JSON-RPC notifications are never answered, even when they fail.
+        return None if request_id is None else response
+
+    async def _respond(self, line: bytes, writer: asyncio.StreamWriter):
+        response = await self._dispatch(line)
+        if response is not None:
+            writer.write(json.dumps(response).encode() + b"\n")
+
+    async def _handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        tasks = set()
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                if not line.strip():
+                    continue
+                task = asyncio.ensure_future(self._respond(line, writer))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+                if writer.transport.get_write_buffer_size() > 1 << 16:
+                    await writer.drain()
+            if tasks:
+                await asyncio.gather(*tasks)
+            await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+def _error(request_id, code: int, message: str) -> Dict:
+    return {'jsonrpc': "2.0", 'id': request_id, 'error': {'code': code, 'message': message}}
+
+class RPCClient:
+    """Minimal pipelining client for AMMServer."""
+
+    def __init__(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self._reader = reader
+        self._writer = writer
+        self._next_id = 0
+        self._waiting: Dict[int, asyncio.Future] = {}
+        self._listener = asyncio.ensure_future(self._listen())
+
+    @classmethod
+    async def connect(cls, host: str = "127.0.0.1", port: int = 8765) -> "RPCClient":
+        reader, writer = await asyncio.open_connection(host, port)
+        return cls(reader, writer)
+
+    async def _listen(self):
+        while True:
+            line = await self._reader.readline()
+            if not line:
+                break
+            response = json.loads(line)
+            future = self._waiting.pop(response.get('id'), None)
+            if future is not None and not future.done():
+                future.set_result(response)
+        for future in self._waiting.values():
+            if not future.done():
+                future.set_exception(ConnectionError("Server closed the connection"))
+
+    async def call(self, method: str, **params):
+        self._next_id += 1
+        future = asyncio.get_running_loop().create_future()
+        self._waiting[self._next_id] = future
+        request = {'jsonrpc': "2.0", 'id': self._next_id, 'method': method, 'params': params}
+        self._writer.write(json.dumps(request).encode() + b"\n")
+        response = await future
+        if 'error' in response:
+            raise ValueError(response['error']['message'])
+        return response['result']
+
+    async def close(self):
+        self._writer.close()
+        await self._writer.wait_closed()
+        await self._listener
+
+async def run_load_test(host: str = "127.0.0.1", port: int = 8765, requests: int = 20000,
+                        concurrency: int = 64, connections: int = 4, swap_ratio: float = 0.2,
+                        seed: int = 0) -> Dict:
+    """Drives a quote/swap mix against a running server and reports latency percentiles."""
+    clients = [await RPCClient.connect(host, port) for _ in range(connections)]
+    pool_ids = []
+    for pool_id in ("HISA-USDC", "JANI-USDC", "CHAT-USDC", "UMOJA-USDC", "HBAR-USDC"):
+        info = await clients[0].call('pool_info', pool_id=pool_id)
+        pool_ids.append((pool_id, info['token_a'], info['token_b']))
+    rng = random.Random(seed)
+    latencies: List[float] = []
+    errors = 0
+    remaining = [requests]
+
+    async def worker(client: RPCClient):
+        nonlocal errors
+        while remaining[0] > 0:
+            remaining[0] -= 1
+            pool_id, token_a, token_b = rng.choice(pool_ids)
+            token_in = rng.choice((token_a, token_b))
+            amount = rng.choice((10, 100, 1000))
+            method = 'swap' if rng.random() < swap_ratio else 'quote'
+            start = time.perf_counter()
+            try:
+                await client.call(method, pool_id=pool_id, token_in=token_in, amount_in=amount)
+            except ValueError:
+                errors += 1
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker(clients[i % connections]) for i in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    for client in clients:
+        await client.close()
+    latencies.sort()
+    return {
+        'requests': len(latencies),
+        'errors': errors,
+        'elapsed_seconds': elapsed,
+        'requests_per_second': len(latencies) / elapsed,
+        'p50_ms': latencies[len(latencies) // 2] * 1000,
+        'p99_ms': latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] * 1000
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="HISA AMM JSON-RPC server and load generator.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    serve = subparsers.add_parser("serve", help="Run the JSON-RPC server")
+    serve.add_argument("--host", default="127.0.0.1")
+    serve.add_argument("--port", type=int, default=8765)
+    serve.add_argument("--backend", choices=list(BACKENDS), default="decimal")
+    bench = subparsers.add_parser("bench", help="Run the load generator against a server")
+    bench.add_argument("--host", default="127.0.0.1")
+    bench.add_argument("--port", type=int, default=8765)
+    bench.add_argument("--requests", type=int, default=20000)
+    bench.add_argument("--concurrency", type=int, default=64)
+    bench.add_argument("--connections", type=int, default=4)
+    bench.add_argument("--swap-ratio", type=float, default=0.2)
+    args = parser.parse_args()
+    if args.command == "serve":
+        amm = HISAAMM(backend=args.backend)
+        server = AMMServer(amm, args.host, args.port)
+        print(f"Serving HISA AMM JSON-RPC on {args.host}:{args.port}")
+        try:
+            asyncio.run(server.serve_forever())
+        except KeyboardInterrupt:
+            pass
+    else:
+        report = asyncio.run(run_load_test(args.host, args.port, args.requests, args.concurrency,
+                                           args.connections, args.swap_ratio))
+        print(f"{report['requests']:,} requests in {report['elapsed_seconds']:.2f}s: "
+              f"{report['requests_per_second']:,.0f} req/s, p50 {report['p50_ms']:.2f} ms, "
+              f"p99 {report['p99_ms']:.2f} ms, {report['errors']} errors")
+
+if __name__ == "__main__":
+    main()
@@ -1,11 +1,35 @@
+import bisect
+import copy
+import functools
+import json
+import logging
 import math
-from typing import Tuple, Dict, List, Optional
-from dataclasses import dataclass, field
-from decimal import Decimal, getcontext
+import sys
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from collections.abc import MutableMapping
+from contextlib import contextmanager, nullcontext
+from types import MappingProxyType
+from typing import Tuple, Dict, List, Mapping, Optional, Callable, Iterator, Union
+from dataclasses import dataclass, field, replace
+from decimal import Decimal, getcontext, ROUND_DOWN
+
+try:
+    import numpy as np
+except ImportError:  # numpy is only needed for the vectorized batch APIs
+    np = None
+
+logger = logging.getLogger(__name__)
 
 # Set precision for financial calculations
 getcontext().prec = 28
 
+# Batch quotes are evaluated in float64; they agree with the scalar Decimal
+# path to within this relative tolerance.
+BATCH_QUOTE_RTOL = 1e-12
+
 # Define all token symbols from your ecosystem
 TOKEN_SYMBOLS = [
     "HISA", "USDC",
@@ -14,33 +38,934 @@ TOKEN_SYMBOLS = [
     "HBAR"
 ]
 
+# Default pool topology in load_topology form: (token_a, token_b, reserve_a,
+# reserve_b, fee_rate) for constant-product pools, dicts for the pegged
+# stablecoin pairs, which run as StableSwap pools.
+DEFAULT_TOPOLOGY = (
+    ("HISA", "USDC", 100000, 500000, 0.003),
+    ("JANI", "USDC", 50000, 250000, 0.003),
+    ("CHAT", "USDC", 75000, 375000, 0.003),
+    ("UMOJA", "USDC", 80000, 400000, 0.003),
+    {"token_a": "JANI_STABLE", "token_b": "USDC", "reserve_a": 200000, "reserve_b": 200000,
+     "fee_rate": 0.001, "pool_type": "stableswap", "amplification": 100},
+    {"token_a": "UMOJA_STABLE", "token_b": "USDC", "reserve_a": 200000, "reserve_b": 200000,
+     "fee_rate": 0.001, "pool_type": "stableswap", "amplification": 100},
+    ("UMOJA_OPTION", "UMOJA", 1000000, 50000, 0.003),
+    ("JANI", "JANI_STABLE", 50000, 50000, 0.003),
+    ("UMOJA", "UMOJA_STABLE", 80000, 80000, 0.003),
+    ("HBAR", "USDC", 200000, 100000, 0.003),
+)
+
+def constant_product_topology(topology=DEFAULT_TOPOLOGY) -> List[Tuple]:
+    """Returns topology with every pool, whatever its pool_type, as a constant-product row.
+
+    For stores and models that only handle constant-product pools (the
+    PoolTable store, AMM_persistence snapshots); reserves and fees are kept.
+    """
+    return [tuple(entry)[:5] if not isinstance(entry, dict) else
+            (entry['token_a'], entry['token_b'], entry['reserve_a'], entry['reserve_b'], entry.get('fee_rate', 0.003))
+            for entry in topology]
+
+class DecimalBackend:
+    """Reference arithmetic: Decimal values under the module-wide 28 digit context."""
+    name = "decimal"
+    zero = Decimal('0')
+
+    def convert(self, value) -> Decimal:
+        return value if isinstance(value, Decimal) else Decimal(str(value))
+
+    def to_float(self, value: Decimal) -> float:
+        return float(value)
+
+    def to_decimal(self, value: Decimal) -> Decimal:
+        return value
+
+    def mul(self, a: Decimal, b: Decimal) -> Decimal:
+        return a * b
+
+    def div(self, a: Decimal, b: Decimal) -> Decimal:
+        return a / b
+
+    def muldiv(self, a: Decimal, b: Decimal, c: Decimal) -> Decimal:
+        return a * b / c
+
+    def sqrt(self, a: Decimal) -> Decimal:
+        return a.sqrt()
+
+class FloatBackend:
+    """Fast float64 arithmetic for research sweeps; not bit-exact with Decimal."""
+    name = "float"
+    zero = 0.0
+
+    def convert(self, value) -> float:
+        return float(value)
+
+    def to_float(self, value: float) -> float:
+        return value
+
+    def to_decimal(self, value: float) -> Decimal:
+        return Decimal(repr(value))
+
+    def mul(self, a: float, b: float) -> float:
+        return a * b
+
+    def div(self, a: float, b: float) -> float:
+        return a / b
+
+    def muldiv(self, a: float, b: float, c: float) -> float:
+        return a * b / c
+
+    def sqrt(self, a: float) -> float:
+        return math.sqrt(a)
+
+class FixedPointBackend:
+    """Integer fixed point with 18 decimals, rounding down as the Solidity contracts do.
+
+    Values are ints scaled by 10**18 (the token wei unit); products and
+    quotients are floored, so results are deterministic across platforms.
+    """
+    name = "fixed"
+    zero = 0
+    DECIMALS = 18
+    SCALE = 10 ** 18
+
+    def convert(self, value) -> int:
+        if not isinstance(value, Decimal):
+            value = Decimal(str(value))
+        return int(value.scaleb(self.DECIMALS).to_integral_value(rounding=ROUND_DOWN))
+
+    def to_float(self, value: int) -> float:
+        return value / self.SCALE
+
+    def to_decimal(self, value: int) -> Decimal:
+        return Decimal(value).scaleb(-self.DECIMALS)
+
+    def mul(self, a: int, b: int) -> int:
+        return a * b // self.SCALE
+
+    def div(self, a: int, b: int) -> int:
+        return a * self.SCALE // b
+
+    def muldiv(self, a: int, b: int, c: int) -> int:
+        return a * b // c
+
+    def sqrt(self, a: int) -> int:
+        return math.isqrt(a * self.SCALE)
+
+BACKENDS = {
+    "decimal": DecimalBackend(),
+    "fixed": FixedPointBackend(),
+    "float": FloatBackend()
+}
+
 @dataclass
 class Pool:
-    """Represents a liquidity pool for two tokens in the AMM."""
+    """Represents a liquidity pool for two tokens in the AMM.
+
+    Reserves and fee_rate hold values native to the pool's numeric backend
+    (Decimal by default).
+    """
     token_a_reserve: Decimal
     token_b_reserve: Decimal
     token_a_symbol: str
     token_b_symbol: str
     fee_rate: Decimal = Decimal('0.003')  # 0.3% fee
+    backend: DecimalBackend = field(default=BACKENDS["decimal"], repr=False, compare=False)
 
     @property
     def k(self) -> Decimal:
         """Constant product k = x * y for the pool."""
-        return self.token_a_reserve * self.token_b_reserve
+        return self.backend.mul(self.token_a_reserve, self.token_b_reserve)
 
     @property
     def price_a_in_b(self) -> Decimal:
         """Price of token A in terms of token B."""
         if self.token_a_reserve == 0:
-            return Decimal('0')
-        return self.token_b_reserve / self.token_a_reserve
+            return self.backend.zero
+        return self.backend.div(self.token_b_reserve, self.token_a_reserve)
 
     @property
     def price_b_in_a(self) -> Decimal:
         """Price of token B in terms of token A."""
         if self.token_b_reserve == 0:
-            return Decimal('0')
-        return self.token_a_reserve / self.token_b_reserve
+            return self.backend.zero
+        return self.backend.div(self.token_a_reserve, self.token_b_reserve)
+
+@functools.lru_cache(maxsize=65536)
+def _tick_sqrt_price(tick: int) -> Decimal:
+    """Returns sqrt(1.0001 ** tick), the sqrt price at a concentrated-liquidity tick."""
+    return ConcentratedPool.TICK_BASE.sqrt() ** tick
+
+class CurvePool(ABC):
+    """Base class for pools whose swap curve is not the full-range x * y = k.
+
+    HISAAMM calls quote/swap instead of its constant-product formulas,
+    save_state/restore_state for transaction rollback and copy() when a fork
+    first writes the pool. token_a_reserve/token_b_reserve are the token
+    balances the pool holds; curve_reserves() returns constant-product
+    reserves that match the curve's marginal price and local depth, which
+    the closed-form arbitrage sizing uses.
+    """
+    pool_type = ""
+
+    @abstractmethod
+    def quote(self, token_in: str, amount_in) -> Tuple[object, object]:
+        """Returns (amount_out, fee) for a swap without changing the pool."""
+
+    @abstractmethod
+    def swap(self, token_in: str, amount_in) -> Tuple[object, object]:
+        """Applies a swap and returns (amount_out, fee)."""
+
+    @abstractmethod
+    def price_after(self, token_in: str, amount_in):
+        """Returns price_a_in_b after a hypothetical swap."""
+
+    def quote_many(self, token_in: str, amounts: "np.ndarray") -> Tuple["np.ndarray", "np.ndarray"]:
+        """Returns float64 (amount_out, fee) arrays for an array of input amounts."""
+        backend = self.backend
+        quotes = [self.quote(token_in, backend.convert(amount)) for amount in amounts.ravel().tolist()]
+        amount_out = np.array([backend.to_float(out) for out, _ in quotes], dtype=np.float64)
+        fee = np.array([backend.to_float(fee) for _, fee in quotes], dtype=np.float64)
+        return amount_out.reshape(amounts.shape), fee.reshape(amounts.shape)
+
+    @abstractmethod
+    def add_liquidity(self, amount_a, amount_b) -> Tuple[object, object]:
+        """Deposits up to the given amounts; returns the amounts actually added."""
+
+    @abstractmethod
+    def curve_reserves(self) -> Tuple[float, float]:
+        """Returns the constant-product reserves matching the curve at its current price."""
+
+    @abstractmethod
+    def save_state(self, include_liquidity: bool = False):
+        """Returns the state restore_state needs for rollback, with the liquidity layout if asked."""
+
+    @abstractmethod
+    def restore_state(self, state):
+        """Restores a state returned by save_state."""
+
+    @abstractmethod
+    def with_liquidity(self, state, source=None):
+        """Returns state extended with the liquidity layout of source (default: now)."""
+
+    @abstractmethod
+    def copy(self) -> "CurvePool":
+        """Returns an independent copy of the pool."""
+
+    def _token_index(self, token_in: str) -> bool:
+        """Returns True when token_in is token A; raises for foreign tokens."""
+        if token_in == self.token_a_symbol:
+            return True
+        if token_in == self.token_b_symbol:
+            return False
+        raise ValueError(f"Token {token_in} not found in pool {self.token_a_symbol}-{self.token_b_symbol}")
+
+    @property
+    def price_b_in_a(self):
+        price = self.price_a_in_b
+        return self.backend.div(self.backend.convert(1), price) if price else self.backend.zero
+
+class ConcentratedPool(CurvePool):
+    """Concentrated-liquidity pool (Uniswap v3 style) for tokens A and B.
+
+    Liquidity is provided over tick ranges, where tick t has price
+    1.0001 ** t of A in B, and only ranges containing the current price
+    trade. Initialized ticks are kept in a sorted list, so a swap finds the
+    next tick to cross by bisection in O(log n) however many empty ticks lie
+    between. Within a range the swap is solved in closed form on sqrt
+    prices, so its cost grows with the number of ticks crossed, not with the
+    swap size. The fee is taken from the input and stays in the pool.
+    """
+    pool_type = "concentrated"
+    TICK_BASE = Decimal('1.0001')
+    MIN_TICK = -887272
+    MAX_TICK = 887272
+
+    def __init__(self, token_a_symbol: str, token_b_symbol: str, fee_rate, backend,
+                 tick_spacing: int = 60):
+        if tick_spacing <= 0:
+            raise ValueError("tick_spacing must be positive.")
+        self.token_a_symbol = token_a_symbol
+        self.token_b_symbol = token_b_symbol
+        self.fee_rate = fee_rate
+        self.backend = backend
+        self.tick_spacing = tick_spacing
+        self.token_a_reserve = backend.zero
+        self.token_b_reserve = backend.zero
+        self.sqrt_price = backend.zero
+        self.tick = 0
+        self.liquidity = backend.zero
+        self.positions: Dict[Tuple[int, int], object] = {}
+        self._liquidity_net: Dict[int, object] = {}
+        self._ticks: List[int] = []
+        self._sqrt_prices: Dict[int, object] = {}
+
+    @classmethod
+    def create(cls, token_a: str, token_b: str, initial_a, initial_b, fee_rate, backend,
+               price_range: Optional[Tuple[float, float]] = None,
+               tick_spacing: int = 60) -> "ConcentratedPool":
+        """Builds a pool priced at initial_b / initial_a with one position over price_range.
+
+        price_range defaults to half to twice the initial price. The position
+        takes as much of the initial amounts as fits the range at that price.
+        """
+        if initial_a <= 0 or initial_b <= 0:
+            raise ValueError("Initial amounts must be positive.")
+        pool = cls(token_a, token_b, fee_rate, backend, tick_spacing)
+        pool.sqrt_price = backend.sqrt(backend.div(initial_b, initial_a))
+        pool.tick = pool._tick_at_sqrt_price(pool.sqrt_price)
+        price = backend.to_float(backend.div(initial_b, initial_a))
+        lower, upper = price_range or (price / 2, price * 2)
+        pool.add_position(pool.price_to_tick(lower), pool.price_to_tick(upper, round_up=True),
+                          initial_a, initial_b)
+        return pool
+
+    def price_to_tick(self, price: float, round_up: bool = False) -> int:
+        """Returns the tick for price, aligned down (or up) to tick_spacing."""
+        if price <= 0:
+            raise ValueError("Price must be positive.")
+        raw = math.log(price) / math.log(1.0001)
+        spacing = self.tick_spacing
+        tick = (math.ceil(raw / spacing) if round_up else math.floor(raw / spacing)) * spacing
+        return max(min(tick, self.MAX_TICK - self.MAX_TICK % spacing), -(self.MAX_TICK - self.MAX_TICK % spacing))
+
+    def _sqrt_price_at(self, tick: int):
+        # Initialized ticks keep their backend value; others go through the shared cache.
+        sqrt_price = self._sqrt_prices.get(tick)
+        return self.backend.convert(_tick_sqrt_price(tick)) if sqrt_price is None else sqrt_price
+
+    def _tick_at_sqrt_price(self, sqrt_price) -> int:
+        """Returns the largest tick whose sqrt price is <= sqrt_price."""
+        tick = math.floor(2 * math.log(self.backend.to_float(sqrt_price)) / math.log(1.0001))
+        while self._sqrt_price_at(tick) > sqrt_price:
+            tick -= 1
+        while self._sqrt_price_at(tick + 1) <= sqrt_price:
+            tick += 1
+        return tick
+
+    @property
+    def price_a_in_b(self):
+        return self.backend.mul(self.sqrt_price, self.sqrt_price)
+
+    @property
+    def k(self):
+        """Square of the active liquidity, the local equivalent of x * y."""
+        return self.backend.mul(self.liquidity, self.liquidity)
+
+    def curve_reserves(self) -> Tuple[float, float]:
+        """Virtual reserves L / sqrt(P) and L * sqrt(P) of the active range."""
+        to_float = self.backend.to_float
+        liquidity = to_float(self.liquidity)
+        sqrt_price = to_float(self.sqrt_price)
+        return liquidity / sqrt_price, liquidity * sqrt_price
+
+    def _amounts_for_liquidity(self, lower_tick: int, upper_tick: int, liquidity):
+        backend = self.backend
+        sqrt_lower = self._sqrt_price_at(lower_tick)
+        sqrt_upper = self._sqrt_price_at(upper_tick)
+        sqrt_price = min(max(self.sqrt_price, sqrt_lower), sqrt_upper)
+        amount_a = backend.div(backend.muldiv(liquidity, sqrt_upper - sqrt_price, sqrt_upper), sqrt_price)
+        amount_b = backend.mul(liquidity, sqrt_price - sqrt_lower)
+        return amount_a, amount_b
+
+    def add_position(self, lower_tick: int, upper_tick: int, amount_a, amount_b):
+        """Adds liquidity over [lower_tick, upper_tick) using at most the given amounts.
+
+        Returns (liquidity, amount_a_used, amount_b_used).
+        """
+        if lower_tick >= upper_tick:
+            raise ValueError("lower_tick must be below upper_tick.")
+        if lower_tick % self.tick_spacing or upper_tick % self.tick_spacing:
+            raise ValueError(f"Ticks must be multiples of the tick spacing {self.tick_spacing}.")
+        backend = self.backend
+        sqrt_lower = self._sqrt_price_at(lower_tick)
+        sqrt_upper = self._sqrt_price_at(upper_tick)
+        sqrt_price = self.sqrt_price
+        if sqrt_price <= sqrt_lower:
+            liquidity = backend.muldiv(backend.mul(amount_a, sqrt_lower), sqrt_upper, sqrt_upper - sqrt_lower)
+        elif sqrt_price >= sqrt_upper:
+            liquidity = backend.div(amount_b, sqrt_upper - sqrt_lower)
+        else:
+            liquidity = min(backend.muldiv(backend.mul(amount_a, sqrt_price), sqrt_upper, sqrt_upper - sqrt_price),
+                            backend.div(amount_b, sqrt_price - sqrt_lower))
+        if liquidity <= 0:
+            raise ValueError("Amounts are too small to add liquidity in this range.")
+        used_a, used_b = self._amounts_for_liquidity(lower_tick, upper_tick, liquidity)
+        for tick, delta in ((lower_tick, liquidity), (upper_tick, -liquidity)):
+            net = self._liquidity_net.get(tick)
+            if net is None:
+                bisect.insort(self._ticks, tick)
+                self._sqrt_prices[tick] = self._sqrt_price_at(tick)
+                net = backend.zero
+            self._liquidity_net[tick] = net + delta
+        key = (lower_tick, upper_tick)
+        self.positions[key] = self.positions.get(key, backend.zero) + liquidity
+        if lower_tick <= self.tick < upper_tick:
+            self.liquidity += liquidity
+        self.token_a_reserve += used_a
+        self.token_b_reserve += used_b
+        return liquidity, used_a, used_b
+
+    def add_liquidity(self, amount_a, amount_b):
+        """Adds to the widest existing position's range; returns the amounts used."""
+        lower_tick, upper_tick = max(self.positions, key=lambda key: key[1] - key[0])
+        _, used_a, used_b = self.add_position(lower_tick, upper_tick, amount_a, amount_b)
+        return used_a, used_b
+
+    def _run_swap(self, a_in: bool, amount_in, exact_tick: bool = True):
+        """Walks the curve for amount_in (after fee); returns (amount_out, sqrt_price, tick, liquidity).
+
+        tick follows the usual convention: the largest tick at or below the
+        price, or one below the last tick crossed downwards. Quotes pass
+        exact_tick=False to skip computing it for the final partial step.
+        """
+        backend = self.backend
+        ticks = self._ticks
+        sqrt_price, tick, liquidity = self.sqrt_price, self.tick, self.liquidity
+        remaining = amount_in
+        amount_out = backend.zero
+        while remaining > 0:
+            if a_in:
+                index = bisect.bisect_right(ticks, tick) - 1
+                next_tick = ticks[index] if index >= 0 else None
+            else:
+                index = bisect.bisect_right(ticks, tick)
+                next_tick = ticks[index] if index < len(ticks) else None
+            if next_tick is None:
+                break
+            sqrt_target = self._sqrt_price_at(next_tick)
+            if liquidity > 0:
+                if a_in:
+                    step_in = backend.div(backend.muldiv(liquidity, sqrt_price - sqrt_target, sqrt_price), sqrt_target)
+                    if remaining < step_in:
+                        new_sqrt = backend.muldiv(liquidity, sqrt_price, liquidity + backend.mul(remaining, sqrt_price))
+                        amount_out += backend.mul(liquidity, sqrt_price - new_sqrt)
+                        if exact_tick:
+                            tick = max(self._tick_at_sqrt_price(new_sqrt), next_tick)
+                        return amount_out, new_sqrt, tick, liquidity
+                    amount_out += backend.mul(liquidity, sqrt_price - sqrt_target)
+                else:
+                    step_in = backend.mul(liquidity, sqrt_target - sqrt_price)
+                    if remaining < step_in:
+                        new_sqrt = sqrt_price + backend.div(remaining, liquidity)
+                        amount_out += backend.div(backend.muldiv(liquidity, new_sqrt - sqrt_price, sqrt_price), new_sqrt)
+                        if exact_tick:
+                            tick = min(self._tick_at_sqrt_price(new_sqrt), next_tick - 1)
+                        return amount_out, new_sqrt, tick, liquidity
+                    amount_out += backend.div(backend.muldiv(liquidity, sqrt_target - sqrt_price, sqrt_price), sqrt_target)
+                remaining -= step_in
+            sqrt_price = sqrt_target
+            net = self._liquidity_net[next_tick]
+            if a_in:
+                liquidity -= net
+                tick = next_tick - 1
+            else:
+                liquidity += net
+                tick = next_tick
+        if remaining > 0:
+            raise ValueError(f"Insufficient {self.token_b_symbol if a_in else self.token_a_symbol} liquidity.")
+        return amount_out, sqrt_price, tick, liquidity
+
+    def quote(self, token_in: str, amount_in):
+        a_in = self._token_index(token_in)
+        fee = self.backend.mul(amount_in, self.fee_rate)
+        amount_out, _, _, _ = self._run_swap(a_in, amount_in - fee, exact_tick=False)
+        return amount_out, fee
+
+    def price_after(self, token_in: str, amount_in):
+        a_in = self._token_index(token_in)
+        _, sqrt_price, _, _ = self._run_swap(a_in, amount_in - self.backend.mul(amount_in, self.fee_rate), exact_tick=False)
+        return self.backend.mul(sqrt_price, sqrt_price)
+
+    def swap(self, token_in: str, amount_in):
+        a_in = self._token_index(token_in)
+        fee = self.backend.mul(amount_in, self.fee_rate)
+        amount_out, self.sqrt_price, self.tick, self.liquidity = self._run_swap(a_in, amount_in - fee)
+        if a_in:
+            self.token_a_reserve += amount_in
+            self.token_b_reserve -= amount_out
+        else:
+            self.token_b_reserve += amount_in
+            self.token_a_reserve -= amount_out
+        return amount_out, fee
+
+    def save_state(self, include_liquidity: bool = False):
+        """Returns the swap state; include_liquidity also captures positions and ticks."""
+        ticks = (dict(self._liquidity_net), list(self._ticks), dict(self.positions)) if include_liquidity else None
+        return (self.token_a_reserve, self.token_b_reserve, self.sqrt_price, self.tick, self.liquidity, ticks)
+
+    def with_liquidity(self, state, source=None):
+        if state[-1] is not None:
+            return state
+        return state[:-1] + (source[-1] if source is not None else self.save_state(True)[-1],)
+
+    def restore_state(self, state):
+        (self.token_a_reserve, self.token_b_reserve, self.sqrt_price, self.tick,
+         self.liquidity, ticks) = state
+        if ticks is not None:
+            self._liquidity_net, self._ticks, self.positions = dict(ticks[0]), list(ticks[1]), dict(ticks[2])
+
+    def copy(self) -> "ConcentratedPool":
+        pool = copy.copy(self)
+        pool._liquidity_net = dict(self._liquidity_net)
+        pool._ticks = list(self._ticks)
+        pool._sqrt_prices = dict(self._sqrt_prices)
+        pool.positions = dict(self.positions)
+        return pool
+
+    def __repr__(self) -> str:
+        return (f"ConcentratedPool({self.token_a_symbol}-{self.token_b_symbol}, price={self.backend.to_float(self.price_a_in_b):.6f}, "
+                f"liquidity={self.backend.to_float(self.liquidity):.6f}, ticks={len(self._ticks)})")
+
+class StableSwapPool(CurvePool):
+    """Two-token StableSwap (Curve) pool for assets pegged 1:1.
+
+    The amplified invariant A * n^n * (x + y) + D = A * n^n * D + D^(n+1) / (n^n * x * y)
+    with n = 2 trades near 1:1 with far less slippage than x * y = k while the
+    reserves are balanced. D and the marginal price are cached between swaps:
+    a quote solves only for the output reserve y, starting from the
+    first-order estimate y - price * dx, and the post-swap D is re-solved
+    starting from the cached D, so both Newton solves usually stop after
+    one or two iterations. The fee is taken from the input and stays in the
+    pool.
+    """
+    pool_type = "stableswap"
+    MAX_ITERATIONS = 255
+    # Relative Newton step below which a solve stops, per backend. Newton
+    # converges quadratically here, so the remaining error is about the
+    # square of this: ~1e-20 (decimal), ~1e-18 (fixed) and ~1e-14 (float).
+    STEP_TOLERANCE = {"decimal": Decimal('1e-10'), "fixed": Decimal('1e-9'), "float": Decimal('1e-7')}
+
+    def __init__(self, token_a_symbol: str, token_b_symbol: str, fee_rate, backend,
+                 amplification: float = 100):
+        if amplification <= 0:
+            raise ValueError("amplification must be positive.")
+        self.token_a_symbol = token_a_symbol
+        self.token_b_symbol = token_b_symbol
+        self.fee_rate = fee_rate
+        self.backend = backend
+        self.amplification = amplification
+        self._ann = backend.convert(amplification * 4)
+        self._tolerance = backend.convert(self.STEP_TOLERANCE[backend.name])
+        self.token_a_reserve = backend.zero
+        self.token_b_reserve = backend.zero
+        self.invariant = backend.zero
+        self._price_a_in_b = backend.zero
+        self.newton_solves = 0
+        self.newton_iterations = 0
+
+    @classmethod
+    def create(cls, token_a: str, token_b: str, initial_a, initial_b, fee_rate, backend,
+               amplification: float = 100) -> "StableSwapPool":
+        if initial_a <= 0 or initial_b <= 0:
+            raise ValueError("Initial amounts must be positive.")
+        pool = cls(token_a, token_b, fee_rate, backend, amplification)
+        pool.add_liquidity(initial_a, initial_b)
+        return pool
+
+    def _converged(self, new, old) -> bool:
+        return abs(new - old) <= self.backend.mul(new, self._tolerance)
+
+    def _solve_invariant(self, reserve_a, reserve_b, guess=None):
+        """Newton iteration for D given both reserves, starting from guess (default x + y)."""
+        backend = self.backend
+        ann = self._ann
+        total = reserve_a + reserve_b
+        invariant = guess if guess else total
+        for iteration in range(1, self.MAX_ITERATIONS + 1):
+            product = backend.muldiv(backend.muldiv(invariant, invariant, 2 * reserve_a), invariant, 2 * reserve_b)
+            previous = invariant
+            invariant = backend.muldiv(backend.mul(ann, total) + 2 * product, invariant,
+                                       backend.mul(ann - backend.convert(1), invariant) + 3 * product)
+            if self._converged(invariant, previous):
+                self.newton_solves += 1
+                self.newton_iterations += iteration
+                return invariant
+        raise ValueError("StableSwap invariant did not converge.")
+
+    def _solve_reserve(self, reserve_in, reserve_out_guess, invariant):
+        """Newton iteration for the reserve paired with reserve_in on the curve of invariant."""
+        backend = self.backend
+        ann = self._ann
+        c = backend.muldiv(backend.muldiv(invariant, invariant, 4 * reserve_in), invariant, ann)
+        b = reserve_in + backend.div(invariant, ann) - invariant
+        reserve_out = reserve_out_guess
+        for iteration in range(1, self.MAX_ITERATIONS + 1):
+            previous = reserve_out
+            reserve_out = backend.div(backend.mul(reserve_out, reserve_out) + c, 2 * reserve_out + b)
+            if self._converged(reserve_out, previous):
+                self.newton_solves += 1
+                self.newton_iterations += iteration
+                return reserve_out
+        raise ValueError("StableSwap reserve did not converge.")
+
+    def _reserves(self, a_in: bool):
+        return (self.token_a_reserve, self.token_b_reserve) if a_in else (self.token_b_reserve, self.token_a_reserve)
+
+    def quote(self, token_in: str, amount_in):
+        backend = self.backend
+        a_in = self._token_index(token_in)
+        reserve_in, reserve_out = self._reserves(a_in)
+        fee = backend.mul(amount_in, self.fee_rate)
+        net_in = amount_in - fee
+        price = self._price_a_in_b
+        guess = reserve_out - (backend.mul(net_in, price) if a_in else backend.div(net_in, price))
+        new_out = self._solve_reserve(reserve_in + net_in, guess if guess > 0 else reserve_out, self.invariant)
+        return max(reserve_out - new_out, backend.zero), fee
+
+    def quote_many(self, token_in: str, amounts: "np.ndarray") -> Tuple["np.ndarray", "np.ndarray"]:
+        """Vectorized float64 quote; Newton runs on the whole array until every element converges."""
+        to_float = self.backend.to_float
+        a_in = self._token_index(token_in)
+        reserve_in, reserve_out = (to_float(value) for value in self._reserves(a_in))
+        invariant = to_float(self.invariant)
+        price = to_float(self._price_a_in_b)
+        ann = self.amplification * 4.0
+        fee = amounts * to_float(self.fee_rate)
+        net_in = amounts - fee
+        new_in = reserve_in + net_in
+        c = invariant ** 3 / (4.0 * new_in * ann)
+        b = new_in + invariant / ann - invariant
+        guess = reserve_out - (net_in * price if a_in else net_in / price)
+        new_out = np.where(guess > 0, guess, reserve_out)
+        step_tolerance = float(self.STEP_TOLERANCE["float"])
+        for _ in range(self.MAX_ITERATIONS):
+            previous = new_out
+            new_out = (new_out * new_out + c) / (2.0 * new_out + b)
+            if np.all(np.abs(new_out - previous) <= step_tolerance * new_out):
+                break
+        else:
+            raise ValueError("StableSwap reserve did not converge.")
+        return np.maximum(reserve_out - new_out, 0.0), fee
+
+    def swap(self, token_in: str, amount_in):
+        a_in = self._token_index(token_in)
+        amount_out, fee = self.quote(token_in, amount_in)
+        if a_in:
+            self.token_a_reserve += amount_in
+            self.token_b_reserve -= amount_out
+        else:
+            self.token_b_reserve += amount_in
+            self.token_a_reserve -= amount_out
+        self._update_invariant()
+        return amount_out, fee
+
+    def add_liquidity(self, amount_a, amount_b):
+        """Adds both amounts as given (any ratio is accepted) and re-solves D."""
+        self.token_a_reserve += amount_a
+        self.token_b_reserve += amount_b
+        self._update_invariant()
+        return amount_a, amount_b
+
+    def _update_invariant(self):
+        self.invariant = self._solve_invariant(self.token_a_reserve, self.token_b_reserve, self.invariant)
+        self._price_a_in_b = self._price(self.token_a_reserve, self.token_b_reserve, self.invariant)
+
+    def _price(self, reserve_a, reserve_b, invariant):
+        """Marginal price of A in B, -dy/dx on the invariant curve."""
+        backend = self.backend
+        product = backend.muldiv(backend.muldiv(invariant, invariant, 2 * reserve_a), invariant, 2 * reserve_b)
+        return backend.div(backend.mul(reserve_b, backend.mul(self._ann, reserve_a) + product),
+                           backend.mul(reserve_a, backend.mul(self._ann, reserve_b) + product))
+
+    @property
+    def price_a_in_b(self):
+        return self._price_a_in_b
+
+    @property
+    def k(self):
+        """D^2 / 4, which equals x * y for a constant-product pool with the same D."""
+        return self.backend.div(self.backend.mul(self.invariant, self.invariant), self.backend.convert(4))
+
+    def price_after(self, token_in: str, amount_in):
+        a_in = self._token_index(token_in)
+        amount_out, _ = self.quote(token_in, amount_in)
+        reserve_a, reserve_b = self.token_a_reserve, self.token_b_reserve
+        if a_in:
+            reserve_a, reserve_b = reserve_a + amount_in, reserve_b - amount_out
+        else:
+            reserve_a, reserve_b = reserve_a - amount_out, reserve_b + amount_in
+        return self._price(reserve_a, reserve_b, self._solve_invariant(reserve_a, reserve_b, self.invariant))
+
+    def curve_reserves(self) -> Tuple[float, float]:
+        """Constant-product reserves with the pool's marginal price and price slope.
+
+        For x * y = k the price p = y / x falls by dp/dx = -2p / x as x is
+        sold in, so x = -2p / (dp/dx); the slope is measured over a small
+        trade on the StableSwap curve.
+        """
+        to_float = self.backend.to_float
+        reserve_a, reserve_b = to_float(self.token_a_reserve), to_float(self.token_b_reserve)
+        invariant, ann = to_float(self.invariant), self.amplification * 4.0
+
+        def price(x, y):
+            product = invariant ** 3 / (4.0 * x * y)
+            return y * (ann * x + product) / (x * (ann * y + product))
+        step = reserve_a * 1e-6
+        new_a = reserve_a + step
+        c = invariant ** 3 / (4.0 * new_a * ann)
+        b = new_a + invariant / ann - invariant
+        new_b = reserve_b
+        for _ in range(self.MAX_ITERATIONS):
+            previous, new_b = new_b, (new_b * new_b + c) / (2.0 * new_b + b)
+            if abs(new_b - previous) <= 1e-15 * new_b:
+                break
+        current = price(reserve_a, reserve_b)
+        slope = (price(new_a, new_b) - current) / step
+        virtual_a = -2.0 * current / slope if slope < 0 else float("inf")
+        return virtual_a, current * virtual_a
+
+    def save_state(self, include_liquidity: bool = False):
+        return (self.token_a_reserve, self.token_b_reserve, self.invariant, self._price_a_in_b)
+
+    def with_liquidity(self, state, source=None):
+        return state
+
+    def restore_state(self, state):
+        self.token_a_reserve, self.token_b_reserve, self.invariant, self._price_a_in_b = state
+
+    def copy(self) -> "StableSwapPool":
+        return copy.copy(self)
+
+    def __repr__(self) -> str:
+        to_float = self.backend.to_float
+        return (f"StableSwapPool({self.token_a_symbol}-{self.token_b_symbol}, A={self.amplification}, "
+                f"reserves={to_float(self.token_a_reserve):.6f}/{to_float(self.token_b_reserve):.6f})")
+
+POOL_TYPES = {"concentrated": ConcentratedPool, "stableswap": StableSwapPool}
+
+class CopyOnWritePools(MutableMapping):
+    """Pool mapping that shares Pool objects with a frozen base until first written.
+
+    Reads fall through to the base dict; for_write() copies a pool into the
+    local layer the first time it is mutated, so a fork only pays for the
+    pools it actually touches.
+    """
+
+    def __init__(self, base: Dict[str, Pool]):
+        self._base = base
+        self._local: Dict[str, Pool] = {}
+
+    def __getitem__(self, pool_id: str) -> Pool:
+        pool = self._local.get(pool_id)
+        return pool if pool is not None else self._base[pool_id]
+
+    def __contains__(self, pool_id) -> bool:
+        return pool_id in self._local or pool_id in self._base
+
+    def __setitem__(self, pool_id: str, pool: Pool):
+        self._local[pool_id] = pool
+
+    def __delitem__(self, pool_id: str):
+        if pool_id in self._base:
+            raise KeyError(f"Pool {pool_id} is shared with other forks and cannot be deleted")
+        del self._local[pool_id]
+
+    def __iter__(self) -> Iterator[str]:
+        yield from self._base
+        for pool_id in self._local:
+            if pool_id not in self._base:
+                yield pool_id
+
+    def __len__(self) -> int:
+        return len(self._base) + sum(1 for pool_id in self._local if pool_id not in self._base)
+
+    def for_write(self, pool_id: str) -> Pool:
+        pool = self._local.get(pool_id)
+        if pool is None:
+            pool = self._base[pool_id]
+            pool = self._local[pool_id] = pool.copy() if isinstance(pool, CurvePool) else replace(pool)
+        return pool
+
+    def has_local_writes(self) -> bool:
+        return bool(self._local)
+
+    def frozen_view(self) -> Dict[str, Pool]:
+        """Returns a plain dict of the current pools, to be treated as read-only."""
+        return self._base if not self._local else {pool_id: self[pool_id] for pool_id in self}
+
+class PoolView:
+    """Lightweight Pool-compatible view of one row of a PoolTable."""
+    __slots__ = ('_table', '_row')
+
+    def __init__(self, table: "PoolTable", row: int):
+        self._table = table
+        self._row = row
+
+    @property
+    def token_a_reserve(self) -> float:
+        return float(self._table.reserve_a[self._row])
+
+    @token_a_reserve.setter
+    def token_a_reserve(self, value: float):
+        self._table.reserve_a[self._row] = value
+
+    @property
+    def token_b_reserve(self) -> float:
+        return float(self._table.reserve_b[self._row])
+
+    @token_b_reserve.setter
+    def token_b_reserve(self, value: float):
+        self._table.reserve_b[self._row] = value
+
+    @property
+    def fee_rate(self) -> float:
+        return float(self._table.fee_rate[self._row])
+
+    @fee_rate.setter
+    def fee_rate(self, value: float):
+        self._table.fee_rate[self._row] = value
+
+    @property
+    def token_a_symbol(self) -> str:
+        return self._table.token_symbols[self._table.token_a[self._row]]
+
+    @property
+    def token_b_symbol(self) -> str:
+        return self._table.token_symbols[self._table.token_b[self._row]]
+
+    @property
+    def backend(self) -> FloatBackend:
+        return BACKENDS["float"]
+
+    @property
+    def k(self) -> float:
+        return self.token_a_reserve * self.token_b_reserve
+
+    @property
+    def price_a_in_b(self) -> float:
+        reserve_a = self.token_a_reserve
+        return self.token_b_reserve / reserve_a if reserve_a != 0 else 0.0
+
+    @property
+    def price_b_in_a(self) -> float:
+        reserve_b = self.token_b_reserve
+        return self.token_a_reserve / reserve_b if reserve_b != 0 else 0.0
+
+class PoolTable(MutableMapping):
+    """Struct-of-arrays pool store for very large topologies (float backend only).
+
+    Reserves and fee rates live in contiguous float64 arrays and token symbols
+    are interned as int32 ids, so the numeric state of a pool takes 32 bytes.
+    Indexing by pool id returns a PoolView, so HISAAMM code works unchanged,
+    while whole-table scans run as numpy array operations.
+    """
+
+    def __init__(self, capacity: int = 16):
+        if np is None:
+            raise ImportError("numpy is required for PoolTable")
+        self.token_ids: Dict[str, int] = {}
+        self.token_symbols: List[str] = []
+        self._index: Dict[str, int] = {}
+        self._pool_ids: List[str] = []
+        self.reserve_a = np.zeros(capacity)
+        self.reserve_b = np.zeros(capacity)
+        self.fee_rate = np.zeros(capacity)
+        self.token_a = np.zeros(capacity, dtype=np.int32)
+        self.token_b = np.zeros(capacity, dtype=np.int32)
+
+    def _token_id(self, symbol: str) -> int:
+        token_id = self.token_ids.get(symbol)
+        if token_id is None:
+            token_id = self.token_ids[symbol] = len(self.token_symbols)
+            self.token_symbols.append(symbol)
+        return token_id
+
+    def _reserve(self, size: int):
+        capacity = len(self.reserve_a)
+        if size <= capacity:
+            return
+        capacity = max(size, 2 * capacity)
+        for name in ('reserve_a', 'reserve_b', 'fee_rate', 'token_a', 'token_b'):
+            old = getattr(self, name)
+            new = np.zeros(capacity, dtype=old.dtype)
+            new[:len(self)] = old[:len(self)]
+            setattr(self, name, new)
+
+    def __getitem__(self, pool_id: str) -> PoolView:
+        return PoolView(self, self._index[pool_id])
+
+    def __contains__(self, pool_id) -> bool:
+        return pool_id in self._index
+
+    def __setitem__(self, pool_id: str, pool):
+        row = self._index.get(pool_id)
+        if row is None:
+            row = len(self)
+            self._reserve(row + 1)
+            self._index[pool_id] = row
+            self._pool_ids.append(pool_id)
+        self.reserve_a[row] = float(pool.token_a_reserve)
+        self.reserve_b[row] = float(pool.token_b_reserve)
+        self.fee_rate[row] = float(pool.fee_rate)
+        self.token_a[row] = self._token_id(pool.token_a_symbol)
+        self.token_b[row] = self._token_id(pool.token_b_symbol)
+
+    def __delitem__(self, pool_id: str):
+        row = self._index.pop(pool_id)
+        last = len(self._pool_ids) - 1
+        if row != last:
+            moved = self._pool_ids[last]
+            for name in ('reserve_a', 'reserve_b', 'fee_rate', 'token_a', 'token_b'):
+                array = getattr(self, name)
+                array[row] = array[last]
+            self._pool_ids[row] = moved
+            self._index[moved] = row
+        self._pool_ids.pop()
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._pool_ids)
+
+    def __len__(self) -> int:
+        return len(self._pool_ids)
+
+    def bulk_load(self, pool_ids: List[str], token_a: List[str], token_b: List[str],
+                  reserve_a, reserve_b, fee_rate):
+        """Appends many new pools at once from aligned sequences."""
+        start = len(self)
+        count = len(pool_ids)
+        self._reserve(start + count)
+        for offset, pool_id in enumerate(pool_ids):
+            if pool_id in self._index:
+                raise ValueError(f"Pool {pool_id} already exists")
+            self._index[pool_id] = start + offset
+        self._pool_ids.extend(pool_ids)
+        end = start + count
+        self.reserve_a[start:end] = reserve_a
+        self.reserve_b[start:end] = reserve_b
+        self.fee_rate[start:end] = fee_rate
+        self.token_a[start:end] = [self._token_id(symbol) for symbol in token_a]
+        self.token_b[start:end] = [self._token_id(symbol) for symbol in token_b]
+
+    def copy(self) -> "PoolTable":
+        table = object.__new__(PoolTable)
+        table.token_ids = dict(self.token_ids)
+        table.token_symbols = list(self.token_symbols)
+        table._index = dict(self._index)
+        table._pool_ids = list(self._pool_ids)
+        for name in ('reserve_a', 'reserve_b', 'fee_rate', 'token_a', 'token_b'):
+            setattr(table, name, getattr(self, name)[:len(self)].copy())
+        return table
+
+    def prices_a_in_b(self) -> "np.ndarray":
+        size = len(self)
+        reserve_a = self.reserve_a[:size]
+        return np.divide(self.reserve_b[:size], reserve_a, out=np.zeros(size), where=reserve_a != 0)
+
+    def pool_tvls(self, token_prices: Dict[str, float]) -> "np.ndarray":
+        """Value of every pool in USDC; pools missing a token price count as zero."""
+        size = len(self)
+        prices = np.array([token_prices.get(symbol, 0.0) for symbol in self.token_symbols])
+        price_a = prices[self.token_a[:size]]
+        price_b = prices[self.token_b[:size]]
+        priced = (price_a > 0) & (price_b > 0)
+        return np.where(priced, self.reserve_a[:size] * price_a + self.reserve_b[:size] * price_b, 0.0)
+
+    def nbytes(self) -> int:
+        """Bytes held by the numeric arrays for the pools currently stored."""
+        size = len(self)
+        return sum(getattr(self, name)[:size].nbytes
+                   for name in ('reserve_a', 'reserve_b', 'fee_rate', 'token_a', 'token_b'))
 
 @dataclass
 class EcosystemPool:
@@ -69,14 +994,464 @@ class Ecosystem:
             print(f"     Rewards: {', '.join(pool.rewards)}")
             print(f"     Mechanisms: {', '.join(pool.mechanisms)}\n")
 
+class PriceOracle:
+    """Caches token prices in USDC along a BFS spanning tree of the pool graph.
+
+    Each token is priced through the pool that first reached it from USDC.
+    When a tree pool changes only the subtree below it is marked dirty, and
+    dirty prices are recomputed lazily on the next read. get_prices hands
+    out one read-only mapping until a price in it goes dirty.
+    """
+    ROOT_TOKEN = "USDC"
+
+    def __init__(self, amm: "HISAAMM"):
+        self.amm = amm
+        self._parent: Dict[str, Tuple[str, str]] = {}
+        self._children: Dict[str, List[str]] = {}
+        self._tree_edges: Dict[str, str] = {}
+        self._order: List[str] = []
+        self._prices: Dict[str, float] = {}
+        self._dirty = set()
+        self._snapshot: Optional[Mapping[str, float]] = None
+        self._indexed_pools = set()
+        self._stale = True
+        amm.subscribe(self._on_pool_changed)
+
+    def _rebuild(self):
+        """Rebuilds the spanning tree breadth-first from USDC and marks every price dirty."""
+        adjacency: Dict[str, List[Tuple[str, str]]] = {}
+        for pool_id, pool in self.amm.pools.items():
+            adjacency.setdefault(pool.token_a_symbol, []).append((pool_id, pool.token_b_symbol))
+            adjacency.setdefault(pool.token_b_symbol, []).append((pool_id, pool.token_a_symbol))
+        self._parent = {}
+        self._children = {self.ROOT_TOKEN: []}
+        self._tree_edges = {}
+        self._order = [self.ROOT_TOKEN]
+        for token in self._order:
+            for pool_id, neighbor in adjacency.get(token, ()):
+                if neighbor in self._children:
+                    continue
+                self._parent[neighbor] = (pool_id, token)
+                self._children[token].append(neighbor)
+                self._children[neighbor] = []
+                self._tree_edges[pool_id] = neighbor
+                self._order.append(neighbor)
+        self._prices = {self.ROOT_TOKEN: 1.0}
+        self._dirty = set(self._order[1:])
+        self._snapshot = None
+        self._indexed_pools = set(self.amm.pools)
+        self._stale = False
+
+    def _on_pool_changed(self, pool_id: str):
+        if self._stale or pool_id not in self._indexed_pools:
+            self._stale = True
+            return
+        child = self._tree_edges.get(pool_id)
+        if child is None or child in self._dirty:
+            return
+        self._snapshot = None
+        stack = [child]
+        while stack:
+            token = stack.pop()
+            if token in self._dirty:
+                continue
+            self._dirty.add(token)
+            stack.extend(self._children[token])
+
+    def _refresh(self, token: str):
+        pool_id, parent = self._parent[token]
+        pool = self.amm.pools[pool_id]
+        rate = pool.price_a_in_b if token == pool.token_a_symbol else pool.price_b_in_a
+        self._prices[token] = pool.backend.to_float(rate) * self._prices[parent]
+        self._dirty.discard(token)
+
+    def get_price(self, token: str, default: float = 0.0) -> float:
+        """Returns the USDC price of token, or default if it is not connected to USDC."""
+        if self._stale:
+            self._rebuild()
+        if token in self._dirty:
+            chain = [token]
+            while self._parent[chain[-1]][1] in self._dirty:
+                chain.append(self._parent[chain[-1]][1])
+            for stale_token in reversed(chain):
+                self._refresh(stale_token)
+        return self._prices.get(token, default)
+
+    def get_prices(self) -> Mapping[str, float]:
+        """Returns the USDC price of every token reachable from USDC, as a read-only mapping."""
+        if self._stale:
+            self._rebuild()
+        if self._snapshot is None:
+            for token in self._order:
+                if token in self._dirty:
+                    self._refresh(token)
+            self._snapshot = MappingProxyType({token: self._prices[token] for token in self._order})
+        return self._snapshot
+
+class PriceHistory:
+    """Per-pool ring buffers of reserves and prices with cumulative price accumulators.
+
+    Every pool change appends an observation (timestamp, reserves, price and
+    the Uniswap v2 style accumulators: the time integral of each price up to
+    that observation). Buffers hold the last `capacity` observations of each
+    pool and are preallocated on a pool's first observation. Each row is
+    written twice, at i and i + capacity, so any run of up to `capacity`
+    consecutive rows is one contiguous slice and range queries return
+    zero-copy views. Timestamps come from clock (time.time by default).
+    """
+    DTYPE = [('timestamp', 'f8'), ('reserve_a', 'f8'), ('reserve_b', 'f8'), ('price_a_in_b', 'f8'),
+             ('price_b_in_a', 'f8'), ('cumulative_a_in_b', 'f8'), ('cumulative_b_in_a', 'f8')]
+    # Volume seen over less than this many seconds is not extrapolated to a day.
+    MIN_VOLUME_SPAN = 3600.0
+
+    def __init__(self, amm: "HISAAMM", capacity: int = 1024, clock: Callable[[], float] = time.time):
+        if np is None:
+            raise ImportError("numpy is required for price history")
+        if capacity <= 0:
+            raise ValueError("capacity must be positive.")
+        self.amm = amm
+        self.capacity = capacity
+        self.clock = clock
+        self._buffers: Dict[str, "np.ndarray"] = {}
+        self._counts: Dict[str, int] = {}
+        self._last: Dict[str, Tuple[float, float, float, float, float]] = {}
+        for pool_id in amm.pools:
+            self._on_pool_changed(pool_id)
+        amm.subscribe(self._on_pool_changed)
+
+    def _on_pool_changed(self, pool_id: str):
+        pool = self.amm.pools[pool_id]
+        to_float = self.amm.backend.to_float
+        reserve_a = to_float(pool.token_a_reserve)
+        reserve_b = to_float(pool.token_b_reserve)
+        # Spot prices come from the pool: for curve pools they are not the reserve ratio.
+        price_a = to_float(pool.price_a_in_b)
+        price_b = to_float(pool.price_b_in_a)
+        now = self.clock()
+        # The previous observation is mirrored in _last so recording never reads numpy scalars.
+        last = self._last.get(pool_id)
+        if last is None:
+            self._buffers[pool_id] = np.zeros(2 * self.capacity, dtype=self.DTYPE)
+            self._counts[pool_id] = 0
+            cumulative_a = cumulative_b = 0.0
+        else:
+            elapsed = now - last[0]
+            cumulative_a = last[3] + last[1] * elapsed
+            cumulative_b = last[4] + last[2] * elapsed
+        self._last[pool_id] = (now, price_a, price_b, cumulative_a, cumulative_b)
+        count = self._counts[pool_id]
+        buffer = self._buffers[pool_id]
+        row = (now, reserve_a, reserve_b, price_a, price_b, cumulative_a, cumulative_b)
+        slot = count % self.capacity
+        buffer[slot] = row
+        buffer[slot + self.capacity] = row
+        self._counts[pool_id] = count + 1
+
+    def __len__(self) -> int:
+        return len(self._buffers)
+
+    def observation_count(self, pool_id: str) -> int:
+        """Returns how many observations are retained for pool_id."""
+        return min(self._counts.get(pool_id, 0), self.capacity)
+
+    def latest(self, pool_id: str, count: Optional[int] = None) -> "np.ndarray":
+        """Returns a view of the last count observations (all retained ones by default), oldest first."""
+        if pool_id not in self._buffers:
+            raise ValueError(f"No price history for pool {pool_id}")
+        retained = self.observation_count(pool_id)
+        count = retained if count is None else min(count, retained)
+        end = (self._counts[pool_id] - 1) % self.capacity + self.capacity + 1
+        return self._buffers[pool_id][end - count:end]
+
+    def observations(self, pool_id: str, start: Optional[float] = None,
+                     end: Optional[float] = None) -> "np.ndarray":
+        """Returns a view of the retained observations with start <= timestamp <= end."""
+        rows = self.latest(pool_id)
+        timestamps = rows['timestamp']
+        first = 0 if start is None else int(np.searchsorted(timestamps, start, side='left'))
+        last = len(rows) if end is None else int(np.searchsorted(timestamps, end, side='right'))
+        return rows[first:last]
+
+    def cumulative_prices(self, pool_id: str, at: Optional[float] = None) -> Tuple[float, float]:
+        """Returns (cumulative_a_in_b, cumulative_b_in_a) at time at (default: now).
+
+        The accumulator is interpolated from the last observation at or
+        before at, located by bisection over the retained window.
+        """
+        rows = self.latest(pool_id)
+        at = self.clock() if at is None else at
+        index = int(np.searchsorted(rows['timestamp'], at, side='right')) - 1
+        if index < 0:
+            raise ValueError(f"Time {at} is older than the retained history of pool {pool_id}")
+        row = rows[index]
+        elapsed = at - row['timestamp']
+        return (float(row['cumulative_a_in_b'] + row['price_a_in_b'] * elapsed),
+                float(row['cumulative_b_in_a'] + row['price_b_in_a'] * elapsed))
+
+    def daily_volume(self, pool_id: str, min_span: float = MIN_VOLUME_SPAN) -> Optional[float]:
+        """Returns pool_id's mean daily swap volume over the retained history, in token B.
+
+        A swap is an observation where one reserve rose and the other fell;
+        its input is valued at the price before it. Liquidity changes move
+        both reserves the same way and are skipped. Returns None when no swap
+        was seen or the history spans less than min_span seconds.
+        """
+        if self.observation_count(pool_id) < 2:
+            return None
+        rows = self.latest(pool_id)
+        span = self.clock() - float(rows['timestamp'][0])
+        if span < min_span:
+            return None
+        delta_a = np.diff(rows['reserve_a'])
+        delta_b = np.diff(rows['reserve_b'])
+        a_in = (delta_a > 0) & (delta_b < 0)
+        b_in = (delta_b > 0) & (delta_a < 0)
+        if not (a_in.any() or b_in.any()):
+            return None
+        volume = (delta_a * rows['price_a_in_b'][:-1])[a_in].sum() + delta_b[b_in].sum()
+        return float(volume) * 86400.0 / span
+
+    def twap(self, pool_id: str, window: float, end: Optional[float] = None) -> Tuple[float, float]:
+        """Returns the time-weighted (price_a_in_b, price_b_in_a) over [end - window, end].
+
+        Two accumulator reads and a subtraction, as in Uniswap v2; end
+        defaults to now.
+        """
+        if window <= 0:
+            raise ValueError("window must be positive.")
+        end = self.clock() if end is None else end
+        end_a, end_b = self.cumulative_prices(pool_id, end)
+        start_a, start_b = self.cumulative_prices(pool_id, end - window)
+        return (end_a - start_a) / window, (end_b - start_b) / window
+
+# Default pools per backend name, built on first use by initialize_amm_pools.
+_DEFAULT_POOLS: Dict[str, Dict[str, Union[Pool, CurvePool]]] = {}
+
+class LiquidityBook:
+    """LP share accounting for one pool.
+
+    Positions hold shares of the pool's principal: the reserves minus the
+    fees accrued to LPs but not yet claimed. Fees stay in the reserves as
+    usual, so swap outputs are unchanged. Each swap adds fee / total_shares
+    to a per-token fee-growth accumulator in O(1), and a position's fees are
+    shares * (growth now - growth when it last settled). Minting, burning
+    and claiming settle a single position in O(1), however many positions
+    exist. Positions are rows in parallel lists indexed by position id, so a
+    pool can hold millions of them.
+
+    As in Uniswap v2, the first shares a book issues lock MINIMUM_SHARES
+    that no position owns. total_shares therefore never returns to zero and
+    every position, including the last one, can be burned in full; the
+    principal behind the locked shares stays in the pool.
+    """
+    MINIMUM_SHARES = Decimal("0.000001")
+
+    def __init__(self, backend):
+        self.backend = backend
+        self.total_shares = backend.zero
+        self.fee_growth_a = backend.zero
+        self.fee_growth_b = backend.zero
+        self.unclaimed_a = backend.zero
+        self.unclaimed_b = backend.zero
+        self.owners: List[str] = []
+        self.shares: List = []
+        self.growth_a: List = []
+        self.growth_b: List = []
+        self.owed_a: List = []
+        self.owed_b: List = []
+
+    def __len__(self) -> int:
+        return len(self.shares)
+
+    def principal(self, reserve_a, reserve_b) -> Tuple[object, object]:
+        """Returns the reserves that belong to shares, i.e. excluding unclaimed fees."""
+        zero = self.backend.zero
+        return max(reserve_a - self.unclaimed_a, zero), max(reserve_b - self.unclaimed_b, zero)
+
+    def accrue(self, token_a_in: bool, fee):
+        if self.total_shares <= 0:
+            return
+        growth = self.backend.div(fee, self.total_shares)
+        if token_a_in:
+            self.fee_growth_a += growth
+            self.unclaimed_a += fee
+        else:
+            self.fee_growth_b += growth
+            self.unclaimed_b += fee
+
+    def open_position(self, owner: str, shares) -> int:
+        self.owners.append(owner)
+        self.shares.append(shares)
+        self.growth_a.append(self.fee_growth_a)
+        self.growth_b.append(self.fee_growth_b)
+        self.owed_a.append(self.backend.zero)
+        self.owed_b.append(self.backend.zero)
+        self.total_shares += shares
+        return len(self.shares) - 1
+
+    def open_first_position(self, owner: str, shares) -> int:
+        """Locks MINIMUM_SHARES out of the first shares issued and opens a position with the rest."""
+        locked = self.backend.convert(self.MINIMUM_SHARES)
+        if shares <= locked:
+            raise ValueError("Amounts are too small to mint shares.")
+        self.total_shares += locked
+        return self.open_position(owner, shares - locked)
+
+    def _check(self, position_id: int):
+        if not 0 <= position_id < len(self.shares):
+            raise ValueError(f"Position {position_id} does not exist")
+
+    def fees_owed(self, position_id: int) -> Tuple[object, object]:
+        """Fees earned by a position and not yet claimed."""
+        self._check(position_id)
+        backend = self.backend
+        shares = self.shares[position_id]
+        return (self.owed_a[position_id] + backend.mul(shares, self.fee_growth_a - self.growth_a[position_id]),
+                self.owed_b[position_id] + backend.mul(shares, self.fee_growth_b - self.growth_b[position_id]))
+
+    def settle(self, position_id: int):
+        """Moves the fees a position earned since it last settled into its owed balance."""
+        self.owed_a[position_id], self.owed_b[position_id] = self.fees_owed(position_id)
+        self.growth_a[position_id] = self.fee_growth_a
+        self.growth_b[position_id] = self.fee_growth_b
+
+    def claim(self, position_id: int) -> Tuple[object, object]:
+        """Settles a position and zeroes its owed fees; returns the amounts to pay out."""
+        self.settle(position_id)
+        fee_a, fee_b = self.owed_a[position_id], self.owed_b[position_id]
+        self.owed_a[position_id] = self.owed_b[position_id] = self.backend.zero
+        self.unclaimed_a -= fee_a
+        self.unclaimed_b -= fee_b
+        return fee_a, fee_b
+
+    def burn(self, position_id: int, shares, reserve_a, reserve_b) -> Tuple[object, object]:
+        """Removes shares from a position; returns the principal they redeem."""
+        self._check(position_id)
+        if shares <= 0 or shares > self.shares[position_id]:
+            raise ValueError(f"Position {position_id} holds {self.backend.to_float(self.shares[position_id]):.6f} shares.")
+        self.settle(position_id)
+        principal_a, principal_b = self.principal(reserve_a, reserve_b)
+        amount_a = self.backend.muldiv(principal_a, shares, self.total_shares)
+        amount_b = self.backend.muldiv(principal_b, shares, self.total_shares)
+        self.shares[position_id] -= shares
+        self.total_shares -= shares
+        return amount_a, amount_b
+
+    def row(self, position_id: int) -> Tuple:
+        return (self.owners[position_id], self.shares[position_id], self.growth_a[position_id],
+                self.growth_b[position_id], self.owed_a[position_id], self.owed_b[position_id])
+
+    def save_state(self) -> Tuple:
+        """Returns the accumulators plus an empty map for rows changed afterwards (see remember)."""
+        return (self.total_shares, self.fee_growth_a, self.fee_growth_b, self.unclaimed_a,
+                self.unclaimed_b, len(self.shares), {})
+
+    def remember(self, state: Tuple, position_id: int):
+        """Records a row's current values in state before the row is changed."""
+        if position_id < state[5] and position_id not in state[6]:
+            state[6][position_id] = self.row(position_id)
+
+    def restore_state(self, state: Tuple):
+        (self.total_shares, self.fee_growth_a, self.fee_growth_b, self.unclaimed_a,
+         self.unclaimed_b, length, rows) = state
+        for column in (self.owners, self.shares, self.growth_a, self.growth_b, self.owed_a, self.owed_b):
+            del column[length:]
+        for position_id, row in rows.items():
+            (self.owners[position_id], self.shares[position_id], self.growth_a[position_id],
+             self.growth_b[position_id], self.owed_a[position_id], self.owed_b[position_id]) = row
+
+    def copy(self) -> "LiquidityBook":
+        book = copy.copy(self)
+        for name in ('owners', 'shares', 'growth_a', 'growth_b', 'owed_a', 'owed_b'):
+            setattr(book, name, list(getattr(self, name)))
+        return book
+
+class ResultStruct:
+    """Base for the typed results of read_pool_info, quote_price_impact and swap.
+
+    Numeric fields hold backend-native values, so no float conversion
+    happens unless the caller asks for one. Instances are mutable and may be
+    passed back as out= to be refilled in place, which lets a hot loop run
+    without allocating a result per call. Fields are unset until filled.
+    """
+    __slots__ = ()
+
+    def as_dict(self) -> Dict:
+        return {name: getattr(self, name, None) for name in self.__slots__}
+
+    def __repr__(self) -> str:
+        fields = ", ".join(f"{name}={getattr(self, name, None)!r}" for name in self.__slots__)
+        return f"{type(self).__name__}({fields})"
+
+class PoolInfo(ResultStruct):
+    __slots__ = ('pool_id', 'token_a', 'token_b', 'reserve_a', 'reserve_b',
+                 'price_a_in_b', 'price_b_in_a', 'k', 'fee_rate')
+
+class PriceImpact(ResultStruct):
+    """price_impact is a fraction of the starting price, not a percentage."""
+    __slots__ = ('amount_out', 'fee', 'price_impact', 'new_price_a_in_b', 'new_price_b_in_a')
+
+class SwapResult(ResultStruct):
+    __slots__ = ('pool_id', 'token_in', 'amount_in', 'token_out', 'amount_out',
+                 'fee_paid', 'new_price_a_in_b', 'new_price_b_in_a')
+
 class HISAAMM:
-    """HISA Automated Market Maker implementation with ecosystem support."""
+    """HISA Automated Market Maker implementation with ecosystem support.
 
-    def __init__(self):
-        self.pools: Dict[str, Pool] = {}
-        self.total_fees_collected = Decimal('0')
-        self.ecosystems: Dict[str, Ecosystem] = self._initialize_hisa_ecosystems()
-        self.initialize_amm_pools()
+    backend selects the pool arithmetic: "decimal" (reference), "fixed"
+    (18-decimal integers, as on-chain) or "float" (float64 fast mode).
+    pool_store="table" keeps pools in a struct-of-arrays PoolTable (float
+    backend only). token_symbols overrides the tokens create_pool accepts,
+    e.g. for synthetic topologies. topology replaces the default pools; see
+    load_topology for the accepted forms. The descriptive ecosystems are
+    built on first access. Pool creation is reported through the
+    "AMM_simulator" logger rather than printed.
+    """
+
+    def __init__(self, backend: str = "decimal", pool_store: str = "dict",
+                 token_symbols: Optional[List[str]] = None,
+                 topology: Union[None, str, Dict, List] = None):
+        if backend not in BACKENDS:
+            raise ValueError(f"Unknown backend {backend}. Valid backends: {', '.join(BACKENDS)}")
+        if pool_store not in ("dict", "table"):
+            raise ValueError(f"Unknown pool store {pool_store}. Valid stores: dict, table")
+        if pool_store == "table" and backend != "float":
+            raise ValueError("The table pool store requires the float backend.")
+        self.backend = BACKENDS[backend]
+        self.token_symbols = set(token_symbols or TOKEN_SYMBOLS)
+        self.pools: Dict[str, Pool] = PoolTable() if pool_store == "table" else {}
+        self.total_fees_collected = self.backend.zero
+        self._pool_listeners: List[Callable[[str], None]] = []
+        self._tx_logs: List[Tuple[Dict[str, Tuple], Dict[str, Decimal], Dict[str, Optional[Tuple]]]] = []
+        self.lp_books: Dict[str, LiquidityBook] = {}
+        self._shared_books: set = set()
+        self._ecosystems: Optional[Dict[str, Ecosystem]] = None
+        self.price_oracle = PriceOracle(self)
+        self.price_history: Optional[PriceHistory] = None
+        if topology is None:
+            self.initialize_amm_pools()
+        else:
+            self.load_topology(topology)
+
+    @classmethod
+    def from_config(cls, config: Union[str, Dict], **overrides) -> "HISAAMM":
+        """Builds an AMM from a JSON config file path or an equivalent dict.
+
+        Recognized keys are backend, pool_store, token_symbols and pools (see
+        load_topology); keyword overrides take precedence over the config.
+        """
+        if isinstance(config, str):
+            with open(config) as handle:
+                config = json.load(handle)
+        options = {key: config[key] for key in ('backend', 'pool_store', 'token_symbols') if key in config}
+        options.update(overrides)
+        return cls(topology=config.get('pools', []), **options)
+
+    @property
+    def ecosystems(self) -> Dict[str, Ecosystem]:
+        if self._ecosystems is None:
+            self._ecosystems = self._initialize_hisa_ecosystems()
+        return self._ecosystems
 
     def _initialize_hisa_ecosystems(self) -> Dict[str, Ecosystem]:
         """Initializes the conceptual HISA ecosystems (JANI, UMOJA, CHAT)."""
@@ -166,47 +1541,321 @@ class HISAAMM:
         return {"JANI": jani, "UMOJA": umoja, "CHAT": chat}
 
     def initialize_amm_pools(self):
-        """Create initial liquidity pools for the HISA ecosystem AMM."""
-        self.create_pool("HISA", "USDC", 100000, 500000)
-        self.create_pool("JANI", "USDC", 50000, 250000)
-        self.create_pool("CHAT", "USDC", 75000, 375000)
-        self.create_pool("UMOJA", "USDC", 80000, 400000)
-        self.create_pool("JANI_STABLE", "USDC", 200000, 200000, fee_rate=0.001)
-        self.create_pool("UMOJA_STABLE", "USDC", 200000, 200000, fee_rate=0.001)
-        self.create_pool("UMOJA_OPTION", "UMOJA", 1000000, 50000)
-        self.create_pool("JANI", "JANI_STABLE", 50000, 50000)
-        self.create_pool("UMOJA", "UMOJA_STABLE", 80000, 80000)
-        self.create_pool("HBAR", "USDC", 200000, 100000)
+        """Create initial liquidity pools for the HISA ecosystem AMM.
+
+        The default pools are built once per backend and then copied, which
+        keeps constructing many AMMs cheap. The table store holds only
+        constant-product pools, so it gets the StableSwap pairs of
+        DEFAULT_TOPOLOGY as constant-product pools with the same reserves
+        and fee.
+        """
+        if isinstance(self.pools, PoolTable):
+            logger.warning("The table pool store holds only constant-product pools; "
+                           "building the default StableSwap pools as constant-product.")
+            self.load_topology(constant_product_topology())
+
+            return
+        if not self.token_symbols.issuperset(TOKEN_SYMBOLS):
+            self.load_topology(DEFAULT_TOPOLOGY)
+            return
+        prototypes = _DEFAULT_POOLS.get(self.backend.name)
+        if prototypes is None:
+            prototypes = _DEFAULT_POOLS[self.backend.name] = HISAAMM(
+                backend=self.backend.name, topology=DEFAULT_TOPOLOGY).pools
+        for pool_id, prototype in prototypes.items():
+            if isinstance(prototype, CurvePool):
+                self.pools[pool_id] = prototype.copy()
+            else:
+                self.pools[pool_id] = Pool(prototype.token_a_reserve, prototype.token_b_reserve,
+                                           prototype.token_a_symbol, prototype.token_b_symbol,
+                                           prototype.fee_rate, prototype.backend)
+            self._notify_pool_changed(pool_id)
+        if logger.isEnabledFor(logging.INFO):
+            to_float = self.backend.to_float
+            for pool_id, pool in self.pools.items():
+                self._log_pool_created(pool_id, pool.token_a_symbol, pool.token_b_symbol,
+                                       to_float(pool.token_a_reserve), to_float(pool.token_b_reserve))
+
+    def load_topology(self, topology: Union[str, Dict, List]) -> List[str]:
+        """Creates the pools described by topology; returns their ids.
+
+        topology is a JSON file path, a dict with a "pools" list, or the list
+        itself. Each pool is a dict with token_a, token_b, reserve_a,
+        reserve_b and optional fee_rate (default 0.003), or a tuple in that
+        order. A dict may also name a pool_type other than constant_product
+        plus that type's options (e.g. "amplification" for "stableswap");
+        such pools are created one at a time after the bulk-loaded ones.
+        """
+        if isinstance(topology, str):
+            with open(topology) as handle:
+                topology = json.load(handle)
+        if isinstance(topology, dict):
+            topology = topology.get('pools', [])
+        rows = []
+        curve_entries = []
+        for entry in topology:
+            if isinstance(entry, dict) and entry.get('pool_type', "constant_product") != "constant_product":
+                curve_entries.append(entry)
+            elif isinstance(entry, dict):
+                rows.append((entry['token_a'], entry['token_b'], entry['reserve_a'], entry['reserve_b'],
+                             entry.get('fee_rate', 0.003)))
+            else:
+                rows.append((*entry, 0.003)[:5])
+        pool_ids = []
+        if rows:
+            token_a, token_b, reserve_a, reserve_b, fee_rates = (list(column) for column in zip(*rows))
+            pool_ids = self.load_pools(token_a, token_b, reserve_a, reserve_b, fee_rates)
+            if logger.isEnabledFor(logging.INFO):
+                for pool_id, row in zip(pool_ids, rows):
+                    self._log_pool_created(pool_id, *row[:4])
+        for entry in curve_entries:
+            options = {key: value for key, value in entry.items()
+                       if key not in ('token_a', 'token_b', 'reserve_a', 'reserve_b', 'fee_rate')}
+            pool_ids.append(self.create_pool(entry['token_a'], entry['token_b'], entry['reserve_a'],
+                                             entry['reserve_b'], entry.get('fee_rate', 0.003), **options))
+        return pool_ids
 
     def create_pool(self, token_a: str, token_b: str,
                    initial_a: float, initial_b: float,
-                   fee_rate: float = 0.003) -> str:
-        if token_a not in TOKEN_SYMBOLS or token_b not in TOKEN_SYMBOLS:
-            raise ValueError(f"Invalid token symbols. Valid tokens: {', '.join(TOKEN_SYMBOLS)}")
+                   fee_rate: float = 0.003, pool_type: str = "constant_product",
+                   **options) -> str:
+        """Creates a pool priced at initial_b / initial_a and returns its id.
+
+        pool_type selects the curve: "constant_product" (the default) or a
+        key of POOL_TYPES, whose create() receives the extra options, e.g.
+        price_range and tick_spacing for "concentrated".
+        """
+        if token_a not in self.token_symbols or token_b not in self.token_symbols:
+            raise ValueError(f"Invalid token symbols. Valid tokens: {', '.join(sorted(self.token_symbols))}")
         pool_id = "-".join(sorted([token_a, token_b]))
         if pool_id in self.pools:
             raise ValueError(f"Pool {pool_id} already exists")
-        self.pools[pool_id] = Pool(
-            token_a_reserve=Decimal(str(initial_a)),
-            token_b_reserve=Decimal(str(initial_b)),
-            token_a_symbol=token_a,
-            token_b_symbol=token_b,
-            fee_rate=Decimal(str(fee_rate))
-        )
-        print(f"Created pool {pool_id}")
-        print(f"Initial reserves: {initial_a} {token_a}, {initial_b} {token_b}")
-        if token_a == self.pools[pool_id].token_a_symbol:
-            print(f"Initial price: 1 {token_a} = {self.pools[pool_id].price_a_in_b:.6f} {token_b}")
+        backend = self.backend
+        if pool_type == "constant_product":
+            if options:
+                raise ValueError(f"Unexpected options for a constant-product pool: {', '.join(sorted(options))}")
+            pool = Pool(
+                token_a_reserve=backend.convert(initial_a),
+                token_b_reserve=backend.convert(initial_b),
+                token_a_symbol=token_a,
+                token_b_symbol=token_b,
+                fee_rate=backend.convert(fee_rate),
+                backend=backend
+            )
+        elif pool_type in POOL_TYPES:
+            if isinstance(self.pools, PoolTable):
+                raise ValueError(f"The table pool store only holds constant-product pools, not {pool_type}.")
+            pool = POOL_TYPES[pool_type].create(token_a, token_b, backend.convert(initial_a), backend.convert(initial_b),
+                                                backend.convert(fee_rate), backend, **options)
         else:
-            print(f"Initial price: 1 {token_a} = {self.pools[pool_id].price_b_in_a:.6f} {token_b}")
+            raise ValueError(f"Unknown pool type {pool_type}. Valid types: constant_product, {', '.join(sorted(POOL_TYPES))}")
+        self.pools[pool_id] = pool
+        if logger.isEnabledFor(logging.INFO):
+            self._log_pool_created(pool_id, token_a, token_b, initial_a, initial_b)
+        self._notify_pool_changed(pool_id)
         return pool_id
 
+    def _log_pool_created(self, pool_id: str, token_a: str, token_b: str, initial_a, initial_b):
+        pool = self.pools[pool_id]
+        price = pool.price_a_in_b if token_a == pool.token_a_symbol else pool.price_b_in_a
+        logger.info("Created pool %s", pool_id)
+        logger.info("Initial reserves: %s %s, %s %s", initial_a, token_a, initial_b, token_b)
+        logger.info("Initial price: 1 %s = %.6f %s", token_a, self.backend.to_float(price), token_b)
+
+    def load_pools(self, token_a: List[str], token_b: List[str], reserve_a: List[float],
+                   reserve_b: List[float], fee_rate=0.003) -> List[str]:
+        """Creates many pools at once without per-pool output; returns their ids.
+
+        With a PoolTable store the rows are written as whole-array slices.
+        fee_rate may be a single value or a sequence aligned with the tokens.
+        """
+        count = len(token_a)
+        if not (len(token_b) == len(reserve_a) == len(reserve_b) == count):
+            raise ValueError("Pool definitions must all have the same length.")
+        fee_rates = fee_rate if hasattr(fee_rate, '__len__') else [fee_rate] * count
+        pool_ids = []
+        for symbol_a, symbol_b in zip(token_a, token_b):
+            if symbol_a not in self.token_symbols or symbol_b not in self.token_symbols:
+                raise ValueError(f"Invalid token symbols: {symbol_a}, {symbol_b}")
+            pool_id = "-".join(sorted([symbol_a, symbol_b]))
+            if pool_id in self.pools:
+                raise ValueError(f"Pool {pool_id} already exists")
+            pool_ids.append(pool_id)
+        if len(set(pool_ids)) != count:
+            raise ValueError("Duplicate pools in definitions.")
+        if isinstance(self.pools, PoolTable):
+            self.pools.bulk_load(pool_ids, token_a, token_b, reserve_a, reserve_b, fee_rates)
+        else:
+            convert = self.backend.convert
+            for pool_id, symbol_a, symbol_b, amount_a, amount_b, rate in zip(
+                    pool_ids, token_a, token_b, reserve_a, reserve_b, fee_rates):
+                self.pools[pool_id] = Pool(convert(amount_a), convert(amount_b), symbol_a, symbol_b,
+                                           convert(rate), self.backend)
+        for pool_id in pool_ids:
+            self._notify_pool_changed(pool_id)
+        return pool_ids
+
+    def get_pool_tvls(self) -> Dict[str, float]:
+        """Returns each pool's value in USDC (0.0 when a token has no price)."""
+        prices = self.get_ecosystem_token_prices()
+        if isinstance(self.pools, PoolTable):
+            return dict(zip(self.pools, self.pools.pool_tvls(prices).tolist()))
+        tvls = {}
+        to_float = self.backend.to_float
+        for pool_id, pool in self.pools.items():
+            price_a = prices.get(pool.token_a_symbol, 0)
+            price_b = prices.get(pool.token_b_symbol, 0)
+            tvls[pool_id] = (to_float(pool.token_a_reserve) * price_a + to_float(pool.token_b_reserve) * price_b
+                             if price_a > 0 and price_b > 0 else 0.0)
+        return tvls
+
+    def get_total_value_locked(self) -> float:
+        if isinstance(self.pools, PoolTable):
+            return float(self.pools.pool_tvls(self.get_ecosystem_token_prices()).sum())
+        return sum(self.get_pool_tvls().values())
+
+    def track_price_history(self, capacity: int = 1024,
+                            clock: Callable[[], float] = time.time) -> PriceHistory:
+        """Starts recording per-pool price history (see PriceHistory); returns the recorder."""
+        if self.price_history is None:
+            self.price_history = PriceHistory(self, capacity, clock)
+        return self.price_history
+
+    def subscribe(self, callback: Callable[[str], None]):
+        """Registers callback(pool_id), called when a pool is created or its reserves change."""
+        self._pool_listeners.append(callback)
+
+    def _notify_pool_changed(self, pool_id: str):
+        for callback in self._pool_listeners:
+            callback(pool_id)
+
+    def _writable_pool(self, pool_id: str, include_liquidity: bool = False) -> Pool:
+        """Returns the pool for mutation, copying it first if it is shared with a fork.
+
+        include_liquidity asks a CurvePool to also save its liquidity layout
+        for rollback, which only liquidity changes need.
+        """
+        pools = self.pools
+        pool = pools.for_write(pool_id) if isinstance(pools, CopyOnWritePools) else pools[pool_id]
+        if self._tx_logs:
+            undo = self._tx_logs[-1][0]
+            state = undo.get(pool_id)
+            if isinstance(pool, CurvePool):
+                if state is None:
+                    undo[pool_id] = pool.save_state(include_liquidity)
+                elif include_liquidity:
+                    undo[pool_id] = pool.with_liquidity(state)
+            elif state is None:
+                undo[pool_id] = (pool.token_a_reserve, pool.token_b_reserve)
+        return pool
+
+    def fork(self) -> "HISAAMM":
+        """Returns a copy-on-write copy of this AMM for what-if scenarios.
+
+        Both AMMs keep sharing Pool objects until one of them writes a pool,
+        at which point only that pool is copied. Forking an AMM that has not
+        been written since its last fork is O(1). A PoolTable store is copied
+        as whole arrays instead. Subscribers are not carried over to the fork.
+        """
+        if isinstance(self.pools, PoolTable):
+            shared = self.pools.copy()
+        elif isinstance(self.pools, CopyOnWritePools):
+            shared = self.pools.frozen_view()
+            if self.pools.has_local_writes():
+                self.pools = CopyOnWritePools(shared)
+        else:
+            shared = self.pools
+            self.pools = CopyOnWritePools(shared)
+        fork = object.__new__(type(self))
+        fork.__dict__.update(self.__dict__)
+        fork.pools = shared if isinstance(shared, PoolTable) else CopyOnWritePools(shared)
+        # LP books are shared the same way and copied on their first write.
+        self._shared_books = set(self.lp_books)
+        fork._shared_books = set(self.lp_books)
+        fork.lp_books = dict(self.lp_books)
+        fork._pool_listeners = []
+        fork._tx_logs = []
+        fork.price_oracle = PriceOracle(fork)
+        fork.price_history = None
+        return fork
+
+    @contextmanager
+    def transaction(self, pool_ids: Optional[List[str]] = None):
+        """Groups execute_swap/add_liquidity calls that commit or roll back together.
+
+        If the block raises, every pool written inside it and the fees it
+        collected are restored before the exception propagates. Transactions
+        may nest; an inner commit folds its logs into the enclosing
+        transaction. pool_ids names the pools the block will write; it is
+        only used by ConcurrentHISAAMM, which locks them for the whole block.
+        """
+        undo: Dict[str, Tuple] = {}
+        fees: Dict[str, Decimal] = {}
+        books: Dict[str, Optional[Tuple]] = {}
+        self._tx_logs.append((undo, fees, books))
+        try:
+            yield self
+        except BaseException:
+            self._tx_logs.pop()
+            for pool_id, state in books.items():
+                if state is None:
+                    del self.lp_books[pool_id]
+                else:
+                    self.lp_books[pool_id].restore_state(state)
+            for pool_id, state in undo.items():
+                pool = self.pools[pool_id]
+                if isinstance(pool, CurvePool):
+                    pool.restore_state(state)
+                else:
+                    pool.token_a_reserve, pool.token_b_reserve = state
+                self._notify_pool_changed(pool_id)
+            for pool_id, fee in fees.items():
+                self._add_fee(pool_id, -fee)
+            raise
+        self._tx_logs.pop()
+        if self._tx_logs:
+            outer_undo, outer_fees, outer_books = self._tx_logs[-1]
+            for pool_id, state in books.items():
+                if pool_id not in outer_books:
+                    outer_books[pool_id] = state
+                elif outer_books[pool_id] is not None and state is not None:
+                    length, rows = outer_books[pool_id][5:]
+                    for position_id, row in state[6].items():
+                        if position_id < length:
+                            rows.setdefault(position_id, row)
+            for pool_id, state in undo.items():
+                outer_state = outer_undo.setdefault(pool_id, state)
+                if outer_state is not state and isinstance(self.pools[pool_id], CurvePool) and state[-1] is not None:
+                    outer_undo[pool_id] = self.pools[pool_id].with_liquidity(outer_state, state)
+            for pool_id, fee in fees.items():
+                outer_fees[pool_id] = outer_fees.get(pool_id, self.backend.zero) + fee
+
+    def _record_fee(self, pool_id: str, fee):
+        """Adds a swap fee to the running total and to the open transaction's log."""
+        self._add_fee(pool_id, fee)
+        if self._tx_logs:
+            fees = self._tx_logs[-1][1]
+            fees[pool_id] = fees.get(pool_id, self.backend.zero) + fee
+
+    def _add_fee(self, pool_id: str, fee):
+        self.total_fees_collected += fee
+
     def get_swap_amount_out(self, pool_id: str, token_in: str,
                            amount_in: float) -> Tuple[Decimal, Decimal]:
+        """Quotes a swap; amounts are returned in the backend's native type."""
         if pool_id not in self.pools:
             raise ValueError(f"Pool {pool_id} does not exist")
-        pool = self.pools[pool_id]
-        amount_in_decimal = Decimal(str(amount_in))
+        return self._swap_amount_out(self.pools[pool_id], pool_id, token_in, self.backend.convert(amount_in))
+
+    def _check_amount(self, amount):
+        """Raises ValueError unless a backend-native amount is finite and positive."""
+        if not math.isfinite(self.backend.to_float(amount)) or not amount > 0:
+            raise ValueError("Amount must be a finite positive number.")
+
+    def _swap_amount_out(self, pool: Pool, pool_id: str, token_in: str, amount_in):
+        self._check_amount(amount_in)
+        if isinstance(pool, CurvePool):
+            return pool.quote(token_in, amount_in)
         if token_in == pool.token_a_symbol:
             reserve_in = pool.token_a_reserve
             reserve_out = pool.token_b_reserve
@@ -215,149 +1864,803 @@ class HISAAMM:
             reserve_out = pool.token_a_reserve
         else:
             raise ValueError(f"Token {token_in} not found in pool {pool_id}")
-        fee_amount = amount_in_decimal * pool.fee_rate
-        amount_in_after_fee = amount_in_decimal - fee_amount
-        amount_out = (reserve_out * amount_in_after_fee) / (reserve_in + amount_in_after_fee)
+        backend = self.backend
+        fee_amount = backend.mul(amount_in, pool.fee_rate)
+        amount_in_after_fee = amount_in - fee_amount
+        amount_out = backend.muldiv(reserve_out, amount_in_after_fee, reserve_in + amount_in_after_fee)
         if amount_out < 0:
-            amount_out = Decimal('0')
+            amount_out = backend.zero
+        return amount_out, fee_amount
+
+    def get_swap_amounts_out(self, pool_ids, tokens_in, amounts_in) -> Tuple["np.ndarray", "np.ndarray"]:
+        """Vectorized get_swap_amount_out over an array of input amounts.
+
+        pool_ids and tokens_in may each be a single string or an array aligned
+        with amounts_in. Every distinct (pool, token) pair is looked up once
+        and the constant-product quote is evaluated for the whole batch in
+        float64, matching the Decimal path within BATCH_QUOTE_RTOL. Curve
+        pools quote their share of the batch through CurvePool.quote_many,
+        which StableSwapPool runs as one vectorized Newton solve.
+        Returns (amount_out, fee) arrays shaped like amounts_in.
+        """
+        if np is None:
+            raise ImportError("numpy is required for batch quotes")
+        amounts = np.asarray(amounts_in, dtype=np.float64)
+        if isinstance(pool_ids, str) and isinstance(tokens_in, str):
+            if isinstance(self.pools.get(pool_ids), CurvePool):
+                return self._curve_quotes(pool_ids, tokens_in, amounts)
+            reserve_in, reserve_out, fee_rate = self._quote_params(pool_ids, tokens_in)
+            curve_keys = []
+        else:
+            pairs = np.char.add(np.char.add(np.asarray(pool_ids, dtype=str), "|"),
+                                np.asarray(tokens_in, dtype=str))
+            keys, inverse = np.unique(np.broadcast_to(pairs, amounts.shape), return_inverse=True)
+            inverse = inverse.reshape(amounts.shape)
+            split_keys = [key.split("|", 1) for key in keys.tolist()]
+            curve_keys = [index for index, (pool_id, _) in enumerate(split_keys)
+                          if isinstance(self.pools.get(pool_id), CurvePool)]
+            # Curve pools are quoted separately below; give them a harmless placeholder row here.
+            params = np.array([(1.0, 1.0, 0.0) if index in curve_keys else self._quote_params(*key)
+                               for index, key in enumerate(split_keys)], dtype=np.float64).reshape(-1, 3)
+            reserve_in = params[inverse, 0]
+            reserve_out = params[inverse, 1]
+            fee_rate = params[inverse, 2]
+        fee_amount = amounts * fee_rate
+        amount_in_after_fee = amounts - fee_amount
+        amount_out = np.maximum((reserve_out * amount_in_after_fee) / (reserve_in + amount_in_after_fee), 0.0)
+        for index in curve_keys:
+            mask = inverse == index
+            amount_out[mask], fee_amount[mask] = self._curve_quotes(*split_keys[index], amounts[mask])
         return amount_out, fee_amount
 
+    def _curve_quotes(self, pool_id: str, token_in: str, amounts: "np.ndarray") -> Tuple["np.ndarray", "np.ndarray"]:
+        return self.pools[pool_id].quote_many(token_in, amounts)
+
+    def _quote_params(self, pool_id: str, token_in: str) -> Tuple[float, float, float]:
+        """Returns (reserve_in, reserve_out, fee_rate) as floats for a swap direction."""
+        if pool_id not in self.pools:
+            raise ValueError(f"Pool {pool_id} does not exist")
+        pool = self.pools[pool_id]
+        if isinstance(pool, CurvePool):
+            raise ValueError(f"Pool {pool_id} is not a constant-product pool.")
+        to_float = self.backend.to_float
+        if token_in == pool.token_a_symbol:
+            return to_float(pool.token_a_reserve), to_float(pool.token_b_reserve), to_float(pool.fee_rate)
+        if token_in == pool.token_b_symbol:
+            return to_float(pool.token_b_reserve), to_float(pool.token_a_reserve), to_float(pool.fee_rate)
+        raise ValueError(f"Token {token_in} not found in pool {pool_id}")
+
     def execute_swap(self, pool_id: str, token_in: str, amount_in: float) -> Dict:
         if pool_id not in self.pools:
             raise ValueError(f"Pool {pool_id} does not exist")
+        amount_in_native = self.backend.convert(amount_in)
+        amount_out, fee = self._execute_swap(pool_id, token_in, amount_in_native)
+        return self._swap_result(pool_id, token_in, amount_in_native, amount_out, fee)
+
+    def swap(self, pool_id: str, token_in: str, amount_in, out: Optional[SwapResult] = None,
+             native: bool = False) -> SwapResult:
+        """Typed execute_swap: fills out (or a new SwapResult) with backend-native values.
+
+        With native=True amount_in is taken as already backend-native (for
+        example a previous result's amount_out) and is not converted again;
+        otherwise it is a human amount, as for execute_swap.
+        """
+        if pool_id not in self.pools:
+            raise ValueError(f"Pool {pool_id} does not exist")
+        amount_in_native = amount_in if native else self.backend.convert(amount_in)
+        amount_out, fee = self._execute_swap(pool_id, token_in, amount_in_native)
         pool = self.pools[pool_id]
-        amount_out, fee = self.get_swap_amount_out(pool_id, token_in, amount_in)
-        amount_in_decimal = Decimal(str(amount_in))
-        token_out = pool.token_b_symbol if token_in == pool.token_a_symbol else pool.token_a_symbol
+        result = out if out is not None else SwapResult()
+        result.pool_id = pool_id
+        result.token_in = token_in
+        result.amount_in = amount_in_native
+        result.token_out = pool.token_b_symbol if token_in == pool.token_a_symbol else pool.token_a_symbol
+        result.amount_out = amount_out
+        result.fee_paid = fee
+        result.new_price_a_in_b = pool.price_a_in_b
+        result.new_price_b_in_a = pool.price_b_in_a
+        return result
+
+    def _execute_swap(self, pool_id: str, token_in: str, amount_in):
+        """Applies a swap of a backend-native amount and returns (amount_out, fee)."""
+        pool = self._writable_pool(pool_id)
+        if isinstance(pool, CurvePool):
+            self._check_amount(amount_in)
+            amount_out, fee = pool.swap(token_in, amount_in)
+            self._record_fee(pool_id, fee)
+            if pool_id in self.lp_books:
+                self._writable_book(pool_id)[0].accrue(token_in == pool.token_a_symbol, fee)
+            self._notify_pool_changed(pool_id)
+            return amount_out, fee
+        amount_out, fee = self._swap_amount_out(pool, pool_id, token_in, amount_in)
         if token_in == pool.token_a_symbol and amount_out > pool.token_b_reserve:
             raise ValueError(f"Insufficient {pool.token_b_symbol} liquidity.")
         elif token_in == pool.token_b_symbol and amount_out > pool.token_a_reserve:
             raise ValueError(f"Insufficient {pool.token_a_symbol} liquidity.")
         if token_in == pool.token_a_symbol:
-            pool.token_a_reserve += amount_in_decimal
+            pool.token_a_reserve += amount_in
             pool.token_b_reserve -= amount_out
         else:
-            pool.token_b_reserve += amount_in_decimal
+            pool.token_b_reserve += amount_in
             pool.token_a_reserve -= amount_out
-        self.total_fees_collected += fee
+        self._record_fee(pool_id, fee)
+        if pool_id in self.lp_books:
+            self._writable_book(pool_id)[0].accrue(token_in == pool.token_a_symbol, fee)
+        self._notify_pool_changed(pool_id)
+        return amount_out, fee
+
+    def _swap_result(self, pool_id: str, token_in: str, amount_in, amount_out, fee) -> Dict:
+        pool = self.pools[pool_id]
+        to_float = self.backend.to_float
         return {
             'pool_id': pool_id,
             'token_in': token_in,
-            'amount_in': float(amount_in_decimal),
-            'token_out': token_out,
-            'amount_out': float(amount_out),
-            'fee_paid': float(fee),
-            'new_price_a_in_b': float(pool.price_a_in_b),
-            'new_price_b_in_a': float(pool.price_b_in_a)
+            'amount_in': to_float(amount_in),
+            'token_out': pool.token_b_symbol if token_in == pool.token_a_symbol else pool.token_a_symbol,
+            'amount_out': to_float(amount_out),
+            'fee_paid': to_float(fee),
+            'new_price_a_in_b': to_float(pool.price_a_in_b),
+            'new_price_b_in_a': to_float(pool.price_b_in_a)
         }
 
-    def add_liquidity(self, pool_id: str, amount_a: float, amount_b: float) -> Dict:
+    def execute_batch(self, orders: List[Tuple[str, str, float]], netting: bool = True) -> List[Dict]:
+        """Executes a block of (pool_id, token_in, amount_in) swap orders atomically.
+
+        With netting, the orders of each constant-product pool settle
+        together at one clearing price: every order pays its fee as usual,
+        opposing flows are matched against each other and only the net
+        amount moves along the curve. The clearing price is the average
+        price of that net trade, so every order is filled pro rata to its
+        amount after fee, no order pays for the impact of the orders ahead
+        of it, and settlement depends only on the per-side totals, not on
+        the order of the block. Rounding dust stays in the reserves. Curve pools, and
+        every pool when netting is False, run the orders one by one
+        through execute_swap in block order. Returns one execute_swap-style
+        result per order, in block order.
+        """
+        groups: Dict[str, List[int]] = {}
+        for index, (pool_id, _, _) in enumerate(orders):
+            if pool_id not in self.pools:
+                raise ValueError(f"Pool {pool_id} does not exist")
+            groups.setdefault(pool_id, []).append(index)
+        results: List[Optional[Dict]] = [None] * len(orders)
+        with self.transaction(list(groups)):
+            if not netting:
+                return [self.execute_swap(*order) for order in orders]
+            for pool_id, indices in groups.items():
+                if isinstance(self.pools[pool_id], CurvePool):
+                    for index in indices:
+                        results[index] = self.execute_swap(*orders[index])
+                else:
+                    self._settle_netted(pool_id, [orders[index] for index in indices], indices, results)
+        return results
+
+    def _settle_netted(self, pool_id: str, orders: List[Tuple[str, str, float]],
+                       indices: List[int], results: List[Optional[Dict]]):
+        """Settles one constant-product pool's orders at a single clearing price."""
+        backend = self.backend
+        pool = self._writable_pool(pool_id)
+        reserve_a, reserve_b = pool.token_a_reserve, pool.token_b_reserve
+        fills = []
+        # Per side: total amount in, total fee and total amount after fee.
+        totals = {True: [backend.zero] * 3, False: [backend.zero] * 3}
+        for _, token_in, amount_in in orders:
+            if token_in == pool.token_a_symbol:
+                a_in = True
+            elif token_in == pool.token_b_symbol:
+                a_in = False
+            else:
+                raise ValueError(f"Token {token_in} not found in pool {pool_id}")
+            amount_in = backend.convert(amount_in)
+            self._check_amount(amount_in)
+            fee = backend.mul(amount_in, pool.fee_rate)
+            side = totals[a_in]
+            side[0] += amount_in
+            side[1] += fee
+            side[2] += amount_in - fee
+            fills.append((a_in, amount_in, fee))
+        net_a, net_b = totals[True][2], totals[False][2]
+        # The net trade x (here in A) along x * y = k has average price
+        # P = reserve_b / (reserve_a + x), and matching at P requires
+        # net_b / P = net_a - x, so x = (reserve_b * net_a - reserve_a * net_b) / (reserve_b + net_b).
+        if backend.mul(reserve_b, net_a) >= backend.mul(reserve_a, net_b):
+            net = (backend.muldiv(reserve_b, net_a, reserve_b + net_b)
+                   - backend.muldiv(reserve_a, net_b, reserve_b + net_b))
+            to_a_sellers = backend.muldiv(net_a, reserve_b, reserve_a + net)
+            to_b_sellers = backend.muldiv(net_b, reserve_a + net, reserve_b)
+        else:
+            net = (backend.muldiv(reserve_a, net_b, reserve_a + net_a)
+                   - backend.muldiv(reserve_b, net_a, reserve_a + net_a))
+            to_b_sellers = backend.muldiv(net_b, reserve_a, reserve_b + net)
+            to_a_sellers = backend.muldiv(net_a, reserve_b + net, reserve_a)
+        paid = {True: backend.zero, False: backend.zero}
+        outputs = []
+        for a_in, amount_in, fee in fills:
+            side_total, side_out = (net_a, to_a_sellers) if a_in else (net_b, to_b_sellers)
+            amount_out = backend.muldiv(side_out, amount_in - fee, side_total) if side_total else backend.zero
+            paid[a_in] += amount_out
+            outputs.append(amount_out)
+        pool.token_a_reserve = reserve_a + totals[True][0] - paid[False]
+        pool.token_b_reserve = reserve_b + totals[False][0] - paid[True]
+        fee_a, fee_b = totals[True][1], totals[False][1]
+        self._record_fee(pool_id, fee_a + fee_b)
+        if pool_id in self.lp_books:
+            book = self._writable_book(pool_id)[0]
+            book.accrue(True, fee_a)
+            book.accrue(False, fee_b)
+        self._notify_pool_changed(pool_id)
+        to_float = backend.to_float
+        price_a_in_b, price_b_in_a = to_float(pool.price_a_in_b), to_float(pool.price_b_in_a)
+        token_a, token_b = pool.token_a_symbol, pool.token_b_symbol
+        for index, (a_in, amount_in, fee), amount_out in zip(indices, fills, outputs):
+            results[index] = {
+                'pool_id': pool_id,
+                'token_in': token_a if a_in else token_b,
+                'amount_in': to_float(amount_in),
+                'token_out': token_b if a_in else token_a,
+                'amount_out': to_float(amount_out),
+                'fee_paid': to_float(fee),
+                'new_price_a_in_b': price_a_in_b,
+                'new_price_b_in_a': price_b_in_a
+            }
+
+    def add_liquidity(self, pool_id: str, amount_a: float, amount_b: float,
+                      owner: Optional[str] = None) -> Dict:
+        """Adds liquidity to a pool.
+
+        Without an owner the amounts simply join the reserves, to the benefit
+        of existing LPs. With an owner they mint LP shares in a new position
+        of the pool's LiquidityBook and the result also holds position_id and
+        shares_minted. The book is created on first use, with the pool's
+        existing reserves assigned to an "initial" position.
+        """
         if pool_id not in self.pools:
             raise ValueError(f"Pool {pool_id} does not exist")
-        if amount_a <= 0 or amount_b <= 0:
-            raise ValueError("Amounts must be positive.")
-        pool = self.pools[pool_id]
-        amount_a_decimal = Decimal(str(amount_a))
-        amount_b_decimal = Decimal(str(amount_b))
+        if owner is not None and isinstance(self.pools[pool_id], ConcentratedPool):
+            raise ValueError(f"Pool {pool_id} tracks liquidity per tick-range position, not as shares.")
+        backend = self.backend
+        amount_a_native = backend.convert(amount_a)
+        amount_b_native = backend.convert(amount_b)
+        self._check_amount(amount_a_native)
+        self._check_amount(amount_b_native)
+        minted = None
+        if owner is not None:
+            minted = self._mint_shares(pool_id, amount_a_native, amount_b_native, owner)
+        if isinstance(self.pools[pool_id], CurvePool):
+            pool = self._writable_pool(pool_id, include_liquidity=True)
+            added_a, added_b = pool.add_liquidity(amount_a_native, amount_b_native)
+            self._notify_pool_changed(pool_id)
+            return self._liquidity_result(pool_id, pool, backend.to_float(added_a), backend.to_float(added_b), minted)
+        pool = self._writable_pool(pool_id)
         if pool.token_a_reserve > 0 and pool.token_b_reserve > 0:
-            current_ratio = pool.token_a_reserve / pool.token_b_reserve
-            provided_ratio = amount_a_decimal / amount_b_decimal
-            if abs(float(current_ratio - provided_ratio)) / float(current_ratio) > 0.001:
-                print(f"Warning: Liquidity amounts don't match current pool ratio.")
-                print(f"Current ratio (A/B): {float(current_ratio):.6f}")
-                print(f"Provided ratio (A/B): {float(provided_ratio):.6f}")
-        pool.token_a_reserve += amount_a_decimal
-        pool.token_b_reserve += amount_b_decimal
+            current_ratio = backend.div(pool.token_a_reserve, pool.token_b_reserve)
+            provided_ratio = backend.div(amount_a_native, amount_b_native)
+            if abs(backend.to_float(current_ratio - provided_ratio)) / backend.to_float(current_ratio) > 0.001:
+                logger.warning("Liquidity amounts don't match current pool ratio. "
+                               "Current ratio (A/B): %.6f, provided ratio (A/B): %.6f",
+                               backend.to_float(current_ratio), backend.to_float(provided_ratio))
+        pool.token_a_reserve += amount_a_native
+        pool.token_b_reserve += amount_b_native
+        self._notify_pool_changed(pool_id)
+        return self._liquidity_result(pool_id, pool, amount_a, amount_b, minted)
+
+    def _liquidity_result(self, pool_id: str, pool, added_a, added_b, minted: Optional[Tuple[int, object]]) -> Dict:
+        to_float = self.backend.to_float
+        result = {
+            'pool_id': pool_id,
+            'added_a': added_a,
+            'added_b': added_b,
+            'new_reserve_a': to_float(pool.token_a_reserve),
+            'new_reserve_b': to_float(pool.token_b_reserve),
+            'new_k': to_float(pool.k)
+        }
+        if minted is not None:
+            result['position_id'] = minted[0]
+            result['shares_minted'] = to_float(minted[1])
+        return result
+
+    def _writable_book(self, pool_id: str, create: bool = False) -> Tuple[LiquidityBook, Optional[Tuple]]:
+        """Returns (book, transaction undo state) for mutating a pool's LP book.
+
+        The book is copied first if it is shared with a fork, and its state
+        is saved once per transaction for rollback. The undo state is None
+        outside transactions and for a book the transaction created.
+        """
+        book = self.lp_books.get(pool_id)
+        created = book is None
+        if created:
+            if not create:
+                raise ValueError(f"Pool {pool_id} has no LP positions")
+            book = LiquidityBook(self.backend)
+            pool = self.pools[pool_id]
+            if pool.token_a_reserve > 0 and pool.token_b_reserve > 0:
+                book.open_first_position("initial", self.backend.sqrt(self.backend.mul(pool.token_a_reserve,
+                                                                                       pool.token_b_reserve)))
+            self.lp_books[pool_id] = book
+        elif pool_id in self._shared_books:
+            self._shared_books.discard(pool_id)
+            book = self.lp_books[pool_id] = book.copy()
+        state = None
+        if self._tx_logs:
+            books = self._tx_logs[-1][2]
+            if pool_id not in books:
+                books[pool_id] = None if created else book.save_state()
+            state = books[pool_id]
+        return book, state
+
+    def _mint_shares(self, pool_id: str, amount_a, amount_b, owner: str) -> Tuple[int, object]:
+        """Opens a position for a deposit, priced against the principal before it; returns (id, shares)."""
+        book, _ = self._writable_book(pool_id, create=True)
+        backend = self.backend
+        pool = self.pools[pool_id]
+        principal_a, principal_b = book.principal(pool.token_a_reserve, pool.token_b_reserve)
+        if book.total_shares <= 0:
+            position_id = book.open_first_position(owner, backend.sqrt(backend.mul(amount_a, amount_b)))
+            return position_id, book.shares[position_id]
+        if principal_a <= 0 or principal_b <= 0:
+            raise ValueError(f"Pool {pool_id} has no principal to price new shares against.")
+        # Like Uniswap v2, the smaller ratio sets the shares and any excess is donated.
+        shares = min(backend.muldiv(amount_a, book.total_shares, principal_a),
+                     backend.muldiv(amount_b, book.total_shares, principal_b))
+        if shares <= 0:
+            raise ValueError("Amounts are too small to mint shares.")
+        return book.open_position(owner, shares), shares
+
+    def _adjust_reserves(self, pool, delta_a, delta_b):
+        if isinstance(pool, CurvePool):
+            pool.add_liquidity(delta_a, delta_b)
+        else:
+            pool.token_a_reserve += delta_a
+            pool.token_b_reserve += delta_b
+
+    def remove_liquidity(self, pool_id: str, position_id: int, shares: Optional[float] = None) -> Dict:
+        """Burns shares of an LP position (all by default) and pays out their principal and owed fees."""
+        if pool_id not in self.pools:
+            raise ValueError(f"Pool {pool_id} does not exist")
+        book, state = self._writable_book(pool_id)
+        book._check(position_id)
+        backend = self.backend
+        burned = book.shares[position_id] if shares is None else backend.convert(shares)
+        if state is not None:
+            book.remember(state, position_id)
+        pool = self._writable_pool(pool_id)
+        amount_a, amount_b = book.burn(position_id, burned, pool.token_a_reserve, pool.token_b_reserve)
+        fee_a, fee_b = book.claim(position_id)
+        self._adjust_reserves(pool, -(amount_a + fee_a), -(amount_b + fee_b))
+        self._notify_pool_changed(pool_id)
+        to_float = backend.to_float
+        return {
+            'pool_id': pool_id,
+            'position_id': position_id,
+            'shares_burned': to_float(burned),
+            'amount_a': to_float(amount_a),
+            'amount_b': to_float(amount_b),
+            'fees_a': to_float(fee_a),
+            'fees_b': to_float(fee_b),
+            'new_reserve_a': to_float(pool.token_a_reserve),
+            'new_reserve_b': to_float(pool.token_b_reserve)
+        }
+
+    def claim_fees(self, pool_id: str, position_id: int) -> Dict:
+        """Pays out the fees an LP position has earned since it last claimed."""
+        if pool_id not in self.pools:
+            raise ValueError(f"Pool {pool_id} does not exist")
+        book, state = self._writable_book(pool_id)
+        book._check(position_id)
+        if state is not None:
+            book.remember(state, position_id)
+        pool = self._writable_pool(pool_id)
+        fee_a, fee_b = book.claim(position_id)
+        self._adjust_reserves(pool, -fee_a, -fee_b)
+        self._notify_pool_changed(pool_id)
+        to_float = self.backend.to_float
         return {
             'pool_id': pool_id,
-            'added_a': amount_a,
-            'added_b': amount_b,
-            'new_reserve_a': float(pool.token_a_reserve),
-            'new_reserve_b': float(pool.token_b_reserve),
-            'new_k': float(pool.k)
+            'position_id': position_id,
+            'fees_a': to_float(fee_a),
+            'fees_b': to_float(fee_b),
+            'new_reserve_a': to_float(pool.token_a_reserve),
+            'new_reserve_b': to_float(pool.token_b_reserve)
         }
 
+    def get_position_info(self, pool_id: str, position_id: int) -> Dict:
+        if pool_id not in self.pools:
+            raise ValueError(f"Pool {pool_id} does not exist")
+        book = self.lp_books.get(pool_id)
+        if book is None:
+            raise ValueError(f"Pool {pool_id} has no LP positions")
+        book._check(position_id)
+        backend = self.backend
+        pool = self.pools[pool_id]
+        shares = book.shares[position_id]
+        principal_a, principal_b = book.principal(pool.token_a_reserve, pool.token_b_reserve)
+        fee_a, fee_b = book.fees_owed(position_id)
+        total = book.total_shares
+        to_float = backend.to_float
+        return {
+            'pool_id': pool_id,
+            'position_id': position_id,
+            'owner': book.owners[position_id],
+            'shares': to_float(shares),
+            'share_percent': to_float(backend.div(shares, total)) * 100 if total > 0 else 0.0,
+            'amount_a': to_float(backend.muldiv(principal_a, shares, total)) if total > 0 else 0.0,
+            'amount_b': to_float(backend.muldiv(principal_b, shares, total)) if total > 0 else 0.0,
+            'fees_a': to_float(fee_a),
+            'fees_b': to_float(fee_b)
+        }
+
+    def set_pool_reserves(self, pool_id: str, reserve_a, reserve_b):
+        """Overwrites a pool's reserves, e.g. when restoring saved state."""
+        if pool_id not in self.pools:
+            raise ValueError(f"Pool {pool_id} does not exist")
+        if isinstance(self.pools[pool_id], CurvePool):
+            raise ValueError(f"Reserves of {pool_id} follow its curve and cannot be overwritten.")
+        pool = self._writable_pool(pool_id)
+        pool.token_a_reserve = self.backend.convert(reserve_a)
+        pool.token_b_reserve = self.backend.convert(reserve_b)
+        self._notify_pool_changed(pool_id)
+
+    def restore_pool_state(self, pool_id: str, state):
+        """Restores a curve pool from the output of its save_state(include_liquidity=True)."""
+        if pool_id not in self.pools:
+            raise ValueError(f"Pool {pool_id} does not exist")
+        if not isinstance(self.pools[pool_id], CurvePool):
+            raise ValueError(f"{pool_id} is a constant-product pool; use set_pool_reserves.")
+        pool = self._writable_pool(pool_id, include_liquidity=True)
+        pool.restore_state(state)
+        self._notify_pool_changed(pool_id)
+
     def get_pool_info(self, pool_id: str) -> Dict:
         if pool_id not in self.pools:
             raise ValueError(f"Pool {pool_id} does not exist")
         pool = self.pools[pool_id]
+        to_float = self.backend.to_float
         return {
             'pool_id': pool_id,
             'token_a': pool.token_a_symbol,
             'token_b': pool.token_b_symbol,
-            'reserve_a': float(pool.token_a_reserve),
-            'reserve_b': float(pool.token_b_reserve),
-            'price_a_in_b': float(pool.price_a_in_b),
-            'price_b_in_a': float(pool.price_b_in_a),
-            'k': float(pool.k),
-            'fee_rate': float(pool.fee_rate)
+            'reserve_a': to_float(pool.token_a_reserve),
+            'reserve_b': to_float(pool.token_b_reserve),
+            'price_a_in_b': to_float(pool.price_a_in_b),
+            'price_b_in_a': to_float(pool.price_b_in_a),
+            'k': to_float(pool.k),
+            'fee_rate': to_float(pool.fee_rate)
         }
 
-    def simulate_price_impact(self, pool_id: str, token_in: str, amount_in: float) -> Dict:
+    def read_pool_info(self, pool_id: str, out: Optional[PoolInfo] = None) -> PoolInfo:
+        """Typed get_pool_info: fills out (or a new PoolInfo) with backend-native values."""
         if pool_id not in self.pools:
             raise ValueError(f"Pool {pool_id} does not exist")
-        original_info = self.get_pool_info(pool_id)
-        amount_out, fee = self.get_swap_amount_out(pool_id, token_in, amount_in)
         pool = self.pools[pool_id]
-        hypothetical_token_a_reserve = pool.token_a_reserve
-        hypothetical_token_b_reserve = pool.token_b_reserve
-        if token_in == pool.token_a_symbol:
-            hypothetical_token_a_reserve += Decimal(str(amount_in))
-            hypothetical_token_b_reserve -= amount_out
-        elif token_in == pool.token_b_symbol:
-            hypothetical_token_b_reserve += Decimal(str(amount_in))
-            hypothetical_token_a_reserve -= amount_out
-        else:
-            raise ValueError(f"Token {token_in} not in pool {pool_id}")
-        new_price_a_in_b = hypothetical_token_b_reserve / hypothetical_token_a_reserve if hypothetical_token_a_reserve > 0 else Decimal('0')
-        new_price_b_in_a = hypothetical_token_a_reserve / hypothetical_token_b_reserve if hypothetical_token_b_reserve > 0 else Decimal('0')
-        if token_in == original_info['token_a']:
-            price_impact = (new_price_a_in_b - Decimal(str(original_info['price_a_in_b']))) / Decimal(str(original_info['price_a_in_b']))
-        else:
-            price_impact = (new_price_b_in_a - Decimal(str(original_info['price_b_in_a']))) / Decimal(str(original_info['price_b_in_a']))
+        info = out if out is not None else PoolInfo()
+        info.pool_id = pool_id
+        info.token_a = pool.token_a_symbol
+        info.token_b = pool.token_b_symbol
+        info.reserve_a = pool.token_a_reserve
+        info.reserve_b = pool.token_b_reserve
+        info.price_a_in_b = pool.price_a_in_b
+        info.price_b_in_a = pool.price_b_in_a
+        info.k = pool.k
+        info.fee_rate = pool.fee_rate
+        return info
+
+    def simulate_price_impact(self, pool_id: str, token_in: str, amount_in: float) -> Dict:
+        if pool_id not in self.pools:
+            raise ValueError(f"Pool {pool_id} does not exist")
+        to_float = self.backend.to_float
+        amount_out, fee, price_impact, new_price_a_in_b, new_price_b_in_a = self._price_impact(
+            self.pools[pool_id], pool_id, token_in, self.backend.convert(amount_in))
         return {
-            'amount_out': float(amount_out),
-            'fee': float(fee),
-            'price_impact_percent': float(price_impact * 100),
-            'new_price_a_in_b': float(new_price_a_in_b),
-            'new_price_b_in_a': float(new_price_b_in_a)
+            'amount_out': to_float(amount_out),
+            'fee': to_float(fee),
+            'price_impact_percent': to_float(price_impact) * 100,
+            'new_price_a_in_b': to_float(new_price_a_in_b),
+            'new_price_b_in_a': to_float(new_price_b_in_a)
         }
 
-    def get_ecosystem_token_prices(self) -> Dict[str, float]:
-        prices = {"USDC": 1.0}
-        for pool_id, pool in self.pools.items():
-            if pool.token_b_symbol == "USDC":
-                prices[pool.token_a_symbol] = float(pool.price_a_in_b)
-            elif pool.token_a_symbol == "USDC":
-                prices[pool.token_b_symbol] = float(pool.price_b_in_a)
-        found_new = True
-        while found_new:
-            found_new = False
-            for pool_id, pool in self.pools.items():
-                if pool.token_a_symbol not in prices and pool.token_b_symbol in prices:
-                    prices[pool.token_a_symbol] = float(pool.price_a_in_b) * prices[pool.token_b_symbol]
-                    found_new = True
-                elif pool.token_b_symbol not in prices and pool.token_a_symbol in prices:
-                    prices[pool.token_b_symbol] = float(pool.price_b_in_a) * prices[pool.token_a_symbol]
-                    found_new = True
-        return prices
+    def quote_price_impact(self, pool_id: str, token_in: str, amount_in,
+                           out: Optional[PriceImpact] = None, native: bool = False) -> PriceImpact:
+        """Typed simulate_price_impact: fills out (or a new PriceImpact) with backend-native values.
+
+        amount_in is converted like simulate_price_impact's unless native=True.
+        """
+        if pool_id not in self.pools:
+            raise ValueError(f"Pool {pool_id} does not exist")
+        result = out if out is not None else PriceImpact()
+        (result.amount_out, result.fee, result.price_impact, result.new_price_a_in_b,
+         result.new_price_b_in_a) = self._price_impact(self.pools[pool_id], pool_id, token_in,
+                                                       amount_in if native else self.backend.convert(amount_in))
+        return result
+
+    def _price_impact(self, pool: Pool, pool_id: str, token_in: str, amount_in_native) -> Tuple:
+        """Returns native (amount_out, fee, price_impact, new_price_a_in_b, new_price_b_in_a) for a quote."""
+        backend = self.backend
+        amount_out, fee = self._swap_amount_out(pool, pool_id, token_in, amount_in_native)
+        if isinstance(pool, CurvePool):
+            new_price_a_in_b = pool.price_after(token_in, amount_in_native)
+            new_price_b_in_a = backend.div(backend.convert(1), new_price_a_in_b) if new_price_a_in_b else backend.zero
+        else:
+            hypothetical_token_a_reserve = pool.token_a_reserve
+            hypothetical_token_b_reserve = pool.token_b_reserve
+            if token_in == pool.token_a_symbol:
+                hypothetical_token_a_reserve += amount_in_native
+                hypothetical_token_b_reserve -= amount_out
+            else:
+                hypothetical_token_b_reserve += amount_in_native
+                hypothetical_token_a_reserve -= amount_out
+            new_price_a_in_b = backend.div(hypothetical_token_b_reserve, hypothetical_token_a_reserve) if hypothetical_token_a_reserve > 0 else backend.zero
+            new_price_b_in_a = backend.div(hypothetical_token_a_reserve, hypothetical_token_b_reserve) if hypothetical_token_b_reserve > 0 else backend.zero
+        if token_in == pool.token_a_symbol:
+            original_price = pool.price_a_in_b
+            price_impact = backend.div(new_price_a_in_b - original_price, original_price)
+        else:
+            original_price = pool.price_b_in_a
+            price_impact = backend.div(new_price_b_in_a - original_price, original_price)
+        return amount_out, fee, price_impact, new_price_a_in_b, new_price_b_in_a
+
+    def get_ecosystem_token_prices(self) -> Mapping[str, float]:
+        """Returns the cached, read-only USDC price table; copy it with dict() to modify it."""
+        return self.price_oracle.get_prices()
+
+    def get_token_price(self, token: str) -> float:
+        """Returns the estimated USDC price of token, or 0.0 if it has no path to USDC."""
+        return self.price_oracle.get_price(token)
+
+class ConcurrentHISAAMM(HISAAMM):
+    """HISAAMM that can be driven from several threads at once.
+
+    Every pool has its own reentrant lock: operations on different pools run
+    in parallel and each swap, liquidity change or quote on one pool is
+    atomic. Operations that span pools take their locks in sorted pool-id
+    order, so they cannot deadlock. Fees are summed into per-pool shards
+    under the pool lock instead of a single global counter. Transactions are
+    per thread and must name the pools they write: transaction(pool_ids)
+    holds those locks until the block commits or rolls back. Pool listeners
+    are serialized by one lock and must not lock other pools.
+    """
+
+    def __init__(self, *args, **kwargs):
+        self._pool_locks: Dict[str, threading.RLock] = {}
+        self._registry_lock = threading.RLock()
+        self._listener_lock = threading.RLock()
+        self._thread_state = threading.local()
+        super().__init__(*args, **kwargs)
+
+    @property
+    def total_fees_collected(self):
+        return sum(tuple(self._fee_shards.values()), self._fee_base)
+
+    @total_fees_collected.setter
+    def total_fees_collected(self, value):
+        self._fee_base = value
+        self._fee_shards: Dict[str, Decimal] = {}
+
+    def _state(self) -> threading.local:
+        """Returns this thread's transaction logs and the pool sets they locked."""
+        state = self._thread_state
+        if not hasattr(state, 'tx_logs'):
+            state.tx_logs = []
+            state.locked_pools = []
+        return state
+
+    @property
+    def _tx_logs(self) -> List[Tuple[Dict[str, Tuple], Dict[str, Decimal], Dict[str, Optional[Tuple]]]]:
+        return self._state().tx_logs
+
+    @_tx_logs.setter
+    def _tx_logs(self, value):
+        self._thread_state = threading.local()
+        self._thread_state.tx_logs = value
+        self._thread_state.locked_pools = []
+
+    def pool_lock(self, pool_id: str) -> threading.RLock:
+        lock = self._pool_locks.get(pool_id)
+        if lock is None:
+            lock = self._pool_locks.setdefault(pool_id, threading.RLock())
+        return lock
+
+    @contextmanager
+    def locked(self, pool_ids: List[str]):
+        """Holds the locks of pool_ids, acquired in sorted order."""
+        locks = [self.pool_lock(pool_id) for pool_id in sorted(set(pool_ids))]
+        for index, lock in enumerate(locks):
+            try:
+                lock.acquire()
+            except BaseException:
+                for held in reversed(locks[:index]):
+                    held.release()
+                raise
+        try:
+            yield
+        finally:
+            for lock in reversed(locks):
+                lock.release()
+
+    @contextmanager
+    def transaction(self, pool_ids: Optional[List[str]] = None):
+        pool_ids = list(pool_ids or ())
+        locked_pools = self._state().locked_pools
+        with self.locked(pool_ids):
+            locked_pools.append(set(pool_ids).union(*locked_pools[-1:]))
+            try:
+                with super().transaction(pool_ids):
+                    yield self
+            finally:
+                locked_pools.pop()
+
+    def _writable_pool(self, pool_id: str, include_liquidity: bool = False) -> Pool:
+        if self._tx_logs and pool_id not in self._state().locked_pools[-1]:
+            raise ValueError(f"Pool {pool_id} was not locked by the enclosing transaction")
+        return super()._writable_pool(pool_id, include_liquidity)
+
+    def _writable_book(self, pool_id: str, create: bool = False) -> Tuple[LiquidityBook, Optional[Tuple]]:
+        if self._tx_logs and pool_id not in self._state().locked_pools[-1]:
+            raise ValueError(f"Pool {pool_id} was not locked by the enclosing transaction")
+        if pool_id in self.lp_books and pool_id not in self._shared_books:
+            return super()._writable_book(pool_id, create)
+        # Creating or unsharing a book changes lp_books, which fork reads under the registry lock.
+        with self._registry_lock:
+            return super()._writable_book(pool_id, create)
+
+    def _add_fee(self, pool_id: str, fee):
+        # Called with the pool lock held, so each shard has a single writer.
+        self._fee_shards[pool_id] = self._fee_shards.get(pool_id, self.backend.zero) + fee
+
+    def _notify_pool_changed(self, pool_id: str):
+        with self._listener_lock:
+            super()._notify_pool_changed(pool_id)
+
+    def fork(self) -> "ConcurrentHISAAMM":
+        with self._registry_lock, self.locked(list(self.pools)):
+            fork = super().fork()
+        fork._pool_locks = {}
+        fork._registry_lock = threading.RLock()
+        fork._listener_lock = threading.RLock()
+        fork._fee_shards = dict(self._fee_shards)
+        return fork
+
+    def create_pool(self, *args, **kwargs) -> str:
+        # Growing a PoolTable reallocates its arrays, so it waits for in-flight swaps.
+        with self._registry_lock, self.locked(list(self.pools) if isinstance(self.pools, PoolTable) else []):
+            return super().create_pool(*args, **kwargs)
+
+    def load_pools(self, *args, **kwargs) -> List[str]:
+        with self._registry_lock, self.locked(list(self.pools) if isinstance(self.pools, PoolTable) else []):
+            return super().load_pools(*args, **kwargs)
+
+    def get_swap_amount_out(self, pool_id: str, token_in: str, amount_in: float) -> Tuple[Decimal, Decimal]:
+        with self.pool_lock(pool_id):
+            return super().get_swap_amount_out(pool_id, token_in, amount_in)
+
+    def _quote_params(self, pool_id: str, token_in: str) -> Tuple[float, float, float]:
+        with self.pool_lock(pool_id):
+            return super()._quote_params(pool_id, token_in)
+
+    def _curve_quotes(self, pool_id: str, token_in: str, amounts: "np.ndarray") -> Tuple["np.ndarray", "np.ndarray"]:
+        with self.pool_lock(pool_id):
+            return super()._curve_quotes(pool_id, token_in, amounts)
+
+    def _execute_swap(self, pool_id: str, token_in: str, amount_in):
+        with self.pool_lock(pool_id):
+            return super()._execute_swap(pool_id, token_in, amount_in)
+
+    def execute_swap(self, pool_id: str, token_in: str, amount_in: float) -> Dict:
+        # Held across the swap and its result so the reported prices are its own.
+        with self.pool_lock(pool_id):
+            return super().execute_swap(pool_id, token_in, amount_in)
+
+    def swap(self, pool_id: str, token_in: str, amount_in, out: Optional[SwapResult] = None,
+             native: bool = False) -> SwapResult:
+        with self.pool_lock(pool_id):
+            return super().swap(pool_id, token_in, amount_in, out, native)
+
+    def add_liquidity(self, pool_id: str, amount_a: float, amount_b: float,
+                      owner: Optional[str] = None) -> Dict:
+        with self.pool_lock(pool_id):
+            return super().add_liquidity(pool_id, amount_a, amount_b, owner)
+
+    def remove_liquidity(self, pool_id: str, position_id: int, shares: Optional[float] = None) -> Dict:
+        with self.pool_lock(pool_id):
+            return super().remove_liquidity(pool_id, position_id, shares)
+
+    def claim_fees(self, pool_id: str, position_id: int) -> Dict:
+        with self.pool_lock(pool_id):
+            return super().claim_fees(pool_id, position_id)
+
+    def get_position_info(self, pool_id: str, position_id: int) -> Dict:
+        with self.pool_lock(pool_id):
+            return super().get_position_info(pool_id, position_id)
+
+    def set_pool_reserves(self, pool_id: str, reserve_a, reserve_b):
+        with self.pool_lock(pool_id):
+            super().set_pool_reserves(pool_id, reserve_a, reserve_b)
+
+    def restore_pool_state(self, pool_id: str, state):
+        with self.pool_lock(pool_id):
+            super().restore_pool_state(pool_id, state)
+
+    def get_pool_info(self, pool_id: str) -> Dict:
+        with self.pool_lock(pool_id):
+            return super().get_pool_info(pool_id)
+
+    def simulate_price_impact(self, pool_id: str, token_in: str, amount_in: float) -> Dict:
+        with self.pool_lock(pool_id):
+            return super().simulate_price_impact(pool_id, token_in, amount_in)
+
+    def read_pool_info(self, pool_id: str, out: Optional[PoolInfo] = None) -> PoolInfo:
+        with self.pool_lock(pool_id):
+            return super().read_pool_info(pool_id, out)
+
+    def quote_price_impact(self, pool_id: str, token_in: str, amount_in,
+                           out: Optional[PriceImpact] = None, native: bool = False) -> PriceImpact:
+        with self.pool_lock(pool_id):
+            return super().quote_price_impact(pool_id, token_in, amount_in, out, native)
+
+    def get_ecosystem_token_prices(self) -> Mapping[str, float]:
+        with self._listener_lock:
+            return super().get_ecosystem_token_prices()
+
+    def get_token_price(self, token: str) -> float:
+        with self._listener_lock:
+            return super().get_token_price(token)
 
 class RewardCalculator:
     ARBITRAGE_THRESHOLD_PERCENT = 0.5
+    # Daily volume as a fraction of TVL in the analytic fallback.
+    DAILY_VOLUME_FRACTION = 0.05
 
     def __init__(self, amm: HISAAMM):
         self.amm = amm
 
-    def calculate_lp_rewards(self, pool_id: str, user_liquidity_percent: float,
-                           time_period_days: int = 30) -> Dict:
+    def observed_daily_volume(self, pool_id: str) -> Optional[float]:
+        """Returns pool_id's observed daily volume in token B, or None without price history."""
+        history = self.amm.price_history
+        return history.daily_volume(pool_id) if history is not None else None
+
+    def lp_return_inputs(self, pool_id: str, time_period_days: int) -> Optional[Tuple]:
+        """Returns the AMM_montecarlo.expected_lp_returns arguments for pool_id.
+
+        They are the pool's reserves, fee rate, the horizon and its observed
+        daily volume (None when unknown). Returns None when the estimate
+        falls back to the analytic model: curve pools and installs without
+        numpy.
+        """
         if pool_id not in self.amm.pools:
             raise ValueError(f"Pool {pool_id} does not exist")
+        if time_period_days <= 0:
+            raise ValueError("time_period_days must be positive.")
+        pool = self.amm.pools[pool_id]
+        if np is None or isinstance(pool, CurvePool):
+            return None
+        to_float = self.amm.backend.to_float
+        reserve_a, reserve_b = to_float(pool.token_a_reserve), to_float(pool.token_b_reserve)
+        if reserve_a <= 0 or reserve_b <= 0:
+            return None
+        return (reserve_a, reserve_b, to_float(pool.fee_rate), time_period_days,
+                self.observed_daily_volume(pool_id))
+
+    def calculate_lp_rewards(self, pool_id: str, user_liquidity_percent: float,
+                           time_period_days: int = 30, estimate: Optional[Dict] = None) -> Dict:
+        """Estimates fee income, APY and ROI for a share of a pool over time_period_days.
+
+        For constant-product pools the fee income and impermanent loss are
+        the Monte Carlo means of AMM_montecarlo.expected_lp_returns
+        (stochastic noise flow plus arbitrage) for the pool's reserves, fee
+        and observed daily volume; estimate may pass that result in when it
+        was computed elsewhere, e.g. off an event loop. Curve pools, and
+        installs without numpy, use the observed volume times the fee and
+        report no impermanent loss. Without price history (see
+        HISAAMM.track_price_history) volume is assumed to be
+        DAILY_VOLUME_FRACTION of TVL per day. 'model' says which estimate
+        was used. APY is the period fee return annualized without
+        compounding.
+        """
         if not (0 <= user_liquidity_percent <= 100):
             raise ValueError("Liquidity percentage must be 0-100.")
+        inputs = self.lp_return_inputs(pool_id, time_period_days)
         pool_info = self.amm.get_pool_info(pool_id)
-        token_prices = self.amm.get_ecosystem_token_prices()
-        token_a_price = token_prices.get(pool_info['token_a'], 0)
-        token_b_price = token_prices.get(pool_info['token_b'], 0)
+        token_a_price = self.amm.get_token_price(pool_info['token_a'])
+        token_b_price = self.amm.get_token_price(pool_info['token_b'])
         token_a_value = pool_info['reserve_a'] * token_a_price
         token_b_value = pool_info['reserve_b'] * token_b_price
         total_liquidity_value = token_a_value + token_b_value
@@ -370,70 +2673,492 @@ class RewardCalculator:
                 'user_period_rewards': 0.0,
                 'estimated_apy': 0.0,
                 'roi_percent': 0.0,
+                'impermanent_loss_percent': None,
+                'net_return_percent': None,
+                'model': 'analytic',
                 'time_period_days': time_period_days
             }
-        daily_volume = total_liquidity_value * 0.05
-        daily_fees = daily_volume * float(self.amm.pools[pool_id].fee_rate)
-        period_fees = daily_fees * time_period_days
-        user_fee_share = period_fees * (user_liquidity_percent / 100)
-        user_liquidity_value = total_liquidity_value * (user_liquidity_percent / 100)
-        annual_fees = daily_fees * 365 * (user_liquidity_percent / 100)
-        apy = (annual_fees / user_liquidity_value) * 100 * 30  if user_liquidity_value > 0 else 0
-        roi = (user_fee_share / user_liquidity_value) * 100 if user_liquidity_value > 0 else 0
+        fee_rate = pool_info['fee_rate']
+        if inputs is None:
+            estimate = None
+            observed_volume = self.observed_daily_volume(pool_id)
+        else:
+            observed_volume = inputs[4]
+            if estimate is None:
+                from AMM_montecarlo import expected_lp_returns
+                estimate = expected_lp_returns(*inputs)
+        if estimate is not None:
+            period_fee_return = estimate['fees_earned']
+        elif observed_volume is not None:
+            period_fee_return = observed_volume * token_b_price * fee_rate * time_period_days / total_liquidity_value
+        else:
+            period_fee_return = self.DAILY_VOLUME_FRACTION * fee_rate * time_period_days
+
+        share = user_liquidity_percent / 100
+        daily_fees = total_liquidity_value * period_fee_return / time_period_days
+        user_liquidity_value = total_liquidity_value * share
+        has_position = user_liquidity_value > 0
         return {
             'user_liquidity_value': user_liquidity_value,
-            'estimated_daily_volume': daily_volume,
+            'estimated_daily_volume': daily_fees / fee_rate if fee_rate > 0 else 0.0,
             'daily_fees_generated': daily_fees,
-            'user_daily_fee_share': daily_fees * (user_liquidity_percent / 100),
-            'user_period_rewards': user_fee_share,
-            'estimated_apy': apy,
-            'roi_percent': roi,
+            'user_daily_fee_share': daily_fees * share,
+            'user_period_rewards': daily_fees * time_period_days * share,
+            'estimated_apy': period_fee_return * 365 / time_period_days * 100 if has_position else 0.0,
+            'roi_percent': period_fee_return * 100 if has_position else 0.0,
+            'impermanent_loss_percent': estimate['impermanent_loss'] * 100 if estimate else None,
+            'net_return_percent': estimate['net_lp_return'] * 100 if estimate else None,
+            'model': 'monte_carlo' if estimate else 'analytic',
             'time_period_days': time_period_days
         }
 
+    def simulate_lp_returns(self, pool_id: str, paths: int = 10000, seed: int = 0, **options) -> Dict:
+        """Monte Carlo alternative to the fixed-volume estimate; see AMM_montecarlo."""
+        from AMM_montecarlo import simulate_lp_returns
+        return simulate_lp_returns(self.amm, pool_id, paths=paths, seed=seed, **options)
+
     def calculate_arbitrage_opportunity(self, pool_id: str, external_price: float,
                                       token_symbol: str) -> Dict:
+        """Sizes the profit-maximizing trade between a pool and an external price.
+
+        For a constant-product pool with fee f (gamma = 1 - f), buying the
+        token with dy of the other token has its optimum at
+        dy = (sqrt(gamma * p * x * y) - y) / gamma, and selling dx of the token
+        at dx = (sqrt(gamma * x * y / p) - x) / gamma, where p is the external
+        price and x, y are the token and other-token reserves. The profit is
+        reported in units of the other token, net of fees and slippage.
+        """
         pool_info = self.amm.get_pool_info(pool_id)
-        if token_symbol not in TOKEN_SYMBOLS:
-            raise ValueError(f"Invalid token symbol: {token_symbol}. Valid tokens: {', '.join(TOKEN_SYMBOLS)}")
+        if token_symbol not in self.amm.token_symbols:
+            raise ValueError(f"Invalid token symbol: {token_symbol}. Valid tokens: {', '.join(sorted(self.amm.token_symbols))}")
         pool_price = 0.0
         if token_symbol == pool_info['token_a']:
             pool_price = pool_info['price_a_in_b']
-            other_token_symbol = pool_info['token_b']
+            reserve_token, reserve_other = pool_info['reserve_a'], pool_info['reserve_b']
         elif token_symbol == pool_info['token_b']:
             pool_price = pool_info['price_b_in_a']
-            other_token_symbol = pool_info['token_a']
+            reserve_token, reserve_other = pool_info['reserve_b'], pool_info['reserve_a']
         else:
             raise ValueError(f"Token {token_symbol} not in pool {pool_id}")
-        if pool_price == 0:
+        pool = self.amm.pools[pool_id]
+        if isinstance(pool, CurvePool):
+            # Size against the constant-product curve matching the pool locally.
+            reserve_a, reserve_b = pool.curve_reserves()
+            reserve_token, reserve_other = (reserve_a, reserve_b) if token_symbol == pool.token_a_symbol else (reserve_b, reserve_a)
+        if pool_price == 0 or external_price <= 0:
             return {
                 'pool_price': pool_price,
                 'external_price': external_price,
                 'price_difference': 0.0,
                 'price_difference_percent': 0.0,
                 'arbitrage_opportunity': False,
+                'trade_direction': None,
                 'optimal_arbitrage_amount': 0.0,
                 'estimated_profit': 0.0
             }
         price_difference = external_price - pool_price
         price_difference_percent = (price_difference / pool_price) * 100
+        gamma = 1 - pool_info['fee_rate']
         optimal_amount = 0.0
         potential_profit = 0.0
-        if abs(price_difference_percent) > self.ARBITRAGE_THRESHOLD_PERCENT:
-            pool = self.amm.pools[pool_id]
-            reserve_in_decimal = pool.token_a_reserve if token_symbol == pool.token_a_symbol else pool.token_b_reserve
-            optimal_amount = float(reserve_in_decimal) * 0.01
-            potential_profit = abs(price_difference) * optimal_amount
+        direction = None
+        other_in = (math.sqrt(gamma * external_price * reserve_token * reserve_other) - reserve_other) / gamma
+        token_in = (math.sqrt(gamma * reserve_token * reserve_other / external_price) - reserve_token) / gamma
+        if other_in > 0:
+            direction = 'buy'
+            optimal_amount = reserve_token * gamma * other_in / (reserve_other + gamma * other_in)
+            potential_profit = external_price * optimal_amount - other_in
+        elif token_in > 0:
+            direction = 'sell'
+            optimal_amount = token_in
+            potential_profit = reserve_other * gamma * token_in / (reserve_token + gamma * token_in) - external_price * token_in
+        opportunity = potential_profit > 0 and abs(price_difference_percent) > self.ARBITRAGE_THRESHOLD_PERCENT
         return {
             'pool_price': pool_price,
             'external_price': external_price,
             'price_difference': price_difference,
             'price_difference_percent': price_difference_percent,
-            'arbitrage_opportunity': abs(price_difference_percent) > self.ARBITRAGE_THRESHOLD_PERCENT,
-            'optimal_arbitrage_amount': optimal_amount,
-            'estimated_profit': potential_profit
+            'arbitrage_opportunity': opportunity,
+            'trade_direction': direction if opportunity else None,
+            'optimal_arbitrage_amount': optimal_amount if opportunity else 0.0,
+            'estimated_profit': potential_profit if opportunity else 0.0
+        }
+
+    def find_arbitrage_cycles(self, min_profit_usd: float = 0.0) -> List[Dict]:
+        """Finds profitable swap cycles across the pool graph, best first.
+
+        Each directed swap is an edge weighted by -log(gamma * marginal price),
+        so a profitable cycle is a negative cycle; Bellman-Ford from a virtual
+        source finds them in O(tokens * pools). Each cycle is then sized in
+        closed form: composing constant-product swaps gives
+        out = A * x / (B + C * x), maximized at x = (sqrt(A * B) - B) / C.
+        """
+        to_float = self.amm.backend.to_float
+        edges = []
+        for pool_id, pool in self.amm.pools.items():
+            if isinstance(pool, CurvePool):
+                reserve_a, reserve_b = pool.curve_reserves()
+            else:
+                reserve_a = to_float(pool.token_a_reserve)
+                reserve_b = to_float(pool.token_b_reserve)
+            if reserve_a <= 0 or reserve_b <= 0:
+                continue
+            gamma = 1 - to_float(pool.fee_rate)
+            edges.append((pool.token_a_symbol, pool.token_b_symbol, pool_id, reserve_a, reserve_b, gamma))
+            edges.append((pool.token_b_symbol, pool.token_a_symbol, pool_id, reserve_b, reserve_a, gamma))
+        tokens = {edge[0] for edge in edges}
+        distance = {token: 0.0 for token in tokens}
+        predecessor: Dict[str, Tuple] = {}
+        updated = set()
+        for _ in range(len(tokens)):
+            updated = set()
+            for edge in edges:
+                token_from, token_to, _, reserve_in, reserve_out, gamma = edge
+                candidate = distance[token_from] - math.log(gamma * reserve_out / reserve_in)
+                if candidate < distance[token_to] - 1e-12:
+                    distance[token_to] = candidate
+                    predecessor[token_to] = edge
+                    updated.add(token_to)
+            if not updated:
+                return []
+        cycles = {}
+        for token in updated:
+            for _ in range(len(tokens)):
+                token = predecessor[token][0]
+            cycle_edges = []
+            current = token
+            while True:
+                edge = predecessor[current]
+                cycle_edges.append(edge)
+                current = edge[0]
+                if current == token or len(cycle_edges) > len(tokens):
+                    break
+            if current != token:
+                continue
+            cycle_edges.reverse()
+            start = min(range(len(cycle_edges)), key=lambda i: cycle_edges[i][0])
+            cycle_edges = cycle_edges[start:] + cycle_edges[:start]
+            key = tuple(edge[2] for edge in cycle_edges)
+            if key not in cycles:
+                cycles[key] = self._size_cycle(cycle_edges)
+        results = [cycle for cycle in cycles.values()
+                   if cycle['profit'] > 0 and cycle['profit_usd'] >= min_profit_usd]
+        return sorted(results, key=lambda cycle: cycle['profit_usd'], reverse=True)
+
+    def _size_cycle(self, cycle_edges: List[Tuple]) -> Dict:
+        numerator, denominator, slope = 1.0, 1.0, 0.0
+        for _, _, _, reserve_in, reserve_out, gamma in cycle_edges:
+            hop_numerator, hop_denominator, hop_slope = gamma * reserve_out, reserve_in, gamma
+            numerator, denominator, slope = (
+                numerator * hop_numerator,
+                denominator * hop_denominator,
+                hop_denominator * slope + hop_slope * numerator
+            )
+        amount_in = max((math.sqrt(numerator * denominator) - denominator) / slope, 0.0)
+        amount_out = numerator * amount_in / (denominator + slope * amount_in)
+        start_token = cycle_edges[0][0]
+        profit = amount_out - amount_in
+        return {
+            'cycle': [edge[0] for edge in cycle_edges] + [start_token],
+            'pools': [edge[2] for edge in cycle_edges],
+            'marginal_rate': numerator / denominator,
+            'optimal_amount_in': amount_in,
+            'amount_out': amount_out,
+            'profit': profit,
+            'profit_usd': profit * self.amm.get_token_price(start_token)
+        }
+
+class SwapRouter:
+    """Finds and executes best-output multi-hop routes across the AMM pools."""
+    ROUTE_CACHE_SIZE = 4096
+
+    def __init__(self, amm: HISAAMM, max_hops: int = 3):
+        if max_hops < 1:
+            raise ValueError("max_hops must be at least 1.")
+        self.amm = amm
+        self.max_hops = max_hops
+        self._adjacency: Dict[str, List[Tuple[str, str]]] = {}
+        self._indexed_pools = set()
+        self._paths: "OrderedDict[Tuple[str, str], List[Tuple[Tuple[str, ...], Tuple[str, ...]]]]" = OrderedDict()
+        self._stale = True
+        amm.subscribe(self._on_pool_changed)
+
+    def _rebuild_index(self):
+        """Builds the token -> [(pool_id, other_token)] adjacency index from amm.pools."""
+        self._adjacency = {}
+        for pool_id, pool in self.amm.pools.items():
+            self._adjacency.setdefault(pool.token_a_symbol, []).append((pool_id, pool.token_b_symbol))
+            self._adjacency.setdefault(pool.token_b_symbol, []).append((pool_id, pool.token_a_symbol))
+        self._indexed_pools = set(self.amm.pools)
+        self._stale = False
+
+    def _on_pool_changed(self, pool_id: str):
+        # Candidate paths depend only on which pools exist, not on their
+        # reserves, so only a new pool drops them; every quote reads live reserves.
+        if not self._stale and pool_id not in self._indexed_pools:
+            self._stale = True
+            self._paths.clear()
+
+    def candidate_paths(self, token_in: str, token_out: str) -> List[Tuple[Tuple[str, ...], Tuple[str, ...]]]:
+        """Returns every (tokens, pool_ids) path of at most max_hops swaps from token_in to token_out.
+
+        Paths never revisit a token. The set is cached per token pair until a
+        pool is added.
+        """
+        if self._stale:
+            self._rebuild_index()
+        key = (token_in, token_out)
+        paths = self._paths.get(key)
+        if paths is not None:
+            self._paths.move_to_end(key)
+            return paths
+        paths = []
+        stack = [((token_in,), ())]
+        while stack:
+            tokens, pools = stack.pop()
+            for pool_id, neighbor in self._adjacency.get(tokens[-1], ()):
+                if neighbor in tokens:
+                    continue
+                if neighbor == token_out:
+                    paths.append((tokens + (neighbor,), pools + (pool_id,)))
+                elif len(pools) + 1 < self.max_hops:
+                    stack.append((tokens + (neighbor,), pools + (pool_id,)))
+        self._paths[key] = paths
+        if len(self._paths) > self.ROUTE_CACHE_SIZE:
+            self._paths.popitem(last=False)
+        return paths
+
+    def find_route(self, token_in: str, token_out: str, amount_in: float) -> Dict:
+        """Returns the best-output route of at most max_hops swaps.
+
+        The candidate paths of the token pair come from candidate_paths, so
+        only the first query of a pair walks the adjacency index; each query
+        then quotes amount_in along the cached paths at the current reserves.
+        """
+        if token_in == token_out:
+            raise ValueError("token_in and token_out must differ.")
+        amount_in_native = self.amm.backend.convert(amount_in)
+        if amount_in_native <= 0:
+            raise ValueError("Amount must be positive.")
+        route = self._best_path(self.candidate_paths(token_in, token_out), amount_in_native)
+        if route is None:
+            raise ValueError(f"No route from {token_in} to {token_out} within {self.max_hops} hops")
+        return self._route_result(route)
+
+    def _best_path(self, paths: List[Tuple[Tuple[str, ...], Tuple[str, ...]]], amount_in) -> Optional[Dict]:
+        """Quotes amount_in along each path, sharing the quotes of common prefixes."""
+        pools = self.amm.pools
+        swap_amount_out = self.amm._swap_amount_out
+        quotes = {(): (amount_in, ())}
+        best = None
+        for tokens, pool_ids in paths:
+            amount, fees = amount_in, ()
+            for hop, pool_id in enumerate(pool_ids):
+                prefix = pool_ids[:hop + 1]
+                quote = quotes.get(prefix)
+                if quote is None:
+                    amount_out, fee = swap_amount_out(pools[pool_id], pool_id, tokens[hop], amount)
+                    quote = quotes[prefix] = (amount_out, fees + (fee,))
+                amount, fees = quote
+                if amount <= 0:
+                    break
+            else:
+                if best is None or amount > best[0]:
+                    best = (amount, tokens, pool_ids, fees)
+        if best is None:
+            return None
+        amount_out, tokens, pool_ids, fees = best
+        return {
+            'path': tokens,
+            'pools': pool_ids,
+            'amount_in': amount_in,
+            'amount_out': amount_out,
+            'fees': fees
+        }
+
+    def _route_result(self, route: Dict) -> Dict:
+        to_float = self.amm.backend.to_float
+        return {
+            'path': list(route['path']),
+            'pools': list(route['pools']),
+            'amount_in': to_float(route['amount_in']),
+            'amount_out': to_float(route['amount_out']),
+            'fees': [to_float(fee) for fee in route['fees']]
+        }
+
+    def execute_route(self, token_in: str, token_out: str, amount_in: float,
+                      min_amount_out: float = 0) -> Dict:
+        """Executes the best route hop by hop; all pools are restored if any hop fails."""
+        route = self.find_route(token_in, token_out, amount_in)
+        if route['amount_out'] < min_amount_out:
+            raise ValueError(f"Route output {route['amount_out']:.6f} {token_out} is below minimum {min_amount_out}")
+        hops = []
+        to_float = self.amm.backend.to_float
+        amount = self.amm.backend.convert(amount_in)
+        with self.amm.transaction(route['pools']):
+            for pool_id, hop_token_in in zip(route['pools'], route['path']):
+                amount_out, fee = self.amm._execute_swap(pool_id, hop_token_in, amount)
+                hops.append(self.amm._swap_result(pool_id, hop_token_in, amount, amount_out, fee))
+                amount = amount_out
+            if to_float(amount) < min_amount_out:
+                raise ValueError(f"Route output {to_float(amount):.6f} {token_out} is below minimum {min_amount_out}")
+        return {
+            'path': route['path'],
+            'pools': route['pools'],
+            'amount_in': route['amount_in'],
+            'amount_out': to_float(amount),
+            'hops': hops
         }
 
+class DepthIndex:
+    """Per-pool depth tables answering max-size-for-impact and impact-for-size queries.
+
+    Price impact has the same meaning as in simulate_price_impact: the
+    relative change, after the swap and its fee, of the price of token_in
+    in the other token. For a constant-product pool it depends only on the
+    input reserve: selling s = amount / reserve_in with g = 1 - fee_rate
+    gives impact = 1 / ((1 + g s)(1 + s)) - 1, and the largest amount with
+    |impact| <= X solves g s^2 + (1 + g) s - X / (1 - X) = 0. Curve pools
+    are searched by bisection over price_after. Each pool's table holds
+    both directions at IMPACT_LEVELS and TRADE_SIZES; it is built on the
+    first query after the pool changes, so queries at standard levels and
+    sizes are dictionary lookups.
+    """
+    IMPACT_LEVELS = (0.1, 0.5, 1.0, 2.0, 5.0, 10.0)  # percent
+    TRADE_SIZES = (10, 100, 1000, 10000, 100000)  # units of token_in
+    SEARCH_ITERATIONS = 100
+    SEARCH_TOLERANCE = 1e-10
+
+    def __init__(self, amm: HISAAMM, impact_levels: Tuple[float, ...] = IMPACT_LEVELS,
+                 trade_sizes: Tuple[float, ...] = TRADE_SIZES):
+        if any(not 0 < level < 100 for level in impact_levels):
+            raise ValueError("Impact levels must be between 0 and 100 percent.")
+        self.amm = amm
+        self.impact_levels = tuple(impact_levels)
+        self.trade_sizes = tuple(trade_sizes)
+        self._tables: Dict[str, Dict] = {}
+        self.builds = 0
+        amm.subscribe(self._on_pool_changed)
+
+    def _on_pool_changed(self, pool_id: str):
+        self._tables.pop(pool_id, None)
+
+    def depth_table(self, pool_id: str) -> Dict:
+        """Returns pool_id's depth table, building it if the pool changed since the last build.
+
+        The table holds 'fee_rate', 'reserves' ({token: reserve}),
+        'max_size' ({token_in: {impact level: amount}}) and 'price_impact'
+        ({token_in: {trade size: percent}}).
+        """
+        table = self._tables.get(pool_id)
+        if table is None:
+            table = self._build(pool_id)
+        return table
+
+    def _build(self, pool_id: str) -> Dict:
+        if pool_id not in self.amm.pools:
+            raise ValueError(f"Pool {pool_id} does not exist")
+        lock = self.amm.pool_lock(pool_id) if isinstance(self.amm, ConcurrentHISAAMM) else nullcontext()
+        # Built under the pool lock so a swap cannot land between reading
+        # the pool and storing its table.
+        with lock:
+            pool = self.amm.pools[pool_id]
+            to_float = self.amm.backend.to_float
+            table = {'reserves': {}, 'max_size': {}, 'price_impact': {}, 'fee_rate': to_float(pool.fee_rate)}
+            for token_in, reserve in ((pool.token_a_symbol, pool.token_a_reserve),
+                                      (pool.token_b_symbol, pool.token_b_reserve)):
+                table['reserves'][token_in] = to_float(reserve)
+                table['max_size'][token_in] = {level: self._max_size(pool, token_in, table, level / 100)
+                                               for level in self.impact_levels}
+                table['price_impact'][token_in] = {size: self._impact(pool, token_in, table, size) * 100
+                                                   for size in self.trade_sizes}
+            self._tables[pool_id] = table
+            self.builds += 1
+        return table
+
+    def max_trade_size(self, pool_id: str, token_in: str, max_impact_percent: float) -> float:
+        """Largest amount of token_in whose price impact stays within max_impact_percent."""
+        table = self.depth_table(pool_id)
+        levels = table['max_size'].get(token_in)
+        if levels is None:
+            raise ValueError(f"Token {token_in} not found in pool {pool_id}")
+        size = levels.get(max_impact_percent)
+        if size is not None:
+            return size
+        if not 0 < max_impact_percent < 100:
+            raise ValueError("max_impact_percent must be between 0 and 100.")
+        return self._max_size(self.amm.pools[pool_id], token_in, table, max_impact_percent / 100)
+
+    def price_impact(self, pool_id: str, token_in: str, amount_in: float) -> float:
+        """Price impact in percent of swapping amount_in (negative, as in simulate_price_impact)."""
+        table = self.depth_table(pool_id)
+        sizes = table['price_impact'].get(token_in)
+        if sizes is None:
+            raise ValueError(f"Token {token_in} not found in pool {pool_id}")
+        if not (math.isfinite(amount_in) and amount_in > 0):
+            raise ValueError("Amount must be a finite positive number.")
+        impact = sizes.get(amount_in)
+        if impact is not None:
+            return impact
+        return self._impact(self.amm.pools[pool_id], token_in, table, amount_in) * 100
+
+    def _impact(self, pool, token_in: str, table: Dict, amount_in: float) -> float:
+        if isinstance(pool, CurvePool):
+            return self._curve_impact(pool, token_in, amount_in)
+        gamma = 1 - table['fee_rate']
+        share = amount_in / table['reserves'][token_in]
+        return 1 / ((1 + gamma * share) * (1 + share)) - 1
+
+    def _max_size(self, pool, token_in: str, table: Dict, impact: float) -> float:
+        if isinstance(pool, CurvePool):
+            return self._curve_max_size(pool, token_in, impact)
+        gamma = 1 - table['fee_rate']
+        excess = impact / (1 - impact)
+        # Positive root of gamma s^2 + (1 + gamma) s - excess, in a form that stays accurate for small impacts.
+        share = 2 * excess / ((1 + gamma) + math.sqrt((1 + gamma) ** 2 + 4 * gamma * excess))
+        return share * table['reserves'][token_in]
+
+    def _curve_impact(self, pool: CurvePool, token_in: str, amount_in: float) -> float:
+        """Signed price impact as a fraction; -1 when the pool cannot fill amount_in."""
+        backend = pool.backend
+        try:
+            price_after = backend.to_float(pool.price_after(token_in, backend.convert(amount_in)))
+        except (ValueError, ZeroDivisionError):
+            return -1.0
+        price = backend.to_float(pool.price_a_in_b)
+        if token_in == pool.token_a_symbol:
+            return price_after / price - 1
+        return price / price_after - 1 if price_after else -1.0
+
+    def _curve_max_size(self, pool: CurvePool, token_in: str, impact: float) -> float:
+        reserve_in = pool.curve_reserves()[0 if pool._token_index(token_in) else 1]
+        low, high = 0.0, max(reserve_in * impact, 1e-9)
+        low_excess = -impact
+        high_excess = -self._curve_impact(pool, token_in, high) - impact
+        while high_excess <= 0:
+            low, low_excess = high, high_excess
+            high *= 2
+            high_excess = -self._curve_impact(pool, token_in, high) - impact
+        # Illinois false position: the secant step on the bracket, halving the
+        # weight of an end that is kept twice in a row so it cannot stall.
+        side = 0
+        for _ in range(self.SEARCH_ITERATIONS):
+            middle = (low * high_excess - high * low_excess) / (high_excess - low_excess)
+            excess = -self._curve_impact(pool, token_in, middle) - impact
+            if excess <= 0:
+                low, low_excess = middle, excess
+                if side == -1:
+                    high_excess /= 2
+                side = -1
+            else:
+                high, high_excess = middle, excess
+                if side == 1:
+                    low_excess /= 2
+                side = 1
+            if high - low <= self.SEARCH_TOLERANCE * high:
+                break
+        return low
+
 def interactive_calculator():
     print("🌍 HISA Ecosystem AMM Interactive Calculator 🌿")
     print("="*60)
@@ -528,9 +3253,8 @@ def lp_rewards_calculator(calculator: RewardCalculator, available_pools: List[st
     if not pool_id:
         return
     pool_info = calculator.amm.get_pool_info(pool_id)
-    token_prices = calculator.amm.get_ecosystem_token_prices()
-    token_a_price = token_prices.get(pool_info['token_a'], 0)
-    token_b_price = token_prices.get(pool_info['token_b'], 0)
+    token_a_price = calculator.amm.get_token_price(pool_info['token_a'])
+    token_b_price = calculator.amm.get_token_price(pool_info['token_b'])
     token_a_value = pool_info['reserve_a'] * token_a_price
     token_b_value = pool_info['reserve_b'] * token_b_price
     total_pool_value = token_a_value + token_b_value
@@ -555,6 +3279,9 @@ def lp_rewards_calculator(calculator: RewardCalculator, available_pools: List[st
         print(f"Total Rewards ({time_period} days): ${rewards['user_period_rewards']:,.6f}")
         print(f"Estimated APY: {rewards['estimated_apy']:,.2f}%")
         print(f"ROI ({time_period} days): {rewards['roi_percent']:,.2f}%")
+        if rewards['impermanent_loss_percent'] is not None:
+            print(f"Expected Impermanent Loss: {rewards['impermanent_loss_percent']:,.2f}%")
+            print(f"Expected Net LP Return (fees, IL and price moves): {rewards['net_return_percent']:,.2f}%")
         token_a_needed = (liquidity_amount / 2) / token_a_price if token_a_price > 0 else 0
         token_b_needed = (liquidity_amount / 2) / token_b_price if token_b_price > 0 else 0
         print(f"\n🪙 TOKENS NEEDED FOR LIQUIDITY (50/50 split):")
@@ -597,8 +3324,9 @@ def arbitrage_calculator(calculator: RewardCalculator, available_pools: List[str
         print(f"Price Difference: {arbitrage['price_difference']:,.6f} ({arbitrage['price_difference_percent']:+.2f}%)")
         if arbitrage['arbitrage_opportunity']:
             print(f"✅ Arbitrage Opportunity Detected! (Price difference > {calculator.ARBITRAGE_THRESHOLD_PERCENT}%)")
-            print(f"Estimated Optimal Trade Size: {arbitrage['optimal_arbitrage_amount']:,.2f} {token_symbol}")
-            print(f"Estimated Profit: ${arbitrage['estimated_profit']:,.6f}")
+            action = "Buy from pool" if arbitrage['trade_direction'] == 'buy' else "Sell into pool"
+            print(f"Estimated Optimal Trade Size: {arbitrage['optimal_arbitrage_amount']:,.2f} {token_symbol} ({action})")
+            print(f"Estimated Profit: {arbitrage['estimated_profit']:,.6f} {other_token_symbol} (after fees and slippage)")
         else:
             print(f"❌ No significant arbitrage opportunity")
     except ValueError as ve:
@@ -613,9 +3341,8 @@ def display_pool_info(amm: HISAAMM, available_pools: List[str]):
     if not pool_id:
         return
     info = amm.get_pool_info(pool_id)
-    token_prices = amm.get_ecosystem_token_prices()
-    token_a_price = token_prices.get(info['token_a'], 0)
-    token_b_price = token_prices.get(info['token_b'], 0)
+    token_a_price = amm.get_token_price(info['token_a'])
+    token_b_price = amm.get_token_price(info['token_b'])
     token_a_value = info['reserve_a'] * token_a_price
     token_b_value = info['reserve_b'] * token_b_price
     total_pool_value = token_a_value + token_b_value
@@ -644,16 +3371,16 @@ def ecosystem_overview(amm: HISAAMM):
         token_b_price = token_prices.get(pool.token_b_symbol, 0)
         pool_tvl = 0
         if token_a_price > 0 and token_b_price > 0:
-            token_a_value = float(pool.token_a_reserve) * token_a_price
-            token_b_value = float(pool.token_b_reserve) * token_b_price
+            token_a_value = amm.backend.to_float(pool.token_a_reserve) * token_a_price
+            token_b_value = amm.backend.to_float(pool.token_b_reserve) * token_b_price
             pool_tvl = token_a_value + token_b_value
             total_tvl_across_amm += pool_tvl
         print(f"  - {pool_id}:")
-        print(f"      Reserves: {float(pool.token_a_reserve):,.2f} {pool.token_a_symbol} + {float(pool.token_b_reserve):,.2f} {pool.token_b_symbol}")
+        print(f"      Reserves: {amm.backend.to_float(pool.token_a_reserve):,.2f} {pool.token_a_symbol} + {amm.backend.to_float(pool.token_b_reserve):,.2f} {pool.token_b_symbol}")
         print(f"      TVL: ${pool_tvl:,.2f}" if pool_tvl > 0 else "      TVL: Price data unavailable")
-        print(f"      Price: 1 {pool.token_a_symbol} = {pool.price_a_in_b:.6f} {pool.token_b_symbol}")
+        print(f"      Price: 1 {pool.token_a_symbol} = {amm.backend.to_float(pool.price_a_in_b):.6f} {pool.token_b_symbol}")
     print(f"\nTotal Value Locked (TVL) across all AMM pools: ${total_tvl_across_amm:,.2f}")
-    print(f"Total Fees Collected by AMM: ${float(amm.total_fees_collected):,.2f}")
+    print(f"Total Fees Collected by AMM: ${amm.backend.to_float(amm.total_fees_collected):,.2f}")
 
 def simplified_ecosystem_overview():
     from dataclasses import dataclass, field
@@ -794,4 +3521,5 @@ def select_pool(available_pools: List[str]) -> Optional[str]:
         return None
 
 if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(message)s", stream=sys.stdout)
     interactive_calculator()
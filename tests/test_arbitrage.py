@@ -0,0 +1,31 @@
+import pytest
+
+from AMM_simulator import HISAAMM, RewardCalculator
+
+def test_optimal_trade_moves_the_pool_to_the_external_price():
+    amm = HISAAMM(backend="float")
+    calculator = RewardCalculator(amm)
+    opportunity = calculator.calculate_arbitrage_opportunity("HISA-USDC", 6.0, "HISA")
+    assert opportunity['arbitrage_opportunity']
+    assert opportunity['trade_direction'] == 'buy'
+    amm.execute_swap("HISA-USDC", "USDC", opportunity['optimal_arbitrage_amount'] * 6.0)
+    assert amm.get_pool_info("HISA-USDC")['price_a_in_b'] == pytest.approx(6.0 / 0.997, rel=0.05)
+
+def test_no_opportunity_at_the_pool_price():
+    amm = HISAAMM(backend="float")
+    price = amm.get_pool_info("HISA-USDC")['price_a_in_b']
+    opportunity = RewardCalculator(amm).calculate_arbitrage_opportunity("HISA-USDC", price, "HISA")
+    assert not opportunity['arbitrage_opportunity']
+    assert opportunity['estimated_profit'] == 0.0
+
+TRIANGLE = [("HISA", "JANI", 100000, 200000, 0.003), ("JANI", "USDC", 100000, 300000, 0.003),
+            ("HISA", "USDC", 100000, 600000, 0.003)]
+
+def test_cycles_appear_only_after_a_pool_is_pushed_off_price():
+    amm = HISAAMM(backend="float", topology=TRIANGLE)
+    calculator = RewardCalculator(amm)
+    assert calculator.find_arbitrage_cycles() == []
+    amm.execute_swap("HISA-JANI", "HISA", 20000)
+    cycles = calculator.find_arbitrage_cycles()
+    assert cycles
+    assert all(cycle['amount_out'] > cycle['optimal_amount_in'] for cycle in cycles)
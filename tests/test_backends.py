@@ -0,0 +1,47 @@
+import pytest
+
+from AMM_benchmark import PARITY_RTOL, check_backend_parity
+from AMM_simulator import BACKENDS, BATCH_QUOTE_RTOL, HISAAMM
+
+def test_backends_match_decimal():
+    worst = check_backend_parity(swap_count=300)
+    assert set(worst) == set(BACKENDS)
+    assert worst["decimal"] == 0.0
+    for name, deviation in worst.items():
+        assert deviation <= PARITY_RTOL[name]
+
+@pytest.mark.parametrize("backend", list(BACKENDS))
+def test_conversions_round_trip(backend):
+    amm = HISAAMM(backend=backend, topology=[])
+    value = amm.backend.convert(1234.5)
+    assert amm.backend.to_float(value) == pytest.approx(1234.5)
+    assert float(amm.backend.to_decimal(value)) == pytest.approx(1234.5)
+
+def test_unknown_backend_is_rejected():
+    with pytest.raises(ValueError):
+        HISAAMM(backend="quad")
+
+def test_fixed_backend_rounds_in_favor_of_the_pool():
+    fixed = HISAAMM(backend="fixed")
+    exact = HISAAMM(backend="decimal")
+    for amount_in in (0.001, 1, 12345.678):
+        assert (fixed.execute_swap("HISA-USDC", "HISA", amount_in)['amount_out']
+                <= exact.execute_swap("HISA-USDC", "HISA", amount_in)['amount_out'])
+
+def test_native_amounts_skip_conversion():
+    amm = HISAAMM(backend="fixed")
+    converted = amm.simulate_price_impact("HISA-USDC", "HISA", 10)
+    native = amm.quote_price_impact("HISA-USDC", "HISA", amm.backend.convert(10), native=True)
+    assert amm.backend.to_float(native.amount_out) == converted['amount_out']
+
+@pytest.mark.parametrize("backend", list(BACKENDS))
+def test_batch_quotes_match_scalar_quotes(backend):
+    pytest.importorskip("numpy")
+    amm = HISAAMM(backend=backend)
+    pool_ids = list(amm.pools)
+    tokens_in = [amm.pools[pool_id].token_a_symbol for pool_id in pool_ids]
+    amounts = [100.0 * (index + 1) for index in range(len(pool_ids))]
+    batch = amm.get_swap_amounts_out(pool_ids, tokens_in, amounts)
+    for index, pool_id in enumerate(pool_ids):
+        expected = amm.backend.to_float(amm.get_swap_amount_out(pool_id, tokens_in[index], amounts[index])[0])
+        assert batch[0][index] == pytest.approx(expected, rel=BATCH_QUOTE_RTOL)
@@ -0,0 +1,37 @@
+import io
+import json
+
+import pytest
+
+from AMM_batch import BatchRunner, run_batch
+from AMM_simulator import HISAAMM
+
+def _run(*operations, fail_fast: bool = False):
+    output = io.StringIO()
+    lines = [op if isinstance(op, str) else json.dumps(op) for op in operations]
+    stats = run_batch(BatchRunner(HISAAMM(backend="float")), lines, output, fail_fast)
+    return [json.loads(line) for line in output.getvalue().splitlines()], stats
+
+def test_results_stream_in_order_with_ids():
+    records, stats = _run({'op': "quote", 'pool_id': "HISA-USDC", 'token_in': "HISA", 'amount_in': 100},
+                          {'id': "s", 'op': "swap", 'pool_id': "HISA-USDC", 'token_in': "HISA", 'amount_in': 100},
+                          {'op': "prices"})
+    assert [record['id'] for record in records] == [1, "s", 3]
+    assert records[0]['result']['amount_out'] == records[1]['result']['amount_out']
+    assert records[2]['result']['USDC'] == 1.0
+    assert stats['failed'] == 0
+
+def test_failures_are_reported_and_fail_fast_stops():
+    records, stats = _run("{bad json", {'op': "nope"}, {'op': "prices"})
+    assert [('error' in record) for record in records] == [True, True, False]
+    records, stats = _run({'op': "nope"}, {'op': "prices"}, fail_fast=True)
+    assert len(records) == 1 and stats['failed'] == 1
+
+@pytest.mark.parametrize("days", [1.5, 0, -3, "x"])
+def test_lp_rewards_rejects_fractional_or_non_positive_days(days):
+    records, _ = _run({'op': "lp-rewards", 'pool_id': "HISA-USDC", 'liquidity_percent': 1, 'days': days})
+    assert "error" in records[0]
+
+def test_lp_rewards_accepts_whole_days():
+    records, _ = _run({'op': "lp-rewards", 'pool_id': "HISA-USDC", 'liquidity_usd': 10000, 'days': 7.0})
+    assert records[0]['result']['time_period_days'] == 7
@@ -0,0 +1,11 @@
+import pytest
+
+from AMM_benchmark import PARITY_RTOL, check_concentrated_parity
+from AMM_simulator import CurvePool
+
+def test_single_range_matches_constant_product():
+    assert check_concentrated_parity(swap_count=300) <= PARITY_RTOL["float"]
+
+def test_curve_pool_is_abstract():
+    with pytest.raises(TypeError):
+        CurvePool()
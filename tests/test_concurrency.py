@@ -0,0 +1,53 @@
+import threading
+
+import pytest
+
+from AMM_benchmark import check_thread_safety
+from AMM_simulator import ConcurrentHISAAMM
+
+@pytest.mark.parametrize("backend", ["fixed", "decimal"])
+def test_threaded_swaps_match_a_sequential_replay(backend):
+    stats = check_thread_safety(threads=4, swap_count=2000, backend=backend)
+    assert stats['swaps'] == 2000
+
+def test_round_trip_transactions_keep_pools_consistent():
+    amm = ConcurrentHISAAMM(backend="fixed")
+    pool_ids = ["HISA-USDC", "JANI-USDC"]
+    before_k = {pool_id: amm.pools[pool_id].k for pool_id in pool_ids}
+
+    def worker():
+        for _ in range(200):
+            with amm.transaction(pool_ids):
+                received = amm.execute_swap("HISA-USDC", "HISA", 10)['amount_out']
+                amm.execute_swap("JANI-USDC", "USDC", received)
+
+    threads = [threading.Thread(target=worker) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    for pool_id in pool_ids:
+        assert amm.pools[pool_id].k >= before_k[pool_id]
+    assert amm.get_pool_info("HISA-USDC")['reserve_a'] == pytest.approx(100000 + 4 * 200 * 10)
+
+def test_transactions_reject_pools_they_did_not_lock():
+    amm = ConcurrentHISAAMM()
+    with pytest.raises(ValueError):
+        with amm.transaction(["HISA-USDC"]):
+            amm.execute_swap("JANI-USDC", "JANI", 10)
+    assert amm.get_pool_info("JANI-USDC")['reserve_a'] == 50000
+
+def test_concurrent_lp_positions_get_distinct_ids():
+    amm = ConcurrentHISAAMM()
+    ids = []
+
+    def worker():
+        for _ in range(50):
+            ids.append(amm.add_liquidity("HISA-USDC", 10, 50, owner="lp")['position_id'])
+
+    threads = [threading.Thread(target=worker) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(set(ids)) == 200
@@ -0,0 +1,29 @@
+import math
+
+import pytest
+
+from AMM_simulator import DepthIndex, HISAAMM
+
+@pytest.mark.parametrize("pool_id", ["HISA-USDC", "JANI_STABLE-USDC"])
+def test_max_size_and_price_impact_agree(pool_id):
+    amm = HISAAMM(backend="float")
+    index = DepthIndex(amm)
+    token_in = amm.pools[pool_id].token_a_symbol
+    size = index.max_trade_size(pool_id, token_in, 1.0)
+    assert index.price_impact(pool_id, token_in, size) == pytest.approx(-1.0, rel=1e-6)
+    assert amm.simulate_price_impact(pool_id, token_in, size)['price_impact_percent'] == pytest.approx(-1.0, rel=1e-6)
+
+def test_tables_are_rebuilt_after_a_swap():
+    amm = HISAAMM(backend="float")
+    index = DepthIndex(amm)
+    before = index.max_trade_size("HISA-USDC", "HISA", 1.0)
+    assert index.max_trade_size("HISA-USDC", "HISA", 1.0) == before
+    assert index.builds == 1
+    amm.execute_swap("HISA-USDC", "USDC", 50000)
+    assert index.max_trade_size("HISA-USDC", "HISA", 1.0) < before
+    assert index.builds == 2
+
+@pytest.mark.parametrize("amount_in", [0, -10, math.nan, math.inf])
+def test_price_impact_rejects_non_positive_amounts(amount_in):
+    with pytest.raises(ValueError):
+        DepthIndex(HISAAMM(backend="float")).price_impact("HISA-USDC", "HISA", amount_in)
@@ -0,0 +1,63 @@
+import pytest
+
+from AMM_simulator import HISAAMM
+
+def test_shares_are_priced_against_existing_principal():
+    amm = HISAAMM()
+    pool = amm.pools["HISA-USDC"]
+    reserve_a, reserve_b = float(pool.token_a_reserve), float(pool.token_b_reserve)
+    minted = amm.add_liquidity("HISA-USDC", reserve_a / 10, reserve_b / 10, owner="alice")
+    position = amm.get_position_info("HISA-USDC", minted['position_id'])
+    assert position['owner'] == "alice"
+    assert position['share_percent'] == pytest.approx(100 / 11)
+    assert position['amount_a'] == pytest.approx(reserve_a / 10)
+
+def test_positions_earn_fees_pro_rata_and_claim_them_once():
+    amm = HISAAMM()
+    position_id = amm.add_liquidity("HISA-USDC", 10000, 50000, owner="alice")['position_id']
+    assert amm.get_position_info("HISA-USDC", position_id)['fees_a'] == 0
+    amm.execute_swap("HISA-USDC", "HISA", 5000)
+    owed = amm.get_position_info("HISA-USDC", position_id)['fees_a']
+    assert owed > 0
+    claimed = amm.claim_fees("HISA-USDC", position_id)
+    assert claimed['fees_a'] == pytest.approx(owed)
+    assert amm.claim_fees("HISA-USDC", position_id)['fees_a'] == 0
+
+def test_burning_returns_principal_and_keeps_other_positions_whole():
+    amm = HISAAMM()
+    minted = amm.add_liquidity("HISA-USDC", 10000, 50000, owner="alice")
+    other = amm.add_liquidity("HISA-USDC", 1000, 5000, owner="bob")
+    before = amm.get_position_info("HISA-USDC", other['position_id'])
+    removed = amm.remove_liquidity("HISA-USDC", minted['position_id'])
+    assert removed['shares_burned'] == pytest.approx(minted['shares_minted'])
+    assert removed['amount_a'] == pytest.approx(10000)
+    assert removed['amount_b'] == pytest.approx(50000)
+    after = amm.get_position_info("HISA-USDC", other['position_id'])
+    assert after['amount_a'] == pytest.approx(before['amount_a'])
+
+def test_liquidity_calls_reject_unknown_positions():
+    amm = HISAAMM()
+    with pytest.raises(ValueError):
+        amm.claim_fees("HISA-USDC", 0)
+    amm.add_liquidity("HISA-USDC", 10, 50, owner="alice")
+    with pytest.raises(ValueError):
+        amm.remove_liquidity("HISA-USDC", 99)
+
+def test_every_position_can_exit_in_full():
+    amm = HISAAMM(backend="fixed", topology=[("HISA", "USDC", 0, 0, 0.003)])
+    first = amm.add_liquidity("HISA-USDC", 1000, 5000, owner="alice")
+    second = amm.add_liquidity("HISA-USDC", 100, 500, owner="bob")
+    amm.execute_swap("HISA-USDC", "HISA", 50)
+    amm.remove_liquidity("HISA-USDC", second['position_id'])
+    amm.remove_liquidity("HISA-USDC", first['position_id'])
+    book = amm.lp_books["HISA-USDC"]
+    assert book.total_shares == amm.backend.convert(book.MINIMUM_SHARES)
+    info = amm.get_pool_info("HISA-USDC")
+    assert 0 < info['reserve_a'] < 1e-5 and 0 < info['reserve_b'] < 1e-5
+
+def test_concentrated_pools_reject_owned_deposits_before_minting():
+    amm = HISAAMM(topology=[])
+    pool_id = amm.create_pool("HISA", "USDC", 1000, 5000, pool_type="concentrated", price_range=(1.0, 25.0))
+    with pytest.raises(ValueError):
+        amm.add_liquidity(pool_id, 10, 50, owner="alice")
+    assert pool_id not in amm.lp_books
@@ -0,0 +1,39 @@
+import random
+
+import pytest
+
+from AMM_simulator import HISAAMM
+
+def _orders(count: int, seed: int = 0):
+    rng = random.Random(seed)
+    return [("HISA-USDC", rng.choice(["HISA", "USDC"]), rng.uniform(1, 5000)) for _ in range(count)]
+
+def test_netted_settlement_does_not_depend_on_order_of_the_block():
+    orders = _orders(50)
+    forward, backward = HISAAMM(), HISAAMM()
+    forward_results = forward.execute_batch(orders)
+    backward_results = backward.execute_batch(orders[::-1])[::-1]
+    for expected, actual in zip(forward_results, backward_results):
+        assert actual['amount_out'] == pytest.approx(expected['amount_out'], rel=1e-12)
+    assert forward.get_pool_info("HISA-USDC") == backward.get_pool_info("HISA-USDC")
+
+def test_netting_fills_opposing_orders_at_one_price():
+    amm = HISAAMM()
+    price = amm.get_pool_info("HISA-USDC")['price_a_in_b']
+    results = amm.execute_batch([("HISA-USDC", "HISA", 1000), ("HISA-USDC", "USDC", 5000)])
+    assert results[0]['amount_out'] / (1000 * 0.997) == pytest.approx(price, rel=1e-3)
+    assert amm.get_pool_info("HISA-USDC")['price_a_in_b'] == pytest.approx(price, rel=1e-3)
+
+def test_unnetted_batch_matches_sequential_swaps():
+    orders = _orders(20, seed=1)
+    batched, sequential = HISAAMM(), HISAAMM()
+    results = batched.execute_batch(orders, netting=False)
+    for order, result in zip(orders, results):
+        assert sequential.execute_swap(*order)['amount_out'] == result['amount_out']
+
+def test_failing_order_rolls_back_the_whole_block():
+    amm = HISAAMM()
+    before = {pool_id: amm.get_pool_info(pool_id) for pool_id in amm.pools}
+    with pytest.raises(ValueError):
+        amm.execute_batch([("HISA-USDC", "HISA", 100), ("HISA-USDC", "JANI", 100)])
+    assert {pool_id: amm.get_pool_info(pool_id) for pool_id in amm.pools} == before
@@ -0,0 +1,53 @@
+import json
+
+import pytest
+
+pytest.importorskip("numpy")
+
+from AMM_persistence import PersistentStore
+from AMM_replay import ReplayEngine
+from AMM_benchmark import random_swaps
+from AMM_simulator import HISAAMM, constant_product_topology
+
+def _state(amm: HISAAMM):
+    return {pool_id: amm.get_pool_info(pool_id) for pool_id in amm.pools}
+
+def test_recovery_replays_the_journal_after_the_snapshot(tmp_path):
+    store = PersistentStore(str(tmp_path), fsync=False)
+    amm = store.attach(HISAAMM(backend="fixed", topology=constant_product_topology()))
+    swaps = random_swaps(amm, 200)
+    for swap in swaps[:100]:
+        amm.execute_swap(*swap)
+    store.checkpoint()
+    for swap in swaps[100:]:
+        amm.execute_swap(*swap)
+    amm.add_liquidity("HISA-USDC", 10, 50)
+    store.close()
+    recovered_store = PersistentStore(str(tmp_path), fsync=False)
+    recovered, replayed = recovered_store.recover(backend="fixed")
+    recovered_store.close()
+    assert replayed == 101
+    assert _state(recovered) == _state(amm)
+
+def test_store_rejects_curve_pools(tmp_path):
+    store = PersistentStore(str(tmp_path), fsync=False)
+    with pytest.raises(ValueError):
+        store.attach(HISAAMM())
+    store.close()
+
+def test_replay_resumes_from_its_checkpoint(tmp_path):
+    amm = HISAAMM()
+    events = [{'type': "swap", 'pool_id': pool_id, 'token_in': token_in, 'amount_in': amount_in}
+              for pool_id, token_in, amount_in in random_swaps(amm, 60)]
+    source = tmp_path / "events.jsonl"
+    source.write_text("".join(json.dumps(event) + "\n" for event in events[:30]))
+    checkpoint = str(tmp_path / "checkpoint.json")
+    ReplayEngine(amm, checkpoint, checkpoint_every=10, batch_size=7).replay(str(source))
+    with open(source, "a") as handle:
+        handle.write("".join(json.dumps(event) + "\n" for event in events[30:]))
+    resumed = HISAAMM()
+    stats = ReplayEngine(resumed, checkpoint, checkpoint_every=10).replay(str(source), resume=True)
+    assert stats['events_this_run'] == 30
+    reference = HISAAMM()
+    ReplayEngine(reference, batch_size=16).replay(str(source))
+    assert _state(resumed) == _state(reference)
@@ -0,0 +1,18 @@
+import pytest
+
+pytest.importorskip("numpy")
+
+from AMM_simulator import HISAAMM, constant_product_topology
+
+def test_table_store_quotes_like_the_dict_store():
+    table = HISAAMM(backend="float", pool_store="table")
+    pools = HISAAMM(backend="float", topology=constant_product_topology())
+    assert list(table.pools) == list(pools.pools)
+    for pool_id in pools.pools:
+        token_in = pools.pools[pool_id].token_a_symbol
+        assert table.execute_swap(pool_id, token_in, 1000) == pools.execute_swap(pool_id, token_in, 1000)
+    assert table.get_total_value_locked() == pytest.approx(pools.get_total_value_locked())
+
+def test_table_store_requires_the_float_backend():
+    with pytest.raises(ValueError):
+        HISAAMM(backend="decimal", pool_store="table")
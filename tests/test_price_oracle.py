@@ -0,0 +1,29 @@
+import pytest
+
+from AMM_simulator import HISAAMM
+
+def test_prices_follow_pool_ratios():
+    amm = HISAAMM()
+    prices = amm.get_ecosystem_token_prices()
+    assert prices["USDC"] == 1.0
+    assert prices["UMOJA_OPTION"] == pytest.approx(prices["UMOJA"] * amm.get_pool_info("UMOJA-UMOJA_OPTION")['price_a_in_b'])
+    assert amm.get_token_price("NOPE") == 0.0
+
+def test_price_table_is_shared_until_a_tree_pool_changes():
+    amm = HISAAMM()
+    prices = amm.get_ecosystem_token_prices()
+    assert amm.get_ecosystem_token_prices() is prices
+    with pytest.raises(TypeError):
+        prices["HISA"] = 0.0
+    amm.execute_swap("HISA-USDC", "HISA", 1000)
+    updated = amm.get_ecosystem_token_prices()
+    assert updated is not prices
+    assert updated["HISA"] < prices["HISA"]
+    assert updated["HISA"] == amm.get_token_price("HISA")
+
+def test_new_pools_are_priced():
+    amm = HISAAMM()
+    amm.get_ecosystem_token_prices()
+    amm.token_symbols.add("NEW")
+    amm.create_pool("NEW", "USDC", 1000, 3000)
+    assert amm.get_ecosystem_token_prices()["NEW"] == pytest.approx(3.0)
@@ -0,0 +1,40 @@
+import pytest
+
+from AMM_simulator import HISAAMM, SwapRouter
+
+def test_route_through_usdc_hub():
+    router = SwapRouter(HISAAMM(backend="float"))
+    route = router.find_route("HISA", "JANI", 100)
+    assert route['path'][0] == "HISA" and route['path'][-1] == "JANI"
+    assert len(route['pools']) == len(route['path']) - 1 <= router.max_hops
+    assert route['amount_out'] > 0
+
+def test_candidate_paths_are_reused_across_amounts_and_swaps():
+    amm = HISAAMM(backend="float")
+    router = SwapRouter(amm)
+    paths = router.candidate_paths("HISA", "JANI")
+    small = router.find_route("HISA", "JANI", 1)
+    large = router.find_route("HISA", "JANI", 10_000)
+    assert router.candidate_paths("HISA", "JANI") is paths
+    assert large['amount_out'] / 10_000 < small['amount_out']
+    router.execute_route("HISA", "JANI", 100)
+    assert router.candidate_paths("HISA", "JANI") is paths
+    # Quotes read live reserves, so the same amount now gets less.
+    assert router.find_route("HISA", "JANI", 1)['amount_out'] < small['amount_out']
+
+def test_new_pool_drops_cached_paths():
+    amm = HISAAMM(backend="float")
+    router = SwapRouter(amm)
+    paths = router.candidate_paths("HISA", "JANI")
+    amm.create_pool("HISA", "JANI", 1_000_000, 1_000_000, 0.003)
+    refreshed = router.candidate_paths("HISA", "JANI")
+    assert refreshed is not paths
+    assert (("HISA", "JANI"), ("HISA-JANI",)) in refreshed
+
+def test_execute_route_honours_min_amount_out():
+    amm = HISAAMM(backend="float")
+    router = SwapRouter(amm)
+    before = amm.pools["HISA-USDC"].token_a_reserve
+    with pytest.raises(ValueError):
+        router.execute_route("HISA", "JANI", 100, min_amount_out=1e12)
+    assert amm.pools["HISA-USDC"].token_a_reserve == before
@@ -0,0 +1,49 @@
+import asyncio
+import json
+
+import pytest
+
+from AMM_server import INVALID_PARAMS, METHOD_NOT_FOUND, PARSE_ERROR, AMMServer
+from AMM_simulator import HISAAMM
+
+def _dispatch(server: AMMServer, request) -> dict:
+    line = request if isinstance(request, bytes) else json.dumps(request).encode()
+    return asyncio.run(server._dispatch(line))
+
+@pytest.fixture
+def server():
+    return AMMServer(HISAAMM())
+
+def test_quote_and_swap(server):
+    quote = _dispatch(server, {'jsonrpc': "2.0", 'id': 1, 'method': "quote",
+                               'params': {'pool_id': "HISA-USDC", 'token_in': "HISA", 'amount_in': 100}})
+    swap = _dispatch(server, {'jsonrpc': "2.0", 'id': 2, 'method': "swap",
+                              'params': ["HISA-USDC", "HISA", 100]})
+    assert swap['result']['amount_out'] == quote['result']['amount_out']
+
+@pytest.mark.parametrize("params", [
+    {'pool_id': "NOPE", 'token_in': "HISA", 'amount_in': 100},
+    {'pool_id': "HISA-USDC", 'token_in': "HISA", 'amount_in': -5},
+    {'pool_id': "HISA-USDC", 'token_in': "HISA", 'amount_in': "abc"},
+    {'pool_id': "HISA-USDC", 'token_in': "HISA"},
+])
+def test_bad_params_are_invalid_params(server, params):
+    response = _dispatch(server, {'jsonrpc': "2.0", 'id': 3, 'method': "quote", 'params': params})
+    assert response['error']['code'] == INVALID_PARAMS
+
+def test_failed_slippage_check_rolls_back(server):
+    before = server.amm.get_pool_info("HISA-USDC")
+    response = _dispatch(server, {'jsonrpc': "2.0", 'id': 4, 'method': "swap",
+                                  'params': ["HISA-USDC", "HISA", 100, 10 ** 9]})
+    assert response['error']['code'] == INVALID_PARAMS
+    assert server.amm.get_pool_info("HISA-USDC") == before
+
+def test_notifications_get_no_response(server):
+    assert _dispatch(server, {'jsonrpc': "2.0", 'method': "prices"}) is None
+    assert _dispatch(server, {'jsonrpc': "2.0", 'method': "missing"}) is None
+    assert _dispatch(server, {'jsonrpc': "2.0", 'method': "quote", 'params': {'pool_id': "NOPE"}}) is None
+
+def test_protocol_errors_are_answered_with_a_null_id(server):
+    assert _dispatch(server, b"{not json")['error']['code'] == PARSE_ERROR
+    response = _dispatch(server, {'jsonrpc': "2.0", 'id': 5, 'method': "missing"})
+    assert response['id'] == 5 and response['error']['code'] == METHOD_NOT_FOUND
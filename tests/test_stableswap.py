@@ -0,0 +1,49 @@
+import pytest
+
+from AMM_simulator import (BACKENDS, HISAAMM, Pool, StableSwapPool, constant_product_topology,
+                           RewardCalculator)
+from AMM_persistence import PersistentStore, write_snapshot
+
+STABLE_POOLS = ("JANI_STABLE-USDC", "UMOJA_STABLE-USDC")
+
+@pytest.mark.parametrize("backend", list(BACKENDS))
+def test_default_stable_pairs_are_stableswap(backend):
+    amm = HISAAMM(backend=backend)
+    for pool_id in STABLE_POOLS:
+        assert isinstance(amm.pools[pool_id], StableSwapPool)
+    assert isinstance(amm.pools["HISA-USDC"], Pool)
+
+def test_default_pools_are_not_shared_between_amms():
+    first, second = HISAAMM(), HISAAMM()
+    first.execute_swap("JANI_STABLE-USDC", "USDC", 10_000)
+    assert second.get_pool_info("JANI_STABLE-USDC")['reserve_b'] == 200_000
+
+def test_stableswap_slippage_is_below_constant_product():
+    stable = HISAAMM(backend="float")
+    constant = HISAAMM(backend="float", topology=constant_product_topology())
+    amount = 20_000
+    assert (stable.simulate_price_impact("JANI_STABLE-USDC", "USDC", amount)['amount_out']
+            > constant.simulate_price_impact("JANI_STABLE-USDC", "USDC", amount)['amount_out'])
+
+def test_table_store_falls_back_to_constant_product():
+    amm = HISAAMM(backend="float", pool_store="table")
+    assert set(STABLE_POOLS) <= set(amm.pools)
+    with pytest.raises(ValueError):
+        amm.create_pool("JANI", "HBAR", 1000, 1000, pool_type="stableswap")
+
+def test_snapshots_and_store_reject_curve_pools(tmp_path):
+    amm = HISAAMM(backend="float")
+    with pytest.raises(ValueError, match="constant-product"):
+        write_snapshot(amm, str(tmp_path / "pools.snapshot"))
+    store = PersistentStore(str(tmp_path), fsync=False)
+    with pytest.raises(ValueError, match="constant-product"):
+        store.attach(amm)
+    store.attach(HISAAMM(backend="float", topology=constant_product_topology()))
+    store.close()
+
+def test_monte_carlo_rejects_curve_pools_and_estimate_falls_back():
+    pytest.importorskip("numpy")
+    calculator = RewardCalculator(HISAAMM(backend="float"))
+    with pytest.raises(ValueError, match="constant-product"):
+        calculator.simulate_lp_returns("JANI_STABLE-USDC", paths=10, workers=1)
+    assert calculator.calculate_lp_rewards("JANI_STABLE-USDC", 1.0, 30)['model'] != "monte_carlo"
@@ -0,0 +1,41 @@
+import pytest
+
+from AMM_simulator import HISAAMM
+
+def _state(amm: HISAAMM):
+    return {pool_id: amm.get_pool_info(pool_id) for pool_id in amm.pools}, amm.total_fees_collected
+
+def test_failed_transaction_restores_pools_fees_and_books():
+    amm = HISAAMM()
+    amm.add_liquidity("HISA-USDC", 100, 500, owner="alice")
+    before = _state(amm)
+    with pytest.raises(RuntimeError):
+        with amm.transaction():
+            amm.execute_swap("HISA-USDC", "HISA", 1000)
+            amm.execute_swap("JANI_STABLE-USDC", "USDC", 1000)
+            amm.add_liquidity("HISA-USDC", 100, 500, owner="bob")
+            raise RuntimeError("abort")
+    assert _state(amm) == before
+    assert len(amm.lp_books["HISA-USDC"].owners) == 2
+
+def test_nested_rollback_keeps_the_outer_writes():
+    amm = HISAAMM()
+    with amm.transaction():
+        amm.execute_swap("HISA-USDC", "HISA", 1000)
+        after_outer = _state(amm)
+        with pytest.raises(RuntimeError):
+            with amm.transaction():
+                amm.execute_swap("HISA-USDC", "USDC", 500)
+                raise RuntimeError("abort")
+        assert _state(amm) == after_outer
+
+def test_fork_is_isolated_from_its_parent():
+    amm = HISAAMM()
+    before = _state(amm)
+    fork = amm.fork()
+    fork.execute_swap("HISA-USDC", "HISA", 1000)
+    fork.add_liquidity("HISA-USDC", 100, 500, owner="alice")
+    assert _state(amm) == before
+    assert "HISA-USDC" not in amm.lp_books
+    amm.execute_swap("JANI-USDC", "JANI", 10)
+    assert fork.get_pool_info("JANI-USDC") == before[0]["JANI-USDC"]
@@ -0,0 +1,37 @@
+import pytest
+
+from AMM_simulator import BACKENDS, HISAAMM, PriceImpact, SwapResult
+
+@pytest.mark.parametrize("backend", list(BACKENDS))
+def test_typed_quote_matches_dict_quote(backend):
+    amm = HISAAMM(backend=backend)
+    quote = amm.simulate_price_impact("HISA-USDC", "HISA", 10)
+    typed = amm.quote_price_impact("HISA-USDC", "HISA", 10)
+    assert amm.backend.to_float(typed.amount_out) == pytest.approx(quote['amount_out'])
+    assert amm.backend.to_float(typed.price_impact) * 100 == pytest.approx(quote['price_impact_percent'])
+
+def test_fixed_backend_native_amount_is_not_rescaled():
+    amm = HISAAMM(backend="fixed")
+    human = amm.quote_price_impact("HISA-USDC", "HISA", 10)
+    native = amm.quote_price_impact("HISA-USDC", "HISA", amm.backend.convert(10), native=True)
+    assert native.amount_out == human.amount_out
+    assert amm.backend.to_float(native.amount_out) == pytest.approx(49.85, rel=1e-3)
+
+def test_native_swap_chains_previous_amount_out():
+    amm = HISAAMM(backend="fixed")
+    reserves = amm.pools["HISA-USDC"].token_a_reserve
+    first = amm.swap("HISA-USDC", "HISA", 10)
+    second = amm.swap("HISA-USDC", "USDC", first.amount_out, native=True)
+    assert second.amount_in == first.amount_out
+    # A round trip pays the fee twice, so slightly less HISA comes back.
+    assert 9.9 < amm.backend.to_float(second.amount_out) < 10
+    assert amm.pools["HISA-USDC"].token_a_reserve > reserves - amm.backend.convert(1)
+
+def test_out_buffer_is_refilled_in_place():
+    amm = HISAAMM(backend="float")
+    buffer = SwapResult()
+    result = amm.swap("HISA-USDC", "HISA", 5, out=buffer)
+    assert result is buffer
+    impact = PriceImpact()
+    assert amm.quote_price_impact("HISA-USDC", "USDC", 5, out=impact) is impact
+    assert set(buffer.as_dict()) == set(SwapResult.__slots__)